@@ -0,0 +1,137 @@
+"""
+Parser Backend Benchmark
+
+Compares the ElementTree and lxml backends of parse_bill on copies of
+tests/test_data.xml cut or repeated to 1, 100 and 10,000 conceptos,
+reporting best wall time and the peak RSS added by one parse (each run in
+a fresh interpreter). Every backend's output is then checked for parity
+with ElementTree: same invoice number, raw bill data and line DataFrame;
+any difference exits with status 1.
+
+Usage:
+    python benchmarks/bench_backends.py --sizes 1 100 10000
+"""
+
+import argparse
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+def build_sized_file(n_conceptos: int, path: str):
+    """Write a copy of the test invoice with exactly n_conceptos conceptos"""
+    with open(TEST_DATA, encoding="utf-8") as f:
+        xml = f.read()
+
+    match = re.search(r"<cfdi:Conceptos>(.*)</cfdi:Conceptos>", xml, re.S)
+    conceptos = re.findall(r"<cfdi:Concepto .*?</cfdi:Concepto>", match.group(1), re.S)
+    body = "".join(conceptos[i % len(conceptos)] for i in range(n_conceptos))
+    sized = xml[: match.start(1)] + body + xml[match.end(1) :]
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(sized)
+
+
+def run_worker(backend: str, path: str):
+    """Parse the file once in this process and print wall time and peak RSS"""
+    from parsers.xml_parser import parse_bill
+
+    # Import the backend's library before measuring the baseline
+    from parsers.backends import get_backend
+
+    get_backend(backend)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    parse_bill(path, backend=backend)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{elapsed:.6f} {baseline} {peak}")
+
+
+def check_parity(path: str, backends) -> bool:
+    """Compare every backend's parse_bill output with ElementTree's"""
+    from parsers.xml_parser import parse_bill
+
+    expected_number, expected_df, expected_data = parse_bill(path, backend="etree")
+    ok = True
+    for backend in backends:
+        number, bill_df, bill_data = parse_bill(path, backend=backend)
+        differences = [
+            label
+            for label, same in (
+                ("invoice number", number == expected_number),
+                ("bill data", bill_data == expected_data),
+                ("line frame", bill_df.equals(expected_df)),
+            )
+            if not same
+        ]
+        if differences:
+            print(f"  {backend}: differs from etree in {', '.join(differences)}")
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "PATH"))
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    from parsers.backends import available_backends
+
+    backends = available_backends()
+    if "lxml" not in backends:
+        print("lxml is not installed; only the ElementTree backend is measured\n")
+
+    parity = True
+    with tempfile.TemporaryDirectory() as tmp:
+        print(
+            f"{'conceptos':>9} {'backend':<7} {'best wall (ms)':>15} "
+            f"{'parse RSS (MB)':>15}"
+        )
+        paths = {}
+        for size in args.sizes:
+            path = paths[size] = os.path.join(tmp, f"cfdi_{size}.xml")
+            build_sized_file(size, path)
+
+            for backend in backends:
+                runs = []
+                for _ in range(args.repeat):
+                    out = subprocess.run(
+                        [sys.executable, __file__, "--worker", backend, path],
+                        capture_output=True,
+                        text=True,
+                        check=True,
+                    ).stdout.split()
+                    runs.append((float(out[0]), int(out[1]), int(out[2])))
+
+                best = min(r[0] for r in runs) * 1000
+                # ru_maxrss is reported in KB on Linux
+                delta = max(r[2] - r[1] for r in runs) / 1024
+                print(f"{size:>9} {backend:<7} {best:>15.2f} {delta:>15.1f}")
+
+        # Parsed in this process only now: workers inherit its peak RSS
+        for size, path in paths.items():
+            parity &= check_parity(path, backends)
+
+    print(f"\nparity: {'identical output' if parity else 'MISMATCH'}")
+    if not parity:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Diagnostics Rendering Benchmark
+
+Measures the cost of the per-item traces in create_sku_mapping and
+format_bill_data when every trace is rendered as its own Streamlit element
+(verbose mode) versus collected into a DiagnosticsReport and rendered once
+(quiet mode). Streamlit runs in bare mode, so the timings cover building
+and enqueuing the element protos but not browser rendering, which only
+widens the gap in a live app.
+
+Usage:
+    python benchmarks/bench_diagnostics.py --items 1000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+def synthetic_catalog(n_items: int):
+    """Build (name, id) tuples in the parent:parent-child form the catalog uses"""
+    return [
+        (f"{i % 50}parent:{i % 50}parent-child{i}", str(i + 1))
+        for i in range(n_items)
+    ]
+
+
+def run(label, install, work):
+    report = install()
+    start = time.perf_counter()
+    work()
+    work_time = time.perf_counter() - start
+
+    from ui.streamlit_adapter import render_diagnostics
+
+    start = time.perf_counter()
+    render_diagnostics(report)
+    render_time = time.perf_counter() - start
+
+    events = len(report) if report is not None else "-"
+    print(
+        f"{label:<8} work {work_time:8.3f}s  render {render_time:7.3f}s  "
+        f"total {work_time + render_time:8.3f}s  collected events {events}"
+    )
+    return work_time + render_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Silence Streamlit's bare-mode warnings
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    from parsers.xml_parser import parse_bill
+    from qb.builder import format_bill_data
+    from qb.qb_bill import create_sku_mapping
+    from ui.streamlit_adapter import install_streamlit_adapter
+
+    catalog = synthetic_catalog(args.items)
+    invoice_number, bill_df, _ = parse_bill(TEST_DATA)
+
+    def work():
+        create_sku_mapping(catalog)
+        format_bill_data(invoice_number, bill_df)
+
+    print(f"{args.items} catalog items, {len(bill_df)} invoice lines\n")
+    verbose = run("verbose", lambda: install_streamlit_adapter(verbose=True), work)
+    quiet = run("quiet", lambda: install_streamlit_adapter(verbose=False), work)
+    print(f"\nsaving: {verbose - quiet:.3f}s ({verbose / quiet:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+format_bill_data Benchmark
+
+Times the vectorized format_bill_data against the previous iterrows
+implementation (kept here as the reference) on synthetic CFDI line items,
+and checks that both produce identical line items. The synthetic lines
+include the awkward cases: no SKU, zero and negative amounts, unparseable
+amounts and quantities. It also times the vectorized version on the typed
+DataFrame parse_bill now returns, where no string conversion is left,
+and the vectorized reconciliation of those lines against their totals.
+
+Usage:
+    python benchmarks/bench_format_bill.py --lines 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+
+def reference_format_bill_data(invoice_number, bill_df, vendor_rfc=""):
+    """The per-row format_bill_data this benchmark compares against"""
+    line_items = []
+
+    for _, row in bill_df.iterrows():
+        full_sku = row.get("sku", "")
+        parent_sku = row.get("parent_sku", "")
+        product_id = row.get("product_id", "")
+
+        if parent_sku and full_sku:
+            qb_product = f"{parent_sku}:{full_sku}"
+        elif full_sku:
+            if "-" in full_sku:
+                parent = full_sku.split("-")[0]
+                qb_product = f"{parent}:{full_sku}"
+            else:
+                qb_product = f"{full_sku}:{full_sku}"
+        else:
+            qb_product = row.get("product", "")
+
+        description = product_id or row.get("description", "")
+        if not description and "full_description" in row:
+            description = row["full_description"]
+
+        amount = 0.0
+        try:
+            if "Importe" in row and row["Importe"]:
+                amount = float(row["Importe"])
+            elif "amount" in row and row["amount"]:
+                amount = float(row["amount"])
+        except (ValueError, TypeError):
+            amount = 0.0
+
+        if amount <= 0:
+            for col in bill_df.columns:
+                if any(term in col.lower() for term in ["amount", "total", "importe"]):
+                    try:
+                        value = row[col]
+                        if isinstance(value, str):
+                            value = "".join(c for c in value if c.isdigit() or c == ".")
+                        amt = float(value)
+                        if amt > 0:
+                            amount = amt
+                            break
+                    except (ValueError, TypeError):
+                        pass
+
+        quantity = 1.0
+        try:
+            if "Cantidad" in row and row["Cantidad"]:
+                quantity = float(row["Cantidad"])
+            elif "quantity" in row and row["quantity"]:
+                quantity = float(row["quantity"])
+        except (ValueError, TypeError):
+            quantity = 1.0
+        if quantity <= 0:
+            quantity = 1.0
+
+        line_items.append(
+            {
+                "product": qb_product,
+                "sku": full_sku,
+                "product_id": product_id,
+                "description": description,
+                "amount": amount,
+                "amount_cents": round(amount * 100),
+                "quantity": quantity,
+            }
+        )
+
+    return {
+        "invoice_number": invoice_number,
+        "vendor_rfc": vendor_rfc,
+        "uuid": "",
+        "line_items": line_items,
+    }
+
+
+def synthetic_lines(n_lines: int, rng: random.Random):
+    """Concepto attribute dicts in the shape of the test invoice"""
+    from parsers.xml_parser import build_line_item
+
+    lines = []
+    for i in range(n_lines):
+        quantity = rng.randint(1, 20)
+        price = round(rng.uniform(50, 5000), 2)
+        amount = f"{quantity * price:.2f}"
+        sku = f"{rng.randint(10, 60)}item{i % 500}-{rng.choice(['white', 'gold', 'dpblue'])}"
+        description = f"PAPER MACHE ITEM {i} - SKU:{sku}"
+
+        roll = rng.random()
+        if roll < 0.05:
+            description = f"PAPER MACHE ITEM {i}"  # no SKU
+        elif roll < 0.08:
+            amount = "0.00"
+        elif roll < 0.1:
+            amount = f"-{amount}"
+        elif roll < 0.11:
+            amount = "N/A"
+        cantidad = "abc" if rng.random() < 0.01 else f"{quantity}.0000"
+
+        lines.append(
+            build_line_item(
+                {
+                    "NoIdentificacion": str(10000 + i),
+                    "Descripcion": description,
+                    "Cantidad": cantidad,
+                    "ValorUnitario": f"{price:.2f}",
+                    "Importe": amount,
+                }
+            )
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    from qb import events
+    from parsers.money import reconcile_bill
+    from parsers.xml_parser import LINE_COLUMNS, build_line_frame
+    from qb.builder import format_bill_data
+
+    events.set_event_sink(events.NullSink())
+    lines = synthetic_lines(args.lines, random.Random(0))
+    # The raw line dicts, as parse_bill framed them before it typed columns
+    bill_df = pd.DataFrame(lines)
+
+    def best_of(func):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = func("INV-1", bill_df, vendor_rfc="AAA010101AAA")
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    reference, reference_time = best_of(reference_format_bill_data)
+    vectorized, vectorized_time = best_of(format_bill_data)
+
+    columns = {name: [line.get(name) for line in lines] for name in LINE_COLUMNS}
+    typed_df = build_line_frame(columns)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        format_bill_data("INV-1", typed_df, vendor_rfc="AAA010101AAA")
+    typed_time = (time.perf_counter() - start) / args.repeat
+
+    totals = {"subtotal": int(typed_df["amount_cents"].sum()), "total": None}
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        reconciliation = reconcile_bill(typed_df, totals)
+    reconcile_time = (time.perf_counter() - start) / args.repeat
+
+    identical = reference == vectorized
+    print(f"{args.lines} lines, best of {args.repeat}")
+    print(f"  iterrows    {reference_time * 1000:9.1f} ms")
+    print(f"  vectorized  {vectorized_time * 1000:9.1f} ms")
+    print(f"  typed frame {typed_time * 1000:9.1f} ms")
+    print(
+        f"  reconcile   {reconcile_time * 1000:9.1f} ms "
+        f"({len(reconciliation.errors)} errors)"
+    )
+    print(f"  speedup     {reference_time / vectorized_time:9.1f}x")
+    print(f"  identical output: {identical}")
+    if not identical:
+        for i, (a, b) in enumerate(zip(reference["line_items"], vectorized["line_items"])):
+            if a != b:
+                print(f"  first difference at line {i}:\n    {a}\n    {b}")
+                break
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
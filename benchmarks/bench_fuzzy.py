@@ -0,0 +1,123 @@
+"""
+Fuzzy Matcher Benchmark
+
+Builds a FuzzyIndex over a catalog holding the SKUs of tests/test_data.xml
+plus synthetic look-alike items, then queries it with each invoice SKU in
+several degraded forms (exact, one-character typo, no punctuation, full
+description text). Reports top-1 hit rate, top-5 recall, false matches
+for SKUs left out of the catalog, and per-query latency.
+
+Usage:
+    python benchmarks/bench_fuzzy.py --distractors 10000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+def typo(text: str, rng: random.Random) -> str:
+    """Replace one alphanumeric character"""
+    positions = [i for i, c in enumerate(text) if c.isalnum()]
+    i = rng.choice(positions)
+    return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") + text[i + 1 :]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--distractors", type=int, default=10000)
+    parser.add_argument(
+        "--holdout",
+        type=float,
+        default=0.2,
+        help="Fraction of invoice SKUs left out of the catalog",
+    )
+    args = parser.parse_args()
+
+    from parsers.xml_parser import parse_bill
+    from qb.fuzzy import FuzzyIndex
+
+    rng = random.Random(0)
+    _, _, bill_data = parse_bill(TEST_DATA)
+
+    lines = {}
+    for line in bill_data["line_items"]:
+        if line["sku"]:
+            lines.setdefault(line["sku"], line)
+    skus = sorted(lines)
+    rng.shuffle(skus)
+    held_out = set(skus[: int(len(skus) * args.holdout)])
+
+    catalog, expected = [], {}
+    for sku in skus:
+        if sku in held_out:
+            continue
+        item_id = str(len(catalog) + 1)
+        catalog.append((lines[sku]["product"], item_id, ""))
+        expected[sku] = item_id
+
+    # Look-alikes sharing parents and colour suffixes with the invoice SKUs
+    parents = sorted({lines[sku]["parent_sku"] or sku.split("-")[0] for sku in skus})
+    for i in range(args.distractors):
+        parent = rng.choice(parents)
+        child = f"{parent}-variant{i}"
+        catalog.append((f"{parent}:{child}", str(len(catalog) + 1), ""))
+
+    start = time.perf_counter()
+    index = FuzzyIndex(catalog)
+    build_time = time.perf_counter() - start
+
+    forms = {
+        "exact": lambda sku: sku,
+        "typo": lambda sku: typo(sku, rng),
+        "no punctuation": lambda sku: sku.replace("-", "").upper(),
+        "description": lambda sku: lines[sku]["full_description"],
+    }
+
+    print(
+        f"{len(catalog)} catalog items ({len(expected)} from the invoice, "
+        f"{len(held_out)} invoice SKUs held out), built in {build_time:.3f}s\n"
+    )
+    print(
+        f"{'form':<15} {'top-1':>7} {'top-5':>7} {'false':>6} "
+        f"{'p50 us':>8} {'p99 us':>8}"
+    )
+
+    for label, make_query in forms.items():
+        hits = recall = false_matches = 0
+        latencies = []
+        for sku in skus:
+            query = make_query(sku)
+            start = time.perf_counter()
+            best = index.best_match(query)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            ranked = index.search(query)
+
+            if sku in held_out:
+                false_matches += best is not None
+                continue
+            hits += best is not None and best.item_id == expected[sku]
+            recall += any(m.item_id == expected[sku] for m in ranked)
+
+        print(
+            f"{label:<15} {hits / len(expected):>7.1%} {recall / len(expected):>7.1%} "
+            f"{false_matches:>6} {statistics.median(latencies):>8.0f} "
+            f"{percentile(latencies, 99):>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Item Resolution Benchmark
+
+Resolves every line of tests/test_data.xml against a local mock QuickBooks
+server: serially, with the async client's bounded concurrency, and with
+batched /batch requests, and compares wall-clock time and round trips.
+
+Usage:
+    python benchmarks/bench_item_resolution.py --latency 0.05
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mock_qb_server import MockQuickBooksServer, configure_environment
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--hit-ratio",
+        type=float,
+        default=0.5,
+        help="Fraction of invoice SKUs present in the mock catalog",
+    )
+    args = parser.parse_args()
+
+    from parsers.xml_parser import parse_bill
+
+    _, _, bill_data = parse_bill(TEST_DATA)
+    lines = bill_data["line_items"]
+    lookups = [(i["product"], i["sku"], i["description"]) for i in lines]
+
+    # Only part of the invoice is in the catalog, so misses exercise the
+    # full product -> SKU -> description fallback chain
+    in_catalog = int(len(lines) * args.hit_ratio)
+    catalog = [i["product"] for i in lines[:in_catalog]]
+
+    server = MockQuickBooksServer(catalog, latency=args.latency).start()
+    state_dir = tempfile.mkdtemp(prefix="bench_qb_")
+    configure_environment(server.url, state_dir)
+
+    from qb.qb_async import resolve_items_concurrently
+    from qb.qb_batch import find_items_batched
+
+    print(
+        f"{len(lookups)} lines, {in_catalog} in catalog, "
+        f"{args.latency * 1000:.0f} ms simulated latency\n"
+    )
+
+    strategies = (
+        ("serial", lambda: resolve_items_concurrently(lookups, max_concurrency=1)),
+        (
+            "concurrent",
+            lambda: resolve_items_concurrently(
+                lookups, max_concurrency=args.concurrency
+            ),
+        ),
+        ("batched", lambda: [item for item, _ in find_items_batched(lookups)]),
+    )
+
+    results = {}
+    for label, resolve in strategies:
+        server.mock.reset_stats()
+        start = time.perf_counter()
+        found = resolve()
+        elapsed = time.perf_counter() - start
+        results[label] = elapsed
+        hits = sum(1 for item in found if item)
+        print(
+            f"{label:<11} {elapsed:7.2f}s  "
+            f"{server.mock.request_count:>4} requests  {hits} resolved"
+        )
+
+    server.stop()
+    print()
+    for label in ("concurrent", "batched"):
+        print(f"{label} speedup: {results['serial'] / results[label]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Parser Benchmark
+
+Compares peak RSS and wall time of the tree-based parse_bill against the
+streaming iterparse engine on a scaled-up copy of tests/test_data.xml, and
+reports the deep memory footprint of the resulting line item DataFrame.
+
+Usage:
+    python benchmarks/bench_parse.py --scale 50
+"""
+
+import argparse
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+MODES = ("tree", "streaming", "iter")
+
+
+def build_scaled_file(scale: int, path: str) -> int:
+    """Write a copy of the test invoice with its conceptos repeated `scale` times"""
+    with open(TEST_DATA, encoding="utf-8") as f:
+        xml = f.read()
+
+    match = re.search(r"<cfdi:Conceptos>(.*)</cfdi:Conceptos>", xml, re.S)
+    conceptos = match.group(1)
+    scaled = xml[: match.start(1)] + conceptos * scale + xml[match.end(1) :]
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(scaled)
+
+    return conceptos.count("<cfdi:Concepto ") * scale
+
+
+def run_worker(mode: str, path: str):
+    """Parse the file once in this process and print wall time and peak RSS"""
+    from parsers.xml_parser import iter_conceptos, parse_bill
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+
+    frame_bytes = 0
+    if mode == "iter":
+        lines = sum(1 for _ in iter_conceptos(path))
+    else:
+        _, bill_df, _ = parse_bill(path, streaming=(mode == "streaming"))
+        lines = len(bill_df)
+
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if mode != "iter":
+        frame_bytes = int(bill_df.memory_usage(deep=True).sum())
+    print(f"{lines} {elapsed:.6f} {baseline} {peak} {frame_bytes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "PATH"))
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scaled.xml")
+        n_lines = build_scaled_file(args.scale, path)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{n_lines} conceptos, {size_mb:.1f} MB\n")
+        print(
+            f"{'mode':<10} {'best wall (s)':>14} {'peak RSS (MB)':>14} "
+            f"{'parse RSS (MB)':>15} {'frame B/line':>13}"
+        )
+
+        for mode in MODES:
+            runs = []
+            for _ in range(args.repeat):
+                # Each run in a fresh interpreter so peak RSS is not shared
+                out = subprocess.run(
+                    [sys.executable, __file__, "--worker", mode, path],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                ).stdout.split()
+                runs.append((float(out[1]), int(out[2]), int(out[3]), int(out[4])))
+
+            best = min(r[0] for r in runs)
+            # ru_maxrss is reported in KB on Linux
+            peak = max(r[2] for r in runs) / 1024
+            delta = max(r[2] - r[1] for r in runs) / 1024
+            frame = runs[0][3] / n_lines if runs[0][3] else 0
+            print(
+                f"{mode:<10} {best:>14.3f} {peak:>14.1f} {delta:>15.1f} "
+                f"{frame:>13.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Parse Cache Benchmark
+
+Simulates Streamlit reruns of the upload step: the same CFDI bytes go
+through ParseCache repeatedly, first with a cold cache and then warm, and
+from a fresh in-memory cache backed by the on-disk store. Every call into
+the XML parser is counted; the script exits with status 1 if any warm
+rerun parsed XML.
+
+Usage:
+    python benchmarks/bench_parse_cache.py --reruns 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=50)
+    args = parser.parse_args()
+
+    from parsers import parse_cache
+    from parsers.parse_cache import ParseCache
+
+    # Count every real parse behind the cache
+    parses = []
+    real_parse_bill = parse_cache.parse_bill
+
+    def counting_parse_bill(*a, **kw):
+        parses.append(1)
+        return real_parse_bill(*a, **kw)
+
+    parse_cache.parse_bill = counting_parse_bill
+
+    with open(TEST_DATA, "rb") as f:
+        data = f.read()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ParseCache(directory=tmp)
+
+        start = time.perf_counter()
+        expected = cache.parse_bytes(data)
+        cold = time.perf_counter() - start
+        cold_parses = len(parses)
+
+        start = time.perf_counter()
+        for _ in range(args.reruns):
+            result = cache.parse_bytes(data)
+        warm = (time.perf_counter() - start) / args.reruns
+        warm_parses = len(parses) - cold_parses
+
+        # A new process: empty memory, entry on disk
+        restarted = ParseCache(directory=tmp)
+        start = time.perf_counter()
+        from_disk = restarted.parse_bytes(data)
+        disk = time.perf_counter() - start
+        disk_parses = len(parses) - cold_parses - warm_parses
+
+    same = result is expected and (
+        from_disk[0] == expected[0]
+        and from_disk[1].equals(expected[1])
+        and from_disk[2] == expected[2]
+    )
+    print(f"{len(data) / 1e3:.0f} KB CFDI, {args.reruns} reruns")
+    print(f"  cold parse  {cold * 1000:8.2f} ms  ({cold_parses} XML parses)")
+    print(f"  warm rerun  {warm * 1000:8.3f} ms  ({warm_parses} XML parses)")
+    print(f"  from disk   {disk * 1000:8.2f} ms  ({disk_parses} XML parses)")
+    print(f"  same result: {same}")
+    if warm_parses or disk_parses or not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
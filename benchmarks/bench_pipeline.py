@@ -0,0 +1,241 @@
+"""
+End-to-End Pipeline Benchmark
+
+Runs the full parse_bill -> format_bill_data -> create_bills pipeline on
+copies of tests/test_data.xml (each with its own folio and fiscal UUID)
+against the local mock QuickBooks server, optionally spread over several
+realms with the RealmScheduler. Each job posts a batch of files, so the
+duplicate pre-check runs once per batch. Reports files/sec, API calls per
+bill by endpoint, p50/p99 latency per stage and per API request, 429s and
+client rate limiter waits. Exits with status 1 if any bill failed to post.
+
+Usage:
+    python benchmarks/bench_pipeline.py --files 50 --latency 0.02
+    python benchmarks/bench_pipeline.py --files 50 --batch-size 1
+    python benchmarks/bench_pipeline.py --realms 3 --rate-limit memory \\
+        --throttle-per-minute 500
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import uuid as uuid_module
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mock_qb_server import MockQuickBooksServer, configure_environment
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+def build_files(count: int, directory: str) -> List[str]:
+    """Write count copies of the test invoice with distinct folios and UUIDs"""
+    with open(TEST_DATA, encoding="utf-8") as f:
+        xml = f.read()
+
+    paths = []
+    for i in range(count):
+        copy = re.sub(r'Folio="[^"]*"', f'Folio="BENCH-{i + 1}"', xml, count=1)
+        copy = re.sub(
+            r'UUID="[^"]*"', f'UUID="{str(uuid_module.uuid4()).upper()}"', copy
+        )
+        path = os.path.join(directory, f"cfdi_{i + 1:05d}.xml")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(copy)
+        paths.append(path)
+    return paths
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def catalog_names(hit_ratio: float) -> List[str]:
+    """QuickBooks names of the invoice's products, cut to hit_ratio"""
+    from parsers.xml_parser import parse_bill
+    from qb.builder import format_bill_data
+
+    invoice_number, bill_df, _ = parse_bill(TEST_DATA)
+    lines = format_bill_data(invoice_number, bill_df)["line_items"]
+    products = list(dict.fromkeys(line["product"] for line in lines))
+    return products[: int(len(products) * hit_ratio)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--catalog-size", type=int, default=5000)
+    parser.add_argument(
+        "--hit-ratio",
+        type=float,
+        default=0.8,
+        help="Fraction of invoice products present in the mock catalog",
+    )
+    parser.add_argument("--realms", type=int, default=1)
+    parser.add_argument(
+        "--batch-size", type=int, default=10, help="Bills posted per job"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Jobs run at once per realm"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        choices=("off", "memory", "file"),
+        default="off",
+        help="Client-side rate limiter backend",
+    )
+    parser.add_argument(
+        "--throttle-per-minute",
+        type=int,
+        default=None,
+        help="Mock server requests per realm per minute before answering 429",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=10,
+        help="Mock server requests per realm in flight before answering 429",
+    )
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    # Parsing and formatting do not import qb_auth, so this can run before
+    # configure_environment sets the settings qb_auth reads on import
+    names = catalog_names(args.hit_ratio)
+    server = MockQuickBooksServer(
+        names,
+        latency=args.latency,
+        catalog_size=args.catalog_size,
+        rate_per_minute=args.throttle_per_minute,
+        max_concurrent=args.max_concurrent,
+    ).start()
+    configure_environment(server.url, state_dir, rate_limit=args.rate_limit)
+
+    from parsers.xml_parser import parse_bill
+    from qb import events
+    from qb.builder import format_bill_data
+    from qb.qb_bill import create_bills
+    from qb.realms import ClientPool, RealmScheduler
+
+    events.set_default_event_sink(events.NullSink())
+
+    realms = ["mock"] + [f"mock-{i + 1}" for i in range(args.realms - 1)]
+    pool = ClientPool()
+    for realm_id in realms[1:]:
+        pool.get(realm_id).set_tokens("mock", "mock", 86400)
+
+    stage_times: Dict[str, List[float]] = {"parse": [], "format": [], "post": []}
+
+    def post_batch(paths: List[str]) -> List[str]:
+        """Post a batch of files; returns an error message per file, or "" """
+        bills = []
+        for path in paths:
+            start = time.perf_counter()
+            invoice_number, bill_df, raw = parse_bill(path)
+            parsed = time.perf_counter()
+            bills.append(
+                format_bill_data(
+                    invoice_number,
+                    bill_df,
+                    vendor_rfc=raw.get("vendor_rfc", ""),
+                    totals=raw.get("totals"),
+                    uuid=raw.get("uuid", ""),
+                )
+            )
+            stage_times["parse"].append(parsed - start)
+            stage_times["format"].append(time.perf_counter() - parsed)
+
+        start = time.perf_counter()
+        results = create_bills(bills, ["1"] * len(bills), account_id="4")
+        stage_times["post"].append(time.perf_counter() - start)
+        return ["" if success else str(result)[:200] for success, result, _ in results]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = build_files(args.files, tmp)
+        # Deal the files out round-robin to the realms, in jobs of batch_size
+        size = max(1, args.batch_size)
+        batches = {}
+        for i, realm_id in enumerate(realms):
+            realm_files = files[i :: len(realms)]
+            batches[realm_id] = [
+                realm_files[j : j + size] for j in range(0, len(realm_files), size)
+            ]
+
+        server.mock.reset_stats()
+        start = time.perf_counter()
+        results = RealmScheduler(pool, concurrency=args.concurrency).run(
+            batches, post_batch
+        )
+        elapsed = time.perf_counter() - start
+
+    mock_stats = server.mock.stats()
+    server.stop()
+
+    jobs = [r for realm_results in results.values() for r in realm_results]
+    # (file, error) per bill; a job that raised fails all of its files
+    outcomes = []
+    for job in jobs:
+        errors = job.value if job.ok else [job.error] * len(job.job)
+        outcomes.extend(zip(job.job, errors))
+    posted = sum(1 for _, error in outcomes if not error)
+    bills = max(1, len(outcomes))
+    lines = len(parse_bill(TEST_DATA)[1])
+
+    print(
+        f"{args.files} files x {lines} lines, {len(realms)} realm(s), "
+        f"{args.batch_size} bills per job, {args.concurrency} jobs per realm, "
+        f"{args.latency * 1000:.0f} ms latency, {args.catalog_size} catalog "
+        f"items, rate limiter {args.rate_limit}\n"
+    )
+    print(f"posted:      {posted}/{len(outcomes)} bills in {elapsed:.2f}s")
+    print(f"throughput:  {len(outcomes) / elapsed:.2f} files/sec")
+    print(
+        f"API calls:   {mock_stats['requests'] / bills:.1f} per bill "
+        f"({mock_stats['requests']} total, {mock_stats['throttled']} throttled)"
+    )
+    for endpoint, count in sorted(mock_stats["by_endpoint"].items()):
+        print(f"  {endpoint:<12} {count / bills:6.2f} per bill")
+
+    print(f"\n{'latency (ms)':<14} {'p50':>9} {'p99':>9}")
+    job_latencies = [r.elapsed_s for r in jobs]
+    for label, values in [("job", job_latencies)] + list(stage_times.items()):
+        print(
+            f"{label:<14} {percentile(values, 50) * 1000:>9.1f} "
+            f"{percentile(values, 99) * 1000:>9.1f}"
+        )
+
+    for realm_id in realms:
+        client = pool.get(realm_id)
+        summary = client.metrics.summary()
+        line = (
+            f"{realm_id:<14} {summary['p50_ms']:>9.1f} {summary['p99_ms']:>9.1f}  "
+            f"{summary['requests']} requests, {summary['retries']} retries"
+        )
+        if client.rate_limiter is not None:
+            waits = client.rate_limiter.stats()
+            line += (
+                f", limiter p99 wait {waits['p99_wait_ms']:.1f} ms "
+                f"({waits['waited']} waited)"
+            )
+        print(line)
+
+    failures = [(path, error) for path, error in outcomes if error]
+    for path, error in failures[:5]:
+        print(f"\nFAILED {os.path.basename(path)}: {error}")
+    pool.close()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
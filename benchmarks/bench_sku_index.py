@@ -0,0 +1,116 @@
+"""
+SKU Index Benchmark
+
+Compares the legacy create_sku_mapping dict plus the per-line list of
+match attempts against the precompiled SkuIndex, on synthetic catalogs in
+the parent:parent-child form. Reports build time, lookups per second and
+hits; a fifth of the lookups are SKUs missing from the catalog, which the
+legacy scan still "matches" through their parent fragment.
+Event output is discarded so only the matching work is timed.
+
+Usage:
+    python benchmarks/bench_sku_index.py --items 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+
+def synthetic_catalog(n_items: int):
+    """Build (name, id, sku) tuples in the parent:parent-child form"""
+    catalog = []
+    for i in range(n_items):
+        parent = f"{i % 500}parent"
+        child = f"{parent}-child{i}"
+        catalog.append((f"{parent}:{child}", str(i + 1), child))
+    return catalog
+
+
+def legacy_match(items_map, product_name, sku):
+    """The match_attempts scan build_quickbooks_bill used before SkuIndex"""
+    match_attempts = []
+    if product_name:
+        match_attempts.append(product_name.lower())
+    if sku:
+        match_attempts.append(sku.lower())
+        if "-" in sku:
+            parent = sku.split("-")[0].lower()
+            child = sku.split("-")[1].lower()
+            match_attempts.append(f"{parent}:{sku}".lower())
+            match_attempts.append(parent)
+            match_attempts.append(child)
+        sku_clean = "".join(c for c in sku.lower() if c.isalnum())
+        if sku_clean != sku.lower():
+            match_attempts.append(sku_clean)
+
+    for attempt in match_attempts:
+        if attempt and attempt in items_map:
+            return items_map[attempt]
+    return None
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    from qb import events
+    from qb.qb_bill import create_sku_mapping
+    from qb.sku_index import SkuIndex
+
+    events.set_event_sink(events.NullSink())
+    rng = random.Random(0)
+
+    for n_items in args.items:
+        catalog = synthetic_catalog(n_items)
+        # Mix of hits by product, hits by SKU only and misses
+        lines = []
+        for _ in range(args.lookups):
+            name, _, sku = rng.choice(catalog)
+            roll = rng.random()
+            if roll < 0.4:
+                lines.append((name, sku))
+            elif roll < 0.8:
+                lines.append(("", sku.upper()))
+            else:
+                lines.append(("", f"missing-{sku}"))
+
+        items_map, legacy_build = timed(
+            lambda: create_sku_mapping([(name, item_id) for name, item_id, _ in catalog])
+        )
+        legacy_hits, legacy_lookup = timed(
+            lambda: sum(1 for p, s in lines if legacy_match(items_map, p, s))
+        )
+
+        index, index_build = timed(lambda: SkuIndex(catalog))
+        index_hits, index_lookup = timed(
+            lambda: sum(1 for p, s in lines if index.match_line(p, s))
+        )
+
+        print(f"{n_items} catalog items, {len(lines)} lookups")
+        print(
+            f"  legacy    build {legacy_build:7.3f}s  "
+            f"{len(lines) / legacy_lookup:>10,.0f} lookups/s  {legacy_hits} hits"
+        )
+        print(
+            f"  SkuIndex  build {index_build:7.3f}s  "
+            f"{len(lines) / index_lookup:>10,.0f} lookups/s  {index_hits} hits"
+        )
+        print(f"  lookup speedup: {legacy_lookup / index_lookup:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Mock QuickBooks Server
+
+A local stand-in for the QuickBooks Online API, used by the benchmarks. It
+serves the query endpoint for Item, Vendor, Account and Bill (conditions
+with =, LIKE, IN and >, plus STARTPOSITION/MAXRESULTS paging), reads of
+item/vendor/account/bill by ID, item and bill creates, and /batch with
+query and create operations. Latency, catalog size and throttling are
+configurable: past the per-minute or concurrent request limit of a realm
+it answers 429 like QuickBooks does.
+
+Usage:
+    server = MockQuickBooksServer(catalog_names, latency=0.05)
+    server.start()
+    configure_environment(server.url, state_dir)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+FROM_RE = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+PAGING_RE = re.compile(r"\b(STARTPOSITION|MAXRESULTS)\s+(\d+)", re.IGNORECASE)
+CONDITION_RE = re.compile(
+    r"([\w.]+)\s*(=|LIKE|>|<)\s*(?:'([^']*)'|(\w+))", re.IGNORECASE
+)
+IN_RE = re.compile(r"([\w.]+)\s+IN\s*\(([^)]*)\)", re.IGNORECASE)
+PATH_RE = re.compile(r"/v3/company/([^/]+)/(\w+)(?:/(\w+))?$")
+
+# Entities the query endpoint serves, by their URL name
+ENTITIES = {"item": "Item", "vendor": "Vendor", "account": "Account", "bill": "Bill"}
+
+# QuickBooks returns at most 1000 entities per query
+MAX_RESULTS = 1000
+
+CATALOG_TIME = "2024-01-01T00:00:00-08:00"
+
+
+def field_value(entity: Dict, field: str) -> str:
+    """Value of a possibly dotted field (e.g. MetaData.LastUpdatedTime)"""
+    value = entity
+    for part in field.split("."):
+        value = value.get(part, "") if isinstance(value, dict) else ""
+    if isinstance(value, dict):
+        value = value.get("value", "")
+    return str(value)
+
+
+def compile_condition(field: str, op: str, value):
+    """Build a predicate for one simple WHERE condition"""
+    op = op.upper()
+    if op == "IN":
+        return lambda entity: field_value(entity, field).lower() in value
+    value = value.lower()
+    if op == "LIKE":
+        inner = value.strip("%")
+        if "%" not in inner:
+            # The common '%text%' / 'text%' / '%text' forms, without a regex
+            if value.startswith("%") and value.endswith("%"):
+                return lambda entity: inner in field_value(entity, field).lower()
+            if value.endswith("%"):
+                return lambda entity: field_value(entity, field).lower().startswith(
+                    inner
+                )
+            if value.startswith("%"):
+                return lambda entity: field_value(entity, field).lower().endswith(
+                    inner
+                )
+        pattern = re.compile(re.escape(value).replace("%", ".*"))
+        return lambda entity: pattern.fullmatch(field_value(entity, field).lower())
+    if op == ">":
+        return lambda entity: field_value(entity, field).lower() > value
+    if op == "<":
+        return lambda entity: field_value(entity, field).lower() < value
+    return lambda entity: field_value(entity, field).lower() == value
+
+
+def parse_where(query: str) -> List[Tuple]:
+    """(field, op, value) conditions of a query's WHERE clause"""
+    if not re.search(r"\sWHERE\s", query, re.IGNORECASE):
+        return []
+    where = re.split(r"\sWHERE\s", query, 1, flags=re.IGNORECASE)[1]
+    where = PAGING_RE.sub("", where)
+
+    conditions = []
+    for field, values in IN_RE.findall(where):
+        names = {v.strip().strip("'").lower() for v in values.split(",")}
+        conditions.append((field, "IN", names))
+    for field, op, quoted, bare in CONDITION_RE.findall(IN_RE.sub("", where)):
+        conditions.append((field, op, quoted if quoted or not bare else bare))
+    return conditions
+
+
+def fault(message: str) -> Dict:
+    return {"Fault": {"Error": [{"Message": message}], "type": "ValidationFault"}}
+
+
+class MockQuickBooks:
+    """
+    In-memory QuickBooks data and query evaluation.
+
+    Args:
+        item_names: Names of the items in the catalog
+        latency: Seconds to sleep before answering each request
+        catalog_size: Pad the catalog with generated items up to this size
+        vendor_count: Number of generated vendors
+        rate_per_minute: Requests per realm per rolling minute before 429s
+            (None for no limit)
+        max_concurrent: Requests per realm in flight before 429s (None for
+            no limit)
+    """
+
+    def __init__(
+        self,
+        item_names: List[str],
+        latency: float = 0.0,
+        catalog_size: int = 0,
+        vendor_count: int = 10,
+        rate_per_minute: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.rate_per_minute = rate_per_minute
+        self.max_concurrent = max_concurrent
+
+        names = list(dict.fromkeys(item_names))
+        filler = max(0, catalog_size - len(names))
+        names += [f"FILLER:{i:07d}" for i in range(filler)]
+        self.data: Dict[str, List[Dict]] = {
+            "Item": [self._item(str(i + 1), name) for i, name in enumerate(names)],
+            "Vendor": [
+                {
+                    "Id": str(i + 1),
+                    "DisplayName": f"Vendor {i + 1}",
+                    "Active": True,
+                    "MetaData": {"LastUpdatedTime": CATALOG_TIME},
+                }
+                for i in range(vendor_count)
+            ],
+            "Account": [
+                {
+                    "Id": str(i + 1),
+                    "Name": name,
+                    "AccountType": account_type,
+                    "AccountSubType": "",
+                    "Active": True,
+                }
+                for i, (name, account_type) in enumerate(
+                    [
+                        ("Cost of Goods Sold", "Cost of Goods Sold"),
+                        ("Inventory Asset", "Other Current Asset"),
+                        ("Accounts Payable", "Accounts Payable"),
+                        ("Freight", "Expense"),
+                        ("Office Supplies", "Expense"),
+                        ("Uncategorized Expense", "Expense"),
+                        ("Purchases", "Expense"),
+                    ]
+                )
+            ],
+            "Bill": [],
+        }
+        self._by_id = {
+            entity: {e["Id"]: e for e in entities}
+            for entity, entities in self.data.items()
+        }
+
+        self._lock = threading.Lock()
+        self._recent: Dict[str, deque] = {}
+        self._in_flight: Counter = Counter()
+        self.reset_stats()
+
+    @property
+    def items(self) -> List[Dict]:
+        return self.data["Item"]
+
+    @staticmethod
+    def _item(item_id: str, name: str) -> Dict:
+        return {
+            "Id": item_id,
+            "Name": name,
+            "Sku": name.rsplit(":", 1)[-1],
+            "Type": "Inventory",
+            "Active": True,
+            "MetaData": {"LastUpdatedTime": CATALOG_TIME},
+        }
+
+    def reset_stats(self):
+        """Zero the request counters"""
+        with self._lock:
+            self.request_count = 0
+            self.throttled = 0
+            self.by_endpoint: Counter = Counter()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.request_count,
+                "throttled": self.throttled,
+                "by_endpoint": dict(self.by_endpoint),
+            }
+
+    def query(self, query: str) -> Dict:
+        """Evaluate a query string and build a QueryResponse"""
+        match = FROM_RE.search(query)
+        entity = match.group(1).capitalize() if match else "Item"
+        if entity not in self.data:
+            return fault(f"Unsupported entity {entity}")
+
+        paging = {k.upper(): int(v) for k, v in PAGING_RE.findall(query)}
+        start = max(1, paging.get("STARTPOSITION", 1))
+        size = min(MAX_RESULTS, paging.get("MAXRESULTS", 100))
+
+        predicates = [compile_condition(*c) for c in parse_where(query)]
+        with self._lock:
+            entities = list(self.data[entity])
+        matches = [e for e in entities if all(p(e) for p in predicates)]
+        page = matches[start - 1 : start - 1 + size]
+
+        response = {"startPosition": start, "maxResults": len(page)}
+        if page:
+            response[entity] = page
+        return {"QueryResponse": response}
+
+    def read(self, entity: str, entity_id: str) -> Tuple[int, Dict]:
+        found = self._by_id[entity].get(entity_id)
+        if found is None:
+            return 400, fault(f"Object Not Found: {entity} {entity_id}")
+        return 200, {entity: found}
+
+    def create(self, entity: str, payload: Dict) -> Tuple[int, Dict]:
+        """Validate and store a new Bill or Item"""
+        if entity == "Bill":
+            if payload.get("VendorRef", {}).get("value") not in self._by_id["Vendor"]:
+                return 400, fault("Invalid Reference Id: Vendor")
+            if not payload.get("Line"):
+                return 400, fault("Required param missing: Line")
+            for line in payload["Line"]:
+                detail = line.get("ItemBasedExpenseLineDetail")
+                if detail and detail["ItemRef"]["value"] not in self._by_id["Item"]:
+                    return 400, fault("Invalid Reference Id: Item")
+        elif entity == "Item":
+            if not payload.get("Name"):
+                return 400, fault("Required param missing: Name")
+        else:
+            return 400, fault(f"Unsupported create of {entity}")
+
+        with self._lock:
+            created = dict(payload, Id=str(len(self.data[entity]) + 1))
+            created["MetaData"] = {
+                "LastUpdatedTime": time.strftime("%Y-%m-%dT%H:%M:%S-08:00")
+            }
+            if entity == "Bill":
+                created["TotalAmt"] = round(
+                    sum(line.get("Amount", 0) for line in payload["Line"]), 2
+                )
+            self.data[entity].append(created)
+            self._by_id[entity][created["Id"]] = created
+        return 200, {entity: created}
+
+    def batch(self, body: Dict) -> Dict:
+        """Answer a BatchItemRequest, one entry per operation"""
+        responses = []
+        for operation in body.get("BatchItemRequest", []):
+            entry = {"bId": operation.get("bId")}
+            if "Query" in operation:
+                result = self.query(operation["Query"])
+                entry.update(result)
+            elif operation.get("operation") == "create":
+                entity = next(
+                    (k for k in operation if k not in ("bId", "operation")), ""
+                )
+                _, result = self.create(entity, operation.get(entity, {}))
+                entry.update(result)
+            else:
+                entry.update(fault("Unsupported operation"))
+            responses.append(entry)
+        return {"BatchItemResponse": responses}
+
+    def _admit(self, realm_id: str) -> bool:
+        """Count a request against its realm's limits; False means throttle"""
+        now = time.monotonic()
+        with self._lock:
+            self.request_count += 1
+            recent = self._recent.setdefault(realm_id, deque())
+            while recent and now - recent[0] >= 60:
+                recent.popleft()
+            if (
+                self.rate_per_minute is not None
+                and len(recent) >= self.rate_per_minute
+            ) or (
+                self.max_concurrent is not None
+                and self._in_flight[realm_id] >= self.max_concurrent
+            ):
+                self.throttled += 1
+                return False
+            recent.append(now)
+            self._in_flight[realm_id] += 1
+            return True
+
+    def handle(self, method: str, path: str, body: Dict = None) -> Tuple[int, Dict]:
+        parsed = urlparse(path)
+        match = PATH_RE.search(parsed.path)
+        if not match:
+            return 404, fault(f"Unknown path {parsed.path}")
+        realm_id, endpoint, entity_id = match.groups()
+
+        if not self._admit(realm_id):
+            return 429, fault("ThrottleExceeded")
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                self.by_endpoint[f"{method} {endpoint}"] += 1
+            return self._route(method, endpoint, entity_id, parsed.query, body)
+        finally:
+            with self._lock:
+                self._in_flight[realm_id] -= 1
+
+    def _route(self, method, endpoint, entity_id, query_string, body):
+        if endpoint == "query":
+            query = parse_qs(query_string).get("query", [""])[0]
+            result = self.query(query)
+            return (400 if "Fault" in result else 200), result
+        if endpoint == "batch" and method == "POST":
+            return 200, self.batch(body or {})
+
+        entity = ENTITIES.get(endpoint)
+        if entity is None:
+            return 404, fault(f"Unknown endpoint {endpoint}")
+        if method == "GET" and entity_id:
+            return self.read(entity, entity_id)
+        if method == "POST" and not entity_id:
+            return self.create(entity, body or {})
+        return 400, fault(f"Unsupported {method} on {endpoint}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = json.loads(self.rfile.read(length)) if length else None
+
+        status, body = self.server.mock.handle(method, self.path, request_body)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        self._respond("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockQuickBooksServer:
+    """
+    Threaded HTTP server wrapping a MockQuickBooks instance.
+
+    Args:
+        item_names: Names of the items in the catalog
+        latency: Seconds to sleep before answering each request
+        port: Port to listen on, 0 for any free port
+        **options: Catalog and throttling options of MockQuickBooks
+    """
+
+    def __init__(
+        self, item_names: List[str], latency: float = 0.0, port: int = 0, **options
+    ):
+        self.mock = MockQuickBooks(item_names, latency, **options)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self.mock
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def configure_environment(
+    url: str, state_dir: str, realm_id: str = "mock", rate_limit: str = "off"
+):
+    """
+    Point the qb package at a mock server. Call before importing it.
+
+    Tokens never expire, so no OAuth client (and no request to Intuit's
+    discovery endpoint) is ever built and runs work offline. The ledger,
+    caches, token store and rate limiter state go to state_dir, so runs
+    start clean and never touch the real .qb_cache.
+
+    Args:
+        url: Mock server URL
+        state_dir: Directory for the package's local state
+        realm_id: Company ID of the default client
+        rate_limit: Client rate limiter backend: "off", "memory" or "file"
+    """
+    os.environ["QB_BASE_URL"] = url
+    os.environ["QB_COMPANY_ID"] = realm_id
+    os.environ["QB_CLIENT_ID"] = "mock"
+    os.environ["QB_CLIENT_SECRET"] = "mock"
+    os.environ["QB_ACCESS_TOKEN"] = "mock"
+    os.environ["QB_REFRESH_TOKEN"] = "mock"
+    os.environ["QB_TOKEN_EXPIRY"] = str(int(time.time()) + 86400)
+    os.environ["QB_TOKEN_AUTO_REFRESH"] = "false"
+    os.environ["QB_RATE_LIMIT_BACKEND"] = rate_limit
+    for name, filename in (
+        ("QB_TOKEN_STORE_PATH", "tokens.json"),
+        ("QB_TOKEN_LOCK_PATH", "token.lock"),
+        ("QB_LEDGER_PATH", "ledger.sqlite"),
+        ("QB_MAPPING_STORE_PATH", "mappings.sqlite"),
+        ("QB_ITEM_INDEX_PATH", "items.sqlite"),
+        ("QB_RATE_LIMIT_DIR", "rate_limit"),
+    ):
+        os.environ[name] = os.path.join(state_dir, filename)
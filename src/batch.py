@@ -0,0 +1,226 @@
+"""
+Mama's Bill Wizard - Batch Ingestion
+
+Headless command that parses a whole directory (or glob) of CFDI XML files
+across a process pool and writes a consolidated per-file summary.
+
+Usage:
+    python src/batch.py path/to/cfdis -o summary.csv
+    python src/batch.py "path/to/cfdis/*.xml" --workers 8 -o summary.json
+    python src/batch.py path/to/cfdis --check-ledger
+"""
+
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+
+from parsers.money import cents_to_amount, reconcile_bill
+from parsers.xml_parser import parse_bill
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = [
+    "file",
+    "status",
+    "invoice_number",
+    "uuid",
+    "posted_bill_id",
+    "line_count",
+    "total",
+    "reconciled",
+    "error",
+]
+
+
+def collect_files(target: str) -> List[str]:
+    """
+    Resolve a directory or glob pattern to a sorted list of XML files.
+
+    Args:
+        target: Directory to walk recursively, or a glob pattern
+
+    Returns:
+        List of file paths
+    """
+    if os.path.isdir(target):
+        files = []
+        for dirpath, _, filenames in os.walk(target):
+            files.extend(
+                os.path.join(dirpath, name)
+                for name in filenames
+                if name.lower().endswith(".xml")
+            )
+        return sorted(files)
+
+    return sorted(glob.glob(target, recursive=True))
+
+
+def summarize_file(file_path: str, streaming: bool = False) -> Dict:
+    """
+    Parse a single CFDI file and reduce it to a small summary row.
+
+    Runs inside the worker processes; only the summary is sent back to the
+    parent, never the DataFrame, so results stay cheap to pickle.
+
+    Args:
+        file_path: Path to the XML file
+        streaming: Use the streaming parser
+
+    Returns:
+        Dict with the SUMMARY_FIELDS keys
+    """
+    summary = {field: "" for field in SUMMARY_FIELDS}
+    summary["file"] = file_path
+
+    try:
+        invoice_number, bill_df, bill_data = parse_bill(
+            file_path, streaming=streaming
+        )
+        # Unparseable amounts are 0 cents and reported by the reconciliation
+        reconciliation = reconcile_bill(bill_df, bill_data["totals"])
+
+        summary["status"] = "ok"
+        summary["invoice_number"] = invoice_number
+        summary["uuid"] = bill_data["uuid"]
+        summary["line_count"] = len(bill_df)
+        summary["total"] = cents_to_amount(reconciliation.line_total_cents)
+        summary["reconciled"] = reconciliation.ok
+        summary["error"] = "; ".join(reconciliation.errors)
+    except Exception as e:
+        summary["status"] = "error"
+        summary["error"] = str(e)
+
+    return summary
+
+
+def _summarize_streaming(file_path: str) -> Dict:
+    return summarize_file(file_path, streaming=True)
+
+
+def run_batch(
+    files: List[str], workers: int = None, streaming: bool = False
+) -> List[Dict]:
+    """
+    Parse many CFDI files across a process pool.
+
+    Args:
+        files: Paths of the XML files to parse
+        workers: Number of worker processes (defaults to the CPU count)
+        streaming: Use the streaming parser in each worker
+
+    Returns:
+        List of summary dicts, in the same order as files
+    """
+    if not files:
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    func = _summarize_streaming if streaming else summarize_file
+
+    if workers == 1:
+        return [func(path) for path in files]
+
+    # Hand out work in chunks so per-task IPC does not dominate small files
+    chunksize = max(1, len(files) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, files, chunksize=chunksize))
+
+
+def mark_posted(results: List[Dict]) -> int:
+    """
+    Fill posted_bill_id for files whose CFDI UUID is already in the ledger.
+
+    The whole batch is checked with one ledger lookup. The ledger is
+    imported here so plain parsing never loads the QuickBooks client.
+
+    Args:
+        results: Summary dicts from run_batch, updated in place
+
+    Returns:
+        int: Number of files already posted
+    """
+    from qb.ledger import get_ledger
+
+    posted = get_ledger().lookup(r["uuid"] for r in results if r["uuid"])
+    for result in results:
+        record = posted.get(result["uuid"])
+        if record:
+            result["posted_bill_id"] = record["bill_id"]
+    return sum(1 for r in results if r["posted_bill_id"])
+
+
+def write_summary(results: List[Dict], output_path: str):
+    """Write summary rows as CSV, or JSON when the path ends in .json"""
+    if output_path.lower().endswith(".json"):
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+        return
+
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Parse a directory of CFDI XML files in parallel"
+    )
+    parser.add_argument("target", help="Directory or glob pattern of XML files")
+    parser.add_argument(
+        "-o", "--output", default="batch_summary.csv", help="CSV or JSON output path"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "--streaming", action="store_true", help="Use the streaming XML parser"
+    )
+    parser.add_argument(
+        "--check-ledger",
+        action="store_true",
+        help="Report invoices already posted to QuickBooks, from the local ledger",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    files = collect_files(args.target)
+    if not files:
+        print(f"No XML files found for {args.target}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    results = run_batch(files, workers=args.workers, streaming=args.streaming)
+    elapsed = time.perf_counter() - start
+
+    already_posted = mark_posted(results) if args.check_ledger else 0
+    write_summary(results, args.output)
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    total_lines = sum(r["line_count"] or 0 for r in results)
+    throughput = len(files) / elapsed if elapsed > 0 else float("inf")
+
+    print(f"Parsed {len(files)} files ({failed} failed, {total_lines} lines)")
+    if already_posted:
+        print(f"{already_posted} invoices were already posted to QuickBooks")
+    print(f"Elapsed: {elapsed:.2f}s, throughput: {throughput:.1f} files/sec")
+    print(f"Summary written to {args.output}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
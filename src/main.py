@@ -15,132 +15,44 @@ sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
 )
 
-from parsers.xml_parser import parse_bill
-from qb.qb_auth import check_qb_connection
+from parsers.parse_cache import content_hash, get_parse_cache
+from qb.builder import format_bill_data
+from qb.qb_auth import get_request_metrics
 from qb.qb_api import get_vendors, get_accounts
 from qb.qb_bill import (
     get_all_items,
     create_bill,
-    create_sku_mapping,
     find_item_by_sku_or_name,
+    suggest_items,
+)
+from qb.ledger import check_duplicates
+from qb.mapping_store import get_mapping_store
+from qb.sku_index import get_sku_index
+from ui.streamlit_adapter import (
+    check_qb_connection,
+    install_streamlit_adapter,
+    render_diagnostics,
 )
 
 st.set_page_config(page_title="Mama's Bill Wizard", page_icon="📊", layout="wide")
 
 
-def format_bill_data(invoice_number, bill_df):
-    """Format bill dataframe into the structure expected by the bill builder"""
-    line_items = []
-
-    # DEBUGGING: Display the DataFrame schema and sample values
-    st.write("DataFrame Info:")
-    st.write(f"Columns: {bill_df.columns.tolist()}")
-    st.write("First few rows:")
-    st.write(bill_df.head())
-
-    # Process each row
-    for _, row in bill_df.iterrows():
-        # CRITICAL: Extract SKU information for QuickBooks matching
-        full_sku = row.get("sku", "")
-        parent_sku = row.get("parent_sku", "")
-        product_id = row.get("product_id", "")
-
-        # For QuickBooks matching, we need the product in format: "parent_sku:full_sku"
-        qb_product = ""
-
-        # If both parent and full SKU are available, format as parent:full
-        if parent_sku and full_sku:
-            qb_product = f"{parent_sku}:{full_sku}"
-            st.write(f"Formatted QB product: {qb_product}")
-        # If only full_sku is available
-        elif full_sku:
-            # If it contains a dash, extract parent component
-            if "-" in full_sku:
-                parent = full_sku.split("-")[0]
-                qb_product = f"{parent}:{full_sku}"
-            else:
-                qb_product = f"{full_sku}:{full_sku}"
-            st.write(f"Derived QB product: {qb_product}")
-        # Fallback to the product field
-        else:
-            qb_product = row.get("product", "")
-            st.write(f"Using fallback product: {qb_product}")
-
-        # Get the description - in QB, this is the NoIdentificacion (product_id)
-        description = product_id or row.get("description", "")
-
-        # If description is empty, use the full_description field
-        if not description and "full_description" in row:
-            description = row["full_description"]
-            st.write(f"Using full_description as fallback: {description[:30]}...")
-
-        # Get amount with proper conversion
-        amount = 0.0
-        try:
-            # Try Importe first (standard CFDI field)
-            if "Importe" in row and row["Importe"]:
-                amount = float(row["Importe"])
-            # Fallback to amount field
-            elif "amount" in row and row["amount"]:
-                amount = float(row["amount"])
-        except (ValueError, TypeError) as e:
-            st.error(f"Could not convert amount: {e}")
-            amount = 0.0
-
-        # If amount is still zero, try to search in other columns
-        if amount <= 0:
-            for col in bill_df.columns:
-                if any(term in col.lower() for term in ["amount", "total", "importe"]):
-                    try:
-                        value = row[col]
-                        if isinstance(value, str):
-                            value = "".join(c for c in value if c.isdigit() or c == ".")
-                        amt = float(value)
-                        if amt > 0:
-                            amount = amt
-                            st.write(f"Found amount {amount} in column {col}")
-                            break
-                    except (ValueError, TypeError):
-                        pass
-
-        # Get quantity
-        quantity = 1.0
-        try:
-            if "Cantidad" in row and row["Cantidad"]:
-                quantity = float(row["Cantidad"])
-            elif "quantity" in row and row["quantity"]:
-                quantity = float(row["quantity"])
-        except (ValueError, TypeError):
-            quantity = 1.0
-
-        # Make sure quantity is positive
-        if quantity <= 0:
-            quantity = 1.0
-
-        # DEBUG OUTPUT
-        st.write(
-            f"Item: QB Product={qb_product}, SKU={full_sku}, ID={product_id}, Amount={amount}, Qty={quantity}"
-        )
-
-        # Create the line item with correctly formatted fields for QB matching
-        item = {
-            "product": qb_product,  # Format as parent:sku for QB matching
-            "sku": full_sku,  # The specific SKU
-            "description": description,  # Use product_id as description
-            "amount": amount,
-            "quantity": quantity,
-        }
-
-        line_items.append(item)
-
-    # Provide summary
-    st.success(f"Successfully created {len(line_items)} line items!")
-
-    return {"invoice_number": invoice_number, "line_items": line_items}
-
-
 def main():
     """Main application function"""
+    verbose = st.sidebar.checkbox(
+        "Verbose diagnostics",
+        value=False,
+        help="Show every processing trace as it happens instead of one collapsed report",
+    )
+    report = install_streamlit_adapter(verbose=verbose)
+    try:
+        run_app()
+    finally:
+        render_diagnostics(report)
+
+
+def run_app():
+    """Render the upload, QuickBooks details and submission sections"""
     st.title("Mama's Bill Wizard")
 
     if not check_qb_connection():
@@ -155,9 +67,24 @@ def main():
         bill_data = None
         if upload_file is not None:
             try:
-                invoice_number, bill_df, raw_bill_data = parse_bill(upload_file)
+                # Reruns and re-uploads of the same bytes skip parsing
+                upload_bytes = upload_file.getvalue()
+                upload_key = content_hash(upload_bytes)
+                invoice_number, bill_df, raw_bill_data = (
+                    get_parse_cache().parse_bytes(upload_bytes, upload_key)
+                )
 
-                bill_data = format_bill_data(invoice_number, bill_df)
+                formatted_bills = st.session_state.setdefault("formatted_bills", {})
+                if upload_key not in formatted_bills:
+                    formatted_bills.clear()
+                    formatted_bills[upload_key] = format_bill_data(
+                        invoice_number,
+                        bill_df,
+                        vendor_rfc=raw_bill_data.get("vendor_rfc", ""),
+                        totals=raw_bill_data.get("totals"),
+                        uuid=raw_bill_data.get("uuid", ""),
+                    )
+                bill_data = formatted_bills[upload_key]
 
                 st.success(f"Successfully parsed invoice #{invoice_number}")
                 st.dataframe(bill_df)
@@ -257,37 +184,34 @@ def main():
                 else:
                     st.write("No matching items found")
 
+            if st.checkbox("Show API Request Metrics"):
+                st.json(get_request_metrics())
+                st.write("Learned item mappings")
+                st.json(get_mapping_store().stats())
+                st.write("Parse cache")
+                st.json(get_parse_cache().stats())
+
             # SKU testing section
             if st.checkbox("Test SKU Matching"):
                 test_sku = st.text_input("Enter a SKU to test matching")
                 if test_sku and st.button("Test Match"):
                     st.write(f"Testing matching for SKU: {test_sku}")
 
-                    # Create SKU mapping
-                    all_items = get_all_items()
-                    items_map = create_sku_mapping(all_items)
-
-                    # Try different matching approaches
-                    match_attempts = [
-                        test_sku.lower(),
-                        "".join(c for c in test_sku.lower() if c.isalnum()),
-                    ]
+                    # Probe the precompiled SKU index
+                    get_all_items()
+                    match = get_sku_index().probe(test_sku)
 
-                    if "-" in test_sku:
-                        match_attempts.append(test_sku.split("-")[-1].lower())
-
-                    # Check each match attempt
-                    for attempt in match_attempts:
-                        if attempt in items_map:
-                            item_id = items_map[attempt]
-                            # Find the name that matches this ID
-                            matching_name = next(
-                                (name for name, id in all_items if id == item_id),
-                                "Unknown",
+                    if match:
+                        st.success(
+                            f"✅ Matched using: {match.key} "
+                            f"(confidence {match.confidence:.2f})"
+                        )
+                        st.write(f"Item: {match.name} (ID: {match.item_id})")
+                        if match.ambiguous:
+                            st.warning(
+                                f"{match.candidates} items share this key; "
+                                "the match is ambiguous"
                             )
-                            st.success(f"✅ Matched using: {attempt}")
-                            st.write(f"Item: {matching_name} (ID: {item_id})")
-                            break
                     else:
                         st.error(f"❌ No match found for SKU: {test_sku}")
 
@@ -302,6 +226,65 @@ def main():
                         else:
                             st.error("No match found via direct query either")
 
+            # Ledger and DocNumber matches both block a submission, so both
+            # must be overridable; checked once per invoice and vendor
+            allow_duplicate = False
+            duplicate_checks = st.session_state.setdefault("duplicate_checks", {})
+            check_key = None
+            if selected_vendor_id and bill_data is not None:
+                check_key = (upload_key, selected_vendor_id)
+                if check_key not in duplicate_checks:
+                    try:
+                        duplicate_checks[check_key] = check_duplicates(
+                            [bill_data], [selected_vendor_id]
+                        )[0]
+                    except Exception as e:
+                        st.error(f"Error checking for duplicate bills: {str(e)}")
+                        duplicate_checks[check_key] = None
+                duplicate = duplicate_checks[check_key]
+                if duplicate:
+                    st.warning(f"This invoice looks already posted: {duplicate}")
+                    allow_duplicate = st.checkbox("Submit it again anyway")
+
+            allow_unreconciled = False
+            reconciliation = (bill_data or {}).get("reconciliation")
+            if reconciliation is not None and not reconciliation.ok:
+                allow_unreconciled = st.checkbox(
+                    "Submit even though the amounts do not match the invoice totals"
+                )
+
+            # Fuzzy candidates are only used once the user confirms them
+            confirmed_items = {}
+            if use_items and bill_data is not None:
+                item_suggestions = st.session_state.setdefault("item_suggestions", {})
+                if st.button("Find candidates for unmatched items"):
+                    item_suggestions.clear()
+                    item_suggestions[upload_key] = suggest_items(bill_data)
+
+                suggestions = item_suggestions.get(upload_key)
+                if suggestions:
+                    st.write(
+                        "Confirm the inventory item of each unmatched line. "
+                        "Unconfirmed lines use the default expense account."
+                    )
+                    for index, candidates in suggestions.items():
+                        line = bill_data["line_items"][index]
+                        label = line.get("product") or line.get("sku") or ""
+                        choice = st.selectbox(
+                            f"Line {index + 1}: {label}",
+                            [None] + candidates,
+                            format_func=lambda m: (
+                                "Use the default expense account"
+                                if m is None
+                                else f"{m.name} (score {m.score:.2f})"
+                            ),
+                            key=f"confirm_item_{upload_key}_{index}",
+                        )
+                        if choice is not None:
+                            confirmed_items[index] = choice.item_id
+                elif suggestions is not None:
+                    st.info("Every line matches an inventory item")
+
             if selected_vendor_id and bill_data is not None:
                 if st.button("Submit to QuickBooks"):
                     try:
@@ -312,7 +295,12 @@ def main():
                             txn_date=bill_date.strftime("%Y-%m-%d"),
                             use_item_based_expense=use_items,
                             default_expense_account_id=selected_account_id,
+                            allow_unreconciled=allow_unreconciled,
+                            allow_duplicate=allow_duplicate,
+                            confirmed_items=confirmed_items,
                         )
+                        # The ledger or QuickBooks may know the invoice now
+                        duplicate_checks.pop(check_key, None)
 
                         if success:
                             st.success(
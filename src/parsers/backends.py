@@ -0,0 +1,252 @@
+"""
+XML Parser Backends
+
+This module reads the parts of a CFDI document that parse_bill needs (the
+Comprobante, Emisor and document-level Impuestos attributes, every
+cfdi:Concepto, the cce20:ComercioExterior complement and the
+tfd:TimbreFiscalDigital stamp) through an interchangeable backend: the standard library
+ElementTree, or lxml with precompiled XPath expressions. Set
+CFDI_PARSER_BACKEND to "etree" (the default), "lxml", or "auto" to use lxml
+whenever it is installed; lxml falls back to ElementTree when it is not.
+
+ElementTree stays the default because its C parser already hands out
+attributes as dicts: on 10,000 conceptos it parses faster and with half
+the memory of lxml (see benchmarks/bench_backends.py).
+"""
+
+import logging
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml is optional
+    lxml_etree = None
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES = {
+    "cfdi": "http://www.sat.gob.mx/cfd/4",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+    "cce20": "http://www.sat.gob.mx/ComercioExterior20",
+    "tfd": "http://www.sat.gob.mx/TimbreFiscalDigital",
+}
+
+DEFAULT_BACKEND = os.getenv("CFDI_PARSER_BACKEND", "etree")
+
+# cfdi:Concepto attributes read by build_line_item
+CONCEPTO_ATTRIBUTES = (
+    "NoIdentificacion",
+    "Descripcion",
+    "Cantidad",
+    "ValorUnitario",
+    "Importe",
+)
+
+
+class CfdiDocument(NamedTuple):
+    """The parts of a CFDI read by a backend, as attribute mappings"""
+
+    comprobante: Dict[str, str]
+    emisor: Dict[str, str]
+    impuestos: Dict[str, str]
+    # One mapping per cfdi:Concepto holding at least CONCEPTO_ATTRIBUTES,
+    # or None when the document has no cfdi:Conceptos element
+    conceptos: Optional[List[Dict[str, str]]]
+    # cce20:ComercioExterior attributes and its cce20:Mercancia attributes,
+    # empty when the document has no foreign trade complement
+    comercio_exterior: Dict[str, str]
+    mercancias: List[Dict[str, str]]
+    # tfd:TimbreFiscalDigital attributes (UUID, FechaTimbrado, ...), empty
+    # when the document is not stamped
+    timbre: Dict[str, str]
+
+
+class ParserBackend:
+    """
+    Reads a CFDI document into a CfdiDocument.
+
+    Backends raise FileNotFoundError for a missing file and
+    xml.etree.ElementTree.ParseError for malformed XML, whatever library
+    they use underneath.
+    """
+
+    name = ""
+
+    def read(self, file_path) -> CfdiDocument:
+        """
+        Parse a CFDI document.
+
+        Args:
+            file_path: Path or binary file-like object of the XML file
+
+        Returns:
+            CfdiDocument
+        """
+        raise NotImplementedError
+
+
+class ElementTreeBackend(ParserBackend):
+    """Standard library backend using namespaced find/findall"""
+
+    name = "etree"
+
+    def read(self, file_path) -> CfdiDocument:
+        root = ET.parse(file_path).getroot()
+
+        emisor = root.find("cfdi:Emisor", NAMESPACES)
+        impuestos = root.find("cfdi:Impuestos", NAMESPACES)
+        conceptos = root.find("cfdi:Conceptos", NAMESPACES)
+        comercio = root.find("cfdi:Complemento/cce20:ComercioExterior", NAMESPACES)
+        mercancias = (
+            comercio.findall("cce20:Mercancias/cce20:Mercancia", NAMESPACES)
+            if comercio is not None
+            else []
+        )
+        timbre = root.find("cfdi:Complemento/tfd:TimbreFiscalDigital", NAMESPACES)
+
+        return CfdiDocument(
+            comprobante=root.attrib,
+            emisor=emisor.attrib if emisor is not None else {},
+            impuestos=impuestos.attrib if impuestos is not None else {},
+            conceptos=(
+                [c.attrib for c in conceptos.findall("cfdi:Concepto", NAMESPACES)]
+                if conceptos is not None
+                else None
+            ),
+            comercio_exterior=comercio.attrib if comercio is not None else {},
+            mercancias=[m.attrib for m in mercancias],
+            timbre=timbre.attrib if timbre is not None else {},
+        )
+
+
+class LxmlBackend(ParserBackend):
+    """
+    lxml backend; the XPath expressions are compiled once per process.
+
+    Each concepto attribute is pulled for the whole document by one XPath
+    evaluation, which stays in C instead of creating a Python proxy per
+    element; documents where some concepto lacks one of the attributes
+    are read element by element instead.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        if lxml_etree is None:
+            raise ImportError("lxml is not installed")
+
+        # Never resolve external entities or touch the network
+        self._parser = lxml_etree.XMLParser(
+            resolve_entities=False, no_network=True, huge_tree=True
+        )
+        self._emisor = lxml_etree.XPath("cfdi:Emisor", namespaces=NAMESPACES)
+        self._impuestos = lxml_etree.XPath("cfdi:Impuestos", namespaces=NAMESPACES)
+        self._has_conceptos = lxml_etree.XPath(
+            "boolean(cfdi:Conceptos)", namespaces=NAMESPACES
+        )
+        self._conceptos = lxml_etree.XPath(
+            "cfdi:Conceptos/cfdi:Concepto", namespaces=NAMESPACES
+        )
+        self._count_conceptos = lxml_etree.XPath(
+            "count(cfdi:Conceptos/cfdi:Concepto)", namespaces=NAMESPACES
+        )
+        self._concepto_attributes = [
+            lxml_etree.XPath(
+                f"cfdi:Conceptos/cfdi:Concepto/@{name}",
+                namespaces=NAMESPACES,
+                smart_strings=False,
+            )
+            for name in CONCEPTO_ATTRIBUTES
+        ]
+        self._comercio_exterior = lxml_etree.XPath(
+            "cfdi:Complemento/cce20:ComercioExterior", namespaces=NAMESPACES
+        )
+        self._mercancias = lxml_etree.XPath(
+            "cfdi:Complemento/cce20:ComercioExterior/cce20:Mercancias/cce20:Mercancia",
+            namespaces=NAMESPACES,
+        )
+        self._timbre = lxml_etree.XPath(
+            "cfdi:Complemento/tfd:TimbreFiscalDigital", namespaces=NAMESPACES
+        )
+
+    def _first_attrib(self, xpath, root) -> Dict[str, str]:
+        found = xpath(root)
+        return dict(found[0].attrib) if found else {}
+
+    def _read_conceptos(self, root) -> List[Dict[str, str]]:
+        count = int(self._count_conceptos(root))
+        columns = [xpath(root) for xpath in self._concepto_attributes]
+        if all(len(values) == count for values in columns):
+            return [dict(zip(CONCEPTO_ATTRIBUTES, row)) for row in zip(*columns)]
+        return [dict(c.attrib) for c in self._conceptos(root)]
+
+    def read(self, file_path) -> CfdiDocument:
+        try:
+            if isinstance(file_path, (str, os.PathLike)):
+                with open(file_path, "rb") as f:
+                    tree = lxml_etree.parse(f, self._parser)
+            else:
+                tree = lxml_etree.parse(file_path, self._parser)
+        except lxml_etree.XMLSyntaxError as e:
+            raise ET.ParseError(str(e))
+
+        root = tree.getroot()
+        return CfdiDocument(
+            comprobante=dict(root.attrib),
+            emisor=self._first_attrib(self._emisor, root),
+            impuestos=self._first_attrib(self._impuestos, root),
+            conceptos=(
+                self._read_conceptos(root) if self._has_conceptos(root) else None
+            ),
+            comercio_exterior=self._first_attrib(self._comercio_exterior, root),
+            mercancias=[dict(m.attrib) for m in self._mercancias(root)],
+            timbre=self._first_attrib(self._timbre, root),
+        )
+
+
+BACKENDS = {
+    ElementTreeBackend.name: ElementTreeBackend,
+    LxmlBackend.name: LxmlBackend,
+}
+
+_instances: Dict[str, ParserBackend] = {}
+
+
+def available_backends() -> List[str]:
+    """Names of the backends usable in this environment"""
+    return [name for name in BACKENDS if name != "lxml" or lxml_etree is not None]
+
+
+def get_backend(name: str = None) -> ParserBackend:
+    """
+    Return a parser backend by name.
+
+    Args:
+        name: "lxml", "etree" or "auto"; defaults to CFDI_PARSER_BACKEND.
+            "auto" prefers lxml, and asking for lxml when it is not
+            installed falls back to ElementTree with a warning.
+
+    Returns:
+        ParserBackend
+
+    Raises:
+        ValueError: If the name is not a known backend
+    """
+    name = (name or DEFAULT_BACKEND).strip().lower()
+    if name == "auto":
+        name = "lxml" if lxml_etree is not None else "etree"
+    elif name not in BACKENDS:
+        raise ValueError(
+            f"Unknown parser backend '{name}', expected one of: auto, "
+            + ", ".join(BACKENDS)
+        )
+    elif name == "lxml" and lxml_etree is None:
+        logger.warning("lxml is not installed, parsing with ElementTree instead")
+        name = "etree"
+
+    backend = _instances.get(name)
+    if backend is None:
+        backend = _instances[name] = BACKENDS[name]()
+    return backend
@@ -0,0 +1,238 @@
+"""
+Fixed-Point Money Helpers
+
+This module carries CFDI amounts as integer cents from the parser to the
+QuickBooks payload, so no amount is ever rounded through binary floats,
+and reconciles the line items of a bill against the totals declared on its
+cfdi:Comprobante before anything is posted.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+CENT = Decimal("0.01")
+UNIT_PRICE_STEP = Decimal("0.0001")
+
+# Largest difference allowed between Importe and Cantidad * ValorUnitario
+DEFAULT_TOLERANCE_CENTS = 1
+
+
+def to_cents(value) -> int:
+    """
+    Convert an amount to integer cents, rounding half up.
+
+    Args:
+        value: Amount as a string, int, float or Decimal
+
+    Returns:
+        int: The amount in cents
+
+    Raises:
+        ValueError: If the value is not a finite number
+    """
+    try:
+        # Floats go through repr so 0.1 means "0.1", not its binary expansion
+        text = repr(value) if isinstance(value, float) else str(value).strip()
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def cents_array(values) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a sequence of amounts to an int64 array of cents.
+
+    Args:
+        values: Amount strings (or numbers)
+
+    Returns:
+        Tuple of the cents array (0 where invalid) and a mask of valid values
+    """
+    cents = np.zeros(len(values), dtype=np.int64)
+    valid = np.ones(len(values), dtype=bool)
+    for pos, value in enumerate(values):
+        try:
+            cents[pos] = to_cents(value)
+        except ValueError:
+            valid[pos] = False
+    return cents, valid
+
+
+def cents_to_amount(cents: int) -> float:
+    """
+    Amount for a JSON payload.
+
+    The float is the one closest to the exact decimal, so it serializes
+    back to exactly two decimals.
+    """
+    return float(Decimal(int(cents)).scaleb(-2))
+
+
+def line_cents(item: Dict) -> int:
+    """
+    Cents of a formatted line item.
+
+    Uses amount_cents when the line carries it, else converts amount.
+
+    Raises:
+        ValueError: If the amount is not a valid number
+    """
+    if item.get("amount_cents") is not None:
+        return int(item["amount_cents"])
+    return to_cents(item.get("amount", 0))
+
+
+def unit_price(cents: int, quantity) -> float:
+    """Unit price of a line, exact to four decimals"""
+    price = Decimal(int(cents)).scaleb(-2) / Decimal(repr(float(quantity)))
+    return float(price.quantize(UNIT_PRICE_STEP, rounding=ROUND_HALF_UP))
+
+
+def product_cents(quantity, rate) -> int:
+    """
+    Cents of quantity * rate, computed in Decimal and rounded half up.
+
+    Floats go through repr, so a quantity or rate parsed from "0.1" is
+    multiplied as exactly 0.1.
+    """
+    return to_cents(Decimal(repr(float(quantity))) * Decimal(repr(float(rate))))
+
+
+def build_totals(comprobante: Dict[str, str], impuestos: Dict[str, str]) -> Dict:
+    """
+    Declared totals of a CFDI, in cents.
+
+    Args:
+        comprobante: Attributes of the cfdi:Comprobante root
+        impuestos: Attributes of the document-level cfdi:Impuestos, if any
+
+    Returns:
+        Dict with subtotal, discount, taxes_transferred, taxes_withheld and
+        total cents; a total is None when the attribute is absent or invalid
+    """
+    fields = {
+        "subtotal": comprobante.get("SubTotal"),
+        "discount": comprobante.get("Descuento", "0"),
+        "total": comprobante.get("Total"),
+        "taxes_transferred": impuestos.get("TotalImpuestosTrasladados", "0"),
+        "taxes_withheld": impuestos.get("TotalImpuestosRetenidos", "0"),
+    }
+
+    totals = {}
+    for name, value in fields.items():
+        try:
+            totals[name] = to_cents(value) if value is not None else None
+        except ValueError:
+            totals[name] = None
+    return totals
+
+
+class Reconciliation(NamedTuple):
+    """Outcome of reconcile_bill"""
+
+    errors: List[str]
+    warnings: List[str]
+    line_total_cents: int
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _format_cents(cents: int) -> str:
+    return f"{Decimal(int(cents)).scaleb(-2):,.2f}"
+
+
+def reconcile_bill(
+    bill_df, totals: Dict, tolerance_cents: int = DEFAULT_TOLERANCE_CENTS
+) -> Reconciliation:
+    """
+    Check a parsed bill's lines against each other and its declared totals.
+
+    Errors (the bill should not be posted):
+      - an Importe that is missing or not a number
+      - an Importe that differs from Cantidad * ValorUnitario by more than
+        tolerance_cents
+      - line Importes that do not add up to SubTotal
+      - a Total that is not SubTotal - Descuento + taxes transferred -
+        taxes withheld
+
+    Warnings (posting is possible, but the bill will not equal Total
+    because only line amounts are posted): a discount or taxes.
+
+    Args:
+        bill_df: Line item DataFrame from parse_bill (amount, amount_cents,
+            quantity and rate columns; amount is NaN where Importe is invalid)
+        totals: Declared totals from build_totals
+        tolerance_cents: Allowed per-line rounding difference
+
+    Returns:
+        Reconciliation
+    """
+    errors, warnings = [], []
+
+    cents = bill_df["amount_cents"].to_numpy(dtype=np.int64)
+    valid = ~np.isnan(bill_df["amount"].to_numpy(dtype=np.float64))
+    line_total = int(cents.sum())
+
+    for row in np.flatnonzero(~valid)[:5]:
+        errors.append(f"Line {row + 1}: Importe is not a valid amount")
+
+    # Cantidad * ValorUnitario, in cents. The float product only rounds
+    # differently from the exact one within a few ulps of a half cent, so
+    # just those rows are recomputed in Decimal
+    quantity = bill_df["quantity"].to_numpy(dtype=np.float64)
+    rate = bill_df["rate"].to_numpy(dtype=np.float64)
+    checked = valid & ~np.isnan(quantity) & ~np.isnan(rate)
+    raw = np.where(checked, quantity * rate * 100, 0.0)
+    expected = np.round(raw).astype(np.int64)
+    near_half = np.abs(np.abs(raw - np.trunc(raw)) - 0.5) <= np.abs(raw) * 1e-12
+    for row in np.flatnonzero(checked & (near_half | (np.abs(raw) >= 2**52))):
+        expected[row] = product_cents(quantity[row], rate[row])
+    off = np.flatnonzero(checked & (np.abs(expected - cents) > tolerance_cents))
+    for row in off[:5]:
+        errors.append(
+            f"Line {row + 1}: Importe {_format_cents(cents[row])} != Cantidad x "
+            f"ValorUnitario {_format_cents(expected[row])}"
+        )
+    if len(off) > 5:
+        errors.append(f"... and {len(off) - 5} more lines")
+
+    subtotal = totals.get("subtotal")
+    if subtotal is None:
+        warnings.append("Invoice has no valid SubTotal to check the lines against")
+    elif line_total != subtotal:
+        errors.append(
+            f"Line amounts add up to {_format_cents(line_total)} but SubTotal "
+            f"is {_format_cents(subtotal)}"
+        )
+
+    discount = totals.get("discount") or 0
+    transferred = totals.get("taxes_transferred") or 0
+    withheld = totals.get("taxes_withheld") or 0
+    total = totals.get("total")
+    if subtotal is not None and total is not None:
+        expected_total = subtotal - discount + transferred - withheld
+        if total != expected_total:
+            errors.append(
+                f"Total {_format_cents(total)} != SubTotal - Descuento + taxes "
+                f"{_format_cents(expected_total)}"
+            )
+
+    if discount:
+        warnings.append(
+            f"Invoice discount of {_format_cents(discount)} is not applied to "
+            "the bill lines"
+        )
+    if transferred or withheld:
+        warnings.append(
+            f"Invoice taxes ({_format_cents(transferred)} transferred, "
+            f"{_format_cents(withheld)} withheld) are not included in the bill lines"
+        )
+
+    return Reconciliation(errors, warnings, line_total)
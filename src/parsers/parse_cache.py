@@ -0,0 +1,182 @@
+"""
+CFDI Parse Cache
+
+This module memoizes parse_bill by a SHA-256 hash of the document bytes.
+Streamlit reruns the whole script on every widget interaction, so without
+it the uploaded CFDI would be parsed again each time; with it a rerun (or
+a re-upload of the same file) gets the already-built DataFrame and bill
+data back from an in-memory LRU, or from an optional on-disk pickle store
+that survives restarts. The store keeps one subdirectory per parser
+version, so a parser change never serves results in the old layout.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+from qb.cache import LRUCache
+
+from .xml_parser import PARSER_VERSION, parse_bill
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = int(os.getenv("CFDI_PARSE_CACHE_SIZE", "32"))
+
+# Unset keeps the cache in memory only
+DEFAULT_CACHE_DIR = os.getenv("CFDI_PARSE_CACHE_DIR") or None
+
+
+def content_hash(data: bytes) -> str:
+    """Hex SHA-256 of a document's bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_source(source) -> bytes:
+    """
+    Read the bytes of a path or file-like object (e.g. a Streamlit upload).
+
+    File-like objects are rewound so they can still be read afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+
+    position = source.tell()
+    data = source.read()
+    source.seek(position)
+    return data
+
+
+class ParseCache:
+    """
+    Content-addressed cache of parse_bill results.
+
+    Cached results are shared between callers and must be treated as
+    read-only.
+
+    Args:
+        maxsize: Documents kept in memory before the least recently used
+            is evicted
+        directory: Optional directory for a persistent pickle per document
+        version: Parser version the persisted results belong to
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_CACHE_SIZE,
+        directory: str = None,
+        version: int = PARSER_VERSION,
+    ):
+        self.directory = os.path.join(directory, f"v{version}") if directory else None
+        self._memory = LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def _load(self, key: str) -> Optional[Tuple]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A truncated or incompatible entry is just a miss
+            logger.warning(f"Ignoring unreadable parse cache entry {key}: {e}")
+            return None
+
+    def _store(self, key: str, result: Tuple):
+        if not self.directory:
+            return
+        # Write to a temporary file first so readers never see partial data
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            logger.warning(f"Could not write parse cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def parse_bytes(self, data: bytes, key: str = None) -> Tuple:
+        """
+        Parse a CFDI document, reusing the cached result for the same bytes.
+
+        Args:
+            data: Document bytes
+            key: content_hash(data), if the caller already computed it
+
+        Returns:
+            Tuple of invoice number, line item DataFrame and raw bill data,
+            as returned by parse_bill
+        """
+        key = key or content_hash(data)
+
+        result = self._memory.get(key)
+        if result is not None:
+            self._count("hits")
+            return result
+
+        result = self._load(key)
+        if result is not None:
+            self._count("disk_hits")
+        else:
+            self._count("misses")
+            result = parse_bill(io.BytesIO(data))
+            self._store(key, result)
+
+        self._memory[key] = result
+        return result
+
+    def parse(self, source) -> Tuple:
+        """
+        Parse a CFDI file or upload through the cache.
+
+        Args:
+            source: Path or file-like object of the XML file
+
+        Returns:
+            Tuple of invoice number, line item DataFrame and raw bill data
+        """
+        return self.parse_bytes(read_source(source))
+
+    def stats(self) -> Dict:
+        """Hit, disk hit and miss counts, and the number of cached documents"""
+        with self._lock:
+            return dict(self._stats, cached=len(self._memory))
+
+    def clear(self):
+        """Drop every in-memory entry (on-disk entries are kept)"""
+        for key in list(self._memory):
+            self._memory.pop(key, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseCache:
+    """Return the process-wide parse cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ParseCache(directory=DEFAULT_CACHE_DIR)
+        return _cache
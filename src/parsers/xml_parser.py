@@ -7,36 +7,298 @@ into structured data ready for QuickBooks API integration.
 
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
+import numpy as np
 import pandas as pd
 import re
 
+from .backends import NAMESPACES, get_backend
+from .money import build_totals, cents_array
+
 logger = logging.getLogger(__name__)
 
-# Register namespaces for XML parsing
-NAMESPACES = {
-    "cfdi": "http://www.sat.gob.mx/cfd/4",
-    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
-    "cce20": "http://www.sat.gob.mx/ComercioExterior20",
+# Bump whenever parse_bill's output changes (columns, dtypes, bill data
+# keys), so results persisted by an older parser are not reused
+PARSER_VERSION = 1
+
+CONCEPTO_TAG = f"{{{NAMESPACES['cfdi']}}}Concepto"
+CONCEPTOS_TAG = f"{{{NAMESPACES['cfdi']}}}Conceptos"
+COMPLEMENTO_TAG = f"{{{NAMESPACES['cfdi']}}}Complemento"
+EMISOR_TAG = f"{{{NAMESPACES['cfdi']}}}Emisor"
+IMPUESTOS_TAG = f"{{{NAMESPACES['cfdi']}}}Impuestos"
+COMERCIO_EXTERIOR_TAG = f"{{{NAMESPACES['cce20']}}}ComercioExterior"
+MERCANCIA_TAG = f"{{{NAMESPACES['cce20']}}}Mercancia"
+TIMBRE_TAG = f"{{{NAMESPACES['tfd']}}}TimbreFiscalDigital"
+
+# Line item key -> cce20:Mercancia attribute of the customs fields attached
+# to each line (None when the line has no mercancia)
+CUSTOMS_FIELDS = {
+    "tariff_code": "FraccionArancelaria",
+    "customs_quantity": "CantidadAduana",
+    "customs_unit": "UnidadAduana",
+    "value_usd": "ValorDolares",
 }
 
+# Columns collected from the line items into the DataFrame (including the
+# customs fields, NaN for lines without a mercancia), which also gets an
+# int64 amount_cents column. The duplicated CFDI names (Cantidad,
+# ValorUnitario, Importe) and description (always equal to product_id) only
+# live in the raw line item dicts.
+LINE_COLUMNS = (
+    "product",
+    "sku",
+    "parent_sku",
+    "product_id",
+    "full_description",
+    "quantity",
+    "rate",
+    "amount",
+    *CUSTOMS_FIELDS,
+)
+NUMERIC_COLUMNS = ("quantity", "rate", "customs_quantity", "value_usd")
+CATEGORICAL_COLUMNS = ("sku", "parent_sku", "tariff_code", "customs_unit")
+
+
+def build_vendor_info(attrib: Dict[str, str]) -> Dict[str, str]:
+    """
+    Build the vendor fields from the attributes of a cfdi:Emisor.
+
+    Args:
+        attrib: Attribute mapping of the Emisor element
+
+    Returns:
+        Dict with the vendor RFC and name
+    """
+    return {
+        "vendor_rfc": attrib.get("Rfc", "").strip().upper(),
+        "vendor_name": attrib.get("Nombre", ""),
+    }
+
+
+def build_line_item(attrib: Dict[str, str]) -> Dict[str, str]:
+    """
+    Build a line item dictionary from the attributes of a cfdi:Concepto.
+
+    Args:
+        attrib: Attribute mapping of the Concepto element
 
-def parse_bill(file_path: str) -> Tuple:
+    Returns:
+        Dict with the product, SKU and amount fields used downstream
+    """
+    # Extract all relevant fields from the XML
+    full_description = attrib.get("Descripcion", "")
+    product_id = attrib.get("NoIdentificacion", "")  # This is the NoIdentificacion
+    cantidad = attrib.get("Cantidad", "1.0000")
+    valor_unitario = attrib.get("ValorUnitario", "0.0000")
+    importe = attrib.get("Importe", "0.0000")
+
+    # Extract the SKU from the description
+    sku = ""
+    parent_sku = ""
+
+    if "SKU:" in full_description:
+        # Extract the SKU part after "SKU:"
+        sku_part = full_description.split("SKU:")[1].strip()
+        # The SKU is the first word after "SKU:"
+        sku = sku_part.split()[0] if " " in sku_part else sku_part
+
+        # Extract parent SKU if possible (assuming format like 24fauxbois-sharbor)
+        if "-" in sku:
+            parent_sku = sku.split("-")[0]
+        else:
+            parent_sku = sku
+
+        # Format QuickBooks PRODUCT/SERVICE field as parent:sku
+        qb_product_service = f"{parent_sku}:{sku}"
+    else:
+        # If no SKU in description, use product_id as fallback
+        qb_product_service = product_id
+
+    return {
+        "product": qb_product_service,  # Format as "parent:sku" for QuickBooks matching
+        "sku": sku,  # The actual SKU (e.g., "24fauxbois-sharbor")
+        "parent_sku": parent_sku,  # The parent SKU (e.g., "24fauxbois")
+        "product_id": product_id,  # The NoIdentificacion value
+        "description": product_id,  # Use NoIdentificacion as description for QB matching
+        "full_description": full_description,  # Save the full description
+        "Cantidad": cantidad,
+        "ValorUnitario": valor_unitario,
+        "Importe": importe,
+        "quantity": cantidad,
+        "rate": valor_unitario,
+        "amount": importe,
+    }
+
+
+def build_stamp_info(attrib: Dict[str, str]) -> Dict[str, str]:
+    """
+    Build the fiscal stamp fields from a tfd:TimbreFiscalDigital.
+
+    Args:
+        attrib: Attribute mapping of the TimbreFiscalDigital element
+
+    Returns:
+        Dict with the CFDI UUID (upper-cased, "" if unstamped) and the
+        stamping date
+    """
+    return {
+        "uuid": attrib.get("UUID", "").strip().upper(),
+        "stamped_at": attrib.get("FechaTimbrado", ""),
+    }
+
+
+def build_customs_index(mercancias: List[Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    """
+    Index cce20:Mercancia attributes by NoIdentificacion.
+
+    Keys are the identifiers exactly as written, so a compound ID such as
+    "12157-12172" only matches the concepto carrying that same ID.
+
+    Args:
+        mercancias: Attribute mappings of the Mercancia elements
+
+    Returns:
+        Dict of NoIdentificacion -> attributes; the first of duplicates wins
+    """
+    index = {}
+    for attrib in mercancias:
+        key = attrib.get("NoIdentificacion", "")
+        if not key:
+            continue
+        if key in index:
+            logging.warning(f"Duplicate cce20:Mercancia for NoIdentificacion {key}")
+            continue
+        index[key] = attrib
+    return index
+
+
+def attach_customs(line_items: List[Dict], mercancias: List[Dict[str, str]]) -> int:
+    """
+    Add the CUSTOMS_FIELDS of each line's cce20:Mercancia to the line item.
+
+    Lines are joined to mercancias through a hash index on NoIdentificacion,
+    so the join is linear in the number of lines.
+
+    Args:
+        line_items: Line items from build_line_item, updated in place
+        mercancias: Attribute mappings of the Mercancia elements
+
+    Returns:
+        int: Number of lines matched to a mercancia
+    """
+    index = build_customs_index(mercancias)
+    matched = 0
+    for line_item in line_items:
+        mercancia = index.get(line_item["product_id"])
+        if mercancia is None:
+            line_item.update(dict.fromkeys(CUSTOMS_FIELDS))
+            continue
+        matched += 1
+        for key, attribute in CUSTOMS_FIELDS.items():
+            line_item[key] = mercancia.get(attribute)
+
+    if mercancias and matched < len(line_items):
+        logging.warning(
+            f"{len(line_items) - matched} of {len(line_items)} conceptos have no "
+            "cce20:Mercancia"
+        )
+    return matched
+
+
+def parse_numbers(values: List[str]) -> np.ndarray:
+    """
+    Convert numeric attribute strings to float64, exactly as float() would.
+
+    Args:
+        values: Attribute values
+
+    Returns:
+        float64 array, with NaN for missing (None) values and values that
+        are not numbers
+    """
+    array = np.array(values, dtype=object)
+    try:
+        return array.astype(np.float64)
+    except (ValueError, TypeError):
+        pass
+
+    result = np.empty(len(values), dtype=np.float64)
+    invalid = []
+    for pos, value in enumerate(values):
+        if value is None:
+            result[pos] = np.nan
+            continue
+        try:
+            result[pos] = float(value)
+        except (ValueError, TypeError):
+            invalid.append(pos)
+            result[pos] = np.nan
+    if not invalid:
+        return result
+    logging.warning(
+        f"{len(invalid)} invalid numbers, first in line {invalid[0] + 1}: "
+        f"{values[invalid[0]]!r}"
+    )
+    return result
+
+
+def build_line_frame(columns: Dict[str, List]) -> pd.DataFrame:
+    """
+    Build the line item DataFrame from per-column value lists.
+
+    Amounts are converted exactly to int64 cents (amount_cents), with a
+    float64 amount equal to cents / 100 (NaN where Importe is invalid);
+    quantities and rates become float64 and SKUs categorical, so consumers
+    no longer re-parse strings.
+
+    Args:
+        columns: Mapping of every LINE_COLUMNS name to its values
+
+    Returns:
+        DataFrame with one row per line item
+    """
+    data = {}
+    for name in LINE_COLUMNS:
+        values = columns[name]
+        if name == "amount":
+            cents, valid = cents_array(values)
+            data["amount"] = np.where(valid, cents / 100, np.nan)
+            data["amount_cents"] = cents
+        elif name in NUMERIC_COLUMNS:
+            data[name] = parse_numbers(values)
+        elif name in CATEGORICAL_COLUMNS:
+            data[name] = pd.Categorical(values)
+        else:
+            data[name] = pd.Series(values, dtype=object)
+    return pd.DataFrame(data)
+
+
+def _collect_columns(line_items: List[Dict]) -> Dict[str, List]:
+    return {name: [item[name] for item in line_items] for name in LINE_COLUMNS}
+
+
+def parse_bill(file_path: str, streaming: bool = False, backend: str = None) -> Tuple:
     """
     Parse a CFDI XML bill file.
 
     Args:
         file_path: Path to the XML file
+        streaming: Use the incremental parser instead of loading the whole tree
+        backend: Tree parser backend ("lxml", "etree" or "auto"); defaults to
+            the CFDI_PARSER_BACKEND environment variable
 
     Returns:
-        Tuple containing invoice number, DataFrame of line items, and raw bill data
+        Tuple containing invoice number, DataFrame of line items (typed
+        LINE_COLUMNS), and raw bill data
     """
+    if streaming:
+        return parse_bill_streaming(file_path)
+
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
+        document = get_backend(backend).read(file_path)
         # Extracting invoice number
-        invoice_number = root.attrib.get("Folio", "")
+        invoice_number = document.comprobante.get("Folio", "")
 
         # Log basic document info for debugging
         logging.info(f"Processing invoice #{invoice_number}")
@@ -45,60 +307,135 @@ def parse_bill(file_path: str) -> Tuple:
             "line_items": [],
         }
 
-        conceptos = root.find("cfdi:Conceptos", NAMESPACES)
-        if conceptos is not None:
-            for concepto in conceptos.findall("cfdi:Concepto", NAMESPACES):
-                # Extract all relevant fields from the XML
-                full_description = concepto.attrib.get("Descripcion", "")
-                product_id = concepto.attrib.get(
-                    "NoIdentificacion", ""
-                )  # This is the NoIdentificacion
-                cantidad = concepto.attrib.get("Cantidad", "1.0000")
-                valor_unitario = concepto.attrib.get("ValorUnitario", "0.0000")
-                importe = concepto.attrib.get("Importe", "0.0000")
-
-                # Extract the SKU from the description
-                sku = ""
-                parent_sku = ""
-
-                if "SKU:" in full_description:
-                    # Extract the SKU part after "SKU:"
-                    sku_part = full_description.split("SKU:")[1].strip()
-                    # The SKU is the first word after "SKU:"
-                    sku = sku_part.split()[0] if " " in sku_part else sku_part
-
-                    # Extract parent SKU if possible (assuming format like 24fauxbois-sharbor)
-                    if "-" in sku:
-                        parent_sku = sku.split("-")[0]
-                    else:
-                        parent_sku = sku
-
-                    # Format QuickBooks PRODUCT/SERVICE field as parent:sku
-                    qb_product_service = f"{parent_sku}:{sku}"
-                else:
-                    # If no SKU in description, use product_id as fallback
-                    qb_product_service = product_id
-
-                line_item = {
-                    "product": qb_product_service,  # Format as "parent:sku" for QuickBooks matching
-                    "sku": sku,  # The actual SKU (e.g., "24fauxbois-sharbor")
-                    "parent_sku": parent_sku,  # The parent SKU (e.g., "24fauxbois")
-                    "product_id": product_id,  # The NoIdentificacion value
-                    "description": product_id,  # Use NoIdentificacion as description for QB matching
-                    "full_description": full_description,  # Save the full description
-                    "Cantidad": cantidad,
-                    "ValorUnitario": valor_unitario,
-                    "Importe": importe,
-                    "quantity": cantidad,
-                    "rate": valor_unitario,
-                    "amount": importe,
-                }
-                bill_data["line_items"].append(line_item)
+        # Vendor identity, used to key learned item mappings
+        bill_data.update(build_vendor_info(document.emisor))
+
+        # Fiscal UUID, used to refuse posting the same invoice twice
+        bill_data.update(build_stamp_info(document.timbre))
+
+        # Declared totals, to reconcile the lines against before posting
+        bill_data["totals"] = build_totals(document.comprobante, document.impuestos)
+
+        if document.conceptos is not None:
+            for attrib in document.conceptos:
+                bill_data["line_items"].append(build_line_item(attrib))
 
         else:
             logging.error("No 'cfdi:Conceptos' found in the XML file.")
 
-        bill_df = pd.DataFrame(bill_data["line_items"])
+        # Foreign trade complement: customs data joined to the lines
+        bill_data["comercio_exterior"] = dict(document.comercio_exterior)
+        attach_customs(bill_data["line_items"], document.mercancias)
+
+        bill_df = build_line_frame(_collect_columns(bill_data["line_items"]))
+
+        return invoice_number, bill_df, bill_data
+
+    except FileNotFoundError:
+        logging.error(f"File not found: {file_path}")
+        raise FileNotFoundError(f"File not found: {file_path}")
+    except ET.ParseError as e:
+        logging.error(f"Invalid XML format: {str(e)}")
+        raise ET.ParseError(f"Invalid XML format: {str(e)}")
+
+
+def iter_conceptos(file_path: str, header: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Incrementally parse a CFDI XML file, yielding line items as they are read.
+
+    Each cfdi:Concepto is turned into a line item as soon as its end tag is
+    seen and is then cleared and detached, so memory stays flat no matter how
+    many conceptos the invoice carries. The complement (certificates,
+    ComercioExterior) is discarded the same way, after the cce20 mercancias
+    are copied into header.
+
+    Args:
+        file_path: Path or file-like object of the XML file
+        header: Optional dict filled with the Comprobante root attributes,
+            plus the cfdi:Emisor, document-level cfdi:Impuestos and
+            cce20:ComercioExterior and tfd:TimbreFiscalDigital attributes
+            under "Emisor", "Impuestos", "ComercioExterior" and
+            "TimbreFiscalDigital", and a list of cce20:Mercancia attributes
+            under "Mercancias"
+
+    Yields:
+        Line item dictionaries in document order
+    """
+    root = None
+    conceptos = None
+    found_conceptos = False
+    in_conceptos = False
+
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+                if header is not None:
+                    header.update(elem.attrib)
+            elif elem.tag == CONCEPTOS_TAG:
+                conceptos = elem
+                found_conceptos = in_conceptos = True
+            elif elem.tag == EMISOR_TAG and header is not None:
+                header["Emisor"] = dict(elem.attrib)
+            elif elem.tag == IMPUESTOS_TAG and not in_conceptos and header is not None:
+                # Concepto-level Impuestos only occur inside Conceptos
+                header["Impuestos"] = dict(elem.attrib)
+            elif elem.tag == COMERCIO_EXTERIOR_TAG and header is not None:
+                header["ComercioExterior"] = dict(elem.attrib)
+            elif elem.tag == MERCANCIA_TAG and header is not None:
+                header.setdefault("Mercancias", []).append(dict(elem.attrib))
+            elif elem.tag == TIMBRE_TAG and header is not None:
+                header["TimbreFiscalDigital"] = dict(elem.attrib)
+            continue
+
+        if elem.tag == CONCEPTO_TAG:
+            yield build_line_item(elem.attrib)
+            elem.clear()
+            if conceptos is not None:
+                conceptos.remove(elem)
+        elif elem.tag in (CONCEPTOS_TAG, COMPLEMENTO_TAG):
+            if elem.tag == CONCEPTOS_TAG:
+                in_conceptos = False
+            elem.clear()
+            if root is not None and elem in root:
+                root.remove(elem)
+
+    if not found_conceptos:
+        logging.error("No 'cfdi:Conceptos' found in the XML file.")
+
+
+def parse_bill_streaming(file_path: str) -> Tuple:
+    """
+    Parse a CFDI XML bill file without building the full element tree.
+
+    Produces the same result as parse_bill, but reads the document with
+    iter_conceptos so large invoices do not hold the whole tree in memory.
+
+    Args:
+        file_path: Path or file-like object of the XML file
+
+    Returns:
+        Tuple containing invoice number, DataFrame of line items, and raw bill data
+    """
+    try:
+        header = {}
+        bill_data = {
+            "line_items": [],
+        }
+
+        bill_data["line_items"].extend(iter_conceptos(file_path, header))
+
+        bill_data.update(build_vendor_info(header.get("Emisor", {})))
+        bill_data.update(build_stamp_info(header.get("TimbreFiscalDigital", {})))
+        bill_data["totals"] = build_totals(header, header.get("Impuestos", {}))
+        bill_data["comercio_exterior"] = header.get("ComercioExterior", {})
+        attach_customs(bill_data["line_items"], header.get("Mercancias", []))
+
+        # Extracting invoice number
+        invoice_number = header.get("Folio", "")
+        logging.info(f"Processing invoice #{invoice_number}")
+
+        bill_df = build_line_frame(_collect_columns(bill_data["line_items"]))
 
         return invoice_number, bill_df, bill_data
 
@@ -1,6 +1,13 @@
 from datetime import datetime
 from typing import List, Dict
 
+import numpy as np
+import pandas as pd
+
+from parsers.money import cents_array, cents_to_amount, line_cents, reconcile_bill
+
+from . import events
+
 
 def build_quickbooks_bill(
     bill_data: Dict,
@@ -17,8 +24,8 @@ def build_quickbooks_bill(
     qb_line_items = []
     for item in bill_data["line_items"]:
         try:
-            amount = float(item["amount"])
-        except (ValueError, TypeError):
+            amount = cents_to_amount(line_cents(item))
+        except ValueError:
             amount = 0.0
 
         line = {
@@ -36,3 +43,210 @@ def build_quickbooks_bill(
     }
 
     return qb_bill
+
+
+def _column(bill_df, name):
+    """A column as an object array, or empty strings if it is missing"""
+    if name in bill_df.columns:
+        return bill_df[name].to_numpy(dtype=object)
+    return np.full(len(bill_df), "", dtype=object)
+
+
+def _truthy(values: np.ndarray) -> np.ndarray:
+    """Python truthiness of every element"""
+    return values.astype(bool)
+
+
+def _to_float(values: np.ndarray):
+    """
+    Convert an object array with float(), element for element.
+
+    Returns:
+        Tuple of the float64 array (NaN where conversion failed) and a list
+        of (position, exception) for the failures
+    """
+    try:
+        return values.astype(np.float64), []
+    except (ValueError, TypeError):
+        pass
+
+    result = np.empty(len(values), dtype=np.float64)
+    failures = []
+    for pos, value in enumerate(values):
+        try:
+            result[pos] = float(value)
+        except (ValueError, TypeError) as e:
+            result[pos] = np.nan
+            failures.append((pos, e))
+    return result, failures
+
+
+def _first_truthy(bill_df, names):
+    """
+    Per row, the value of the first listed column holding a truthy value.
+
+    Returns:
+        Tuple of the chosen values (None where no column qualifies) and a
+        mask of the rows that had one
+    """
+    chosen = np.full(len(bill_df), None, dtype=object)
+    found = np.zeros(len(bill_df), dtype=bool)
+    for name in names:
+        if name not in bill_df.columns:
+            continue
+        values = _column(bill_df, name)
+        use = ~found & _truthy(values)
+        chosen[use] = values[use]
+        found |= use
+    return chosen, found
+
+
+def format_bill_data(invoice_number, bill_df, vendor_rfc="", totals=None, uuid=""):
+    """
+    Format bill dataframe into the structure expected by the bill builder.
+
+    Every field is derived with column operations and the line items come
+    out of a single records conversion; only rows whose values cannot be
+    converted in bulk, or whose amount needs the column scan fallback, are
+    handled one by one.
+
+    vendor_rfc (the cfdi:Emisor Rfc) is passed through so learned item
+    mappings can be looked up and recorded for the vendor.
+
+    uuid (the CFDI fiscal UUID) is passed through so create_bill can refuse
+    an invoice that was already posted.
+
+    totals (the declared CFDI totals from parse_bill) are reconciled against
+    the lines; the outcome is returned under "reconciliation" so create_bill
+    can refuse a bill whose amounts do not add up.
+    """
+    # DEBUGGING: Display the DataFrame schema and sample values
+    events.write("DataFrame Info:")
+    events.write(f"Columns: {bill_df.columns.tolist()}")
+    events.write("First few rows:")
+    events.write(bill_df.head())
+
+    # CRITICAL: For QuickBooks matching, we need the product in format
+    # "parent_sku:full_sku"
+    full_sku = _column(bill_df, "sku")
+    parent_sku = _column(bill_df, "parent_sku")
+    product_id = _column(bill_df, "product_id")
+
+    has_full = _truthy(full_sku)
+    has_parent = _truthy(parent_sku)
+    full_str = pd.Series(full_sku, dtype=object).astype(str)
+
+    # If only the full SKU is available, its parent is the part before the dash
+    derived_parent = full_str.str.split("-", n=1).str[0]
+    qb_product = np.where(
+        has_parent & has_full,
+        (pd.Series(parent_sku, dtype=object).astype(str) + ":" + full_str).to_numpy(),
+        np.where(
+            has_full,
+            (derived_parent + ":" + full_str).to_numpy(),
+            _column(bill_df, "product"),
+        ),
+    )
+    events.write(
+        f"QB products: {int((has_parent & has_full).sum())} formatted, "
+        f"{int((has_full & ~has_parent).sum())} derived, "
+        f"{int((~has_full).sum())} from the product field"
+    )
+
+    # The description in QB is the NoIdentificacion (product_id), then the
+    # description column, then the full description
+    description = np.where(
+        _truthy(product_id), product_id, _column(bill_df, "description")
+    )
+    if "full_description" in bill_df.columns:
+        description = np.where(
+            _truthy(description), description, _column(bill_df, "full_description")
+        )
+
+    # Amount: Importe (standard CFDI field) first, then the amount column
+    amount_source, has_amount = _first_truthy(bill_df, ("Importe", "amount"))
+    amount = np.zeros(len(bill_df), dtype=np.float64)
+    converted, failures = _to_float(amount_source[has_amount])
+    amount[has_amount] = converted
+    rows = np.flatnonzero(has_amount)
+    for pos, e in failures:
+        events.error(f"Could not convert amount: {e}")
+        amount[rows[pos]] = 0.0
+    # The typed parser reports unparseable amounts as NaN
+    amount[np.isnan(amount)] = 0.0
+
+    # If amount is still zero, try to search in other columns
+    amount_columns = [
+        (col, _column(bill_df, col))
+        for col in bill_df.columns
+        if any(term in col.lower() for term in ["amount", "total", "importe"])
+    ]
+    for row in np.flatnonzero(amount <= 0):
+        for col, values in amount_columns:
+            try:
+                value = values[row]
+                if isinstance(value, str):
+                    value = "".join(c for c in value if c.isdigit() or c == ".")
+                amt = float(value)
+                if amt > 0:
+                    amount[row] = amt
+                    events.write(f"Found amount {amt} in column {col}")
+                    break
+            except (ValueError, TypeError):
+                pass
+
+    # Cents: the parser's exact amount_cents wherever the amount is still the
+    # parsed one; amounts found elsewhere are converted from their decimals
+    amount_cents = np.zeros(len(bill_df), dtype=np.int64)
+    parsed = np.zeros(len(bill_df), dtype=bool)
+    if {"amount", "amount_cents"}.issubset(bill_df.columns):
+        parsed = amount == bill_df["amount"].to_numpy(dtype=np.float64)
+        amount_cents[parsed] = bill_df["amount_cents"].to_numpy(dtype=np.int64)[parsed]
+    amount_cents[~parsed] = cents_array(amount[~parsed].tolist())[0]
+
+    # Quantity: Cantidad first, then the quantity column; unparseable and
+    # non-positive quantities become 1
+    quantity_source, has_quantity = _first_truthy(bill_df, ("Cantidad", "quantity"))
+    quantity = np.ones(len(bill_df), dtype=np.float64)
+    converted, failures = _to_float(quantity_source[has_quantity])
+    quantity[has_quantity] = converted
+    rows = np.flatnonzero(has_quantity)
+    for pos, _ in failures:
+        quantity[rows[pos]] = 1.0
+    quantity[(quantity <= 0) | np.isnan(quantity)] = 1.0
+
+    # Create the line items with correctly formatted fields for QB matching
+    line_items = pd.DataFrame(
+        {
+            "product": qb_product,  # Format as parent:sku for QB matching
+            "sku": full_sku,  # The specific SKU
+            "product_id": product_id,  # NoIdentificacion, for learned mappings
+            "description": description,  # Use product_id as description
+            "amount": amount,
+            "amount_cents": amount_cents,
+            "quantity": quantity,
+        }
+    ).to_dict("records")
+
+    # Provide summary
+    events.success(f"Successfully created {len(line_items)} line items!")
+
+    bill_data = {
+        "invoice_number": invoice_number,
+        "vendor_rfc": vendor_rfc,
+        "uuid": uuid,
+        "line_items": line_items,
+    }
+
+    reconcilable = {"amount", "amount_cents", "quantity", "rate"}
+    if totals is not None and reconcilable.issubset(bill_df.columns):
+        reconciliation = reconcile_bill(bill_df, totals)
+        for message in reconciliation.errors:
+            events.error(f"Reconciliation: {message}")
+        for message in reconciliation.warnings:
+            events.warning(f"Reconciliation: {message}")
+        if reconciliation.ok:
+            events.success("Line amounts reconcile with the invoice totals")
+        bill_data["reconciliation"] = reconciliation
+
+    return bill_data
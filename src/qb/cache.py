@@ -0,0 +1,119 @@
+"""
+Billing Cache Interfaces
+
+This module provides the caches used by the billing core without tying
+them to Streamlit: the item lookup cache behind find_item_by_sku_or_name,
+which any MutableMapping can back (the Streamlit app plugs in
+st.session_state), and a small time-based memoizer for catalog reads.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import MutableMapping
+
+
+class LRUCache(MutableMapping):
+    """
+    Thread-safe dict-like cache holding at most maxsize entries.
+
+    Args:
+        maxsize (int): Entries kept before the least recently used is evicted
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+
+_default_item_cache = LRUCache()
+_current_item_cache = contextvars.ContextVar("qb_item_cache", default=None)
+
+
+def get_item_cache() -> MutableMapping:
+    """Return the item lookup cache for the current context"""
+    cache = _current_item_cache.get()
+    return cache if cache is not None else _default_item_cache
+
+
+def set_item_cache(cache: MutableMapping):
+    """
+    Use the given mapping as the item lookup cache for the current context.
+
+    Returns:
+        Token that can be passed to reset_item_cache
+    """
+    return _current_item_cache.set(cache)
+
+
+def reset_item_cache(token):
+    """Restore the cache that was active before set_item_cache"""
+    _current_item_cache.reset(token)
+
+
+def ttl_cache(ttl: float):
+    """
+    Memoize a function's results for ttl seconds, keyed by its arguments.
+
+    The wrapped function gains a cache_clear() method.
+
+    Args:
+        ttl (float): Seconds a result stays valid
+    """
+
+    def decorator(func):
+        results = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                if key in results and now - results[key][0] < ttl:
+                    return results[key][1]
+
+            value = func(*args, **kwargs)
+            with lock:
+                results[key] = (now, value)
+            return value
+
+        def cache_clear():
+            with lock:
+                results.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,195 @@
+"""
+Billing Event Sink
+
+This module decouples the billing core from any particular UI. Core code
+reports progress through the module-level functions here (write, info,
+success, warning, error, exception), which forward to the sink installed
+for the current context. The default sink sends everything to logging, so
+the core runs headless in batch jobs, workers and benchmarks; the
+Streamlit app installs a sink that renders to the page.
+"""
+
+import contextvars
+import logging
+import time
+from typing import Dict, List
+
+logger = logging.getLogger("qb")
+
+
+class EventSink:
+    """Receives progress and diagnostic messages from the billing core"""
+
+    def write(self, message):
+        """Verbose trace output"""
+
+    def info(self, message):
+        pass
+
+    def success(self, message):
+        pass
+
+    def warning(self, message):
+        pass
+
+    def error(self, message):
+        pass
+
+    def exception(self, message):
+        pass
+
+
+class LoggingSink(EventSink):
+    """Sends events to the standard logging module"""
+
+    def __init__(self, log: logging.Logger = logger):
+        self.log = log
+
+    def write(self, message):
+        self.log.debug(message)
+
+    def info(self, message):
+        self.log.info(message)
+
+    def success(self, message):
+        self.log.info(message)
+
+    def warning(self, message):
+        self.log.warning(message)
+
+    def error(self, message):
+        self.log.error(message)
+
+    def exception(self, message):
+        self.log.error(message, exc_info=True)
+
+
+class NullSink(EventSink):
+    """Discards every event"""
+
+
+class DiagnosticsReport(EventSink):
+    """
+    Collects events in memory instead of rendering them one by one.
+
+    Verbose traces (write) are only recorded; other levels are recorded and
+    also forwarded to the passthrough sink, so warnings and errors still
+    reach the user immediately. The collected report can be rendered once
+    at the end, e.g. as a collapsed table or downloadable log.
+
+    Args:
+        passthrough (EventSink, optional): Sink that receives non-trace events
+        passthrough_levels: Levels forwarded to the passthrough sink
+    """
+
+    def __init__(
+        self,
+        passthrough: EventSink = None,
+        passthrough_levels=("success", "warning", "error", "exception"),
+    ):
+        self.passthrough = passthrough
+        self.passthrough_levels = set(passthrough_levels)
+        self.events: List[tuple] = []
+        self._start = time.perf_counter()
+
+    def _record(self, level, message):
+        self.events.append((time.perf_counter() - self._start, level, message))
+        if self.passthrough is not None and level in self.passthrough_levels:
+            getattr(self.passthrough, level)(message)
+
+    def write(self, message):
+        self._record("write", message)
+
+    def info(self, message):
+        self._record("info", message)
+
+    def success(self, message):
+        self._record("success", message)
+
+    def warning(self, message):
+        self._record("warning", message)
+
+    def error(self, message):
+        self._record("error", message)
+
+    def exception(self, message):
+        self._record("exception", message)
+
+    def __len__(self):
+        return len(self.events)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of events per level"""
+        counts = {}
+        for _, level, _ in self.events:
+            counts[level] = counts.get(level, 0) + 1
+        return counts
+
+    def to_records(self) -> List[Dict]:
+        """Events as a list of dicts with elapsed seconds, level and message"""
+        return [
+            {"elapsed_s": round(elapsed, 4), "level": level, "message": str(message)}
+            for elapsed, level, message in self.events
+        ]
+
+    def to_text(self) -> str:
+        """Events as a plain-text log"""
+        return "\n".join(
+            f"{elapsed:10.4f}  {level.upper():<9} {message}"
+            for elapsed, level, message in self.events
+        )
+
+
+_default_sink = LoggingSink()
+_current_sink = contextvars.ContextVar("qb_event_sink", default=None)
+
+
+def get_event_sink() -> EventSink:
+    """Return the sink for the current context"""
+    sink = _current_sink.get()
+    return sink if sink is not None else _default_sink
+
+
+def set_event_sink(sink: EventSink):
+    """
+    Install a sink for the current context (thread or task).
+
+    Returns:
+        Token that can be passed to reset_event_sink
+    """
+    return _current_sink.set(sink)
+
+
+def reset_event_sink(token):
+    """Restore the sink that was active before set_event_sink"""
+    _current_sink.reset(token)
+
+
+def set_default_event_sink(sink: EventSink):
+    """Replace the process-wide fallback sink"""
+    global _default_sink
+    _default_sink = sink
+
+
+def write(message):
+    get_event_sink().write(message)
+
+
+def info(message):
+    get_event_sink().info(message)
+
+
+def success(message):
+    get_event_sink().success(message)
+
+
+def warning(message):
+    get_event_sink().warning(message)
+
+
+def error(message):
+    get_event_sink().error(message)
+
+
+def exception(message):
+    get_event_sink().exception(message)
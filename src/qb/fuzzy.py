@@ -0,0 +1,316 @@
+"""
+Fuzzy Item Matcher
+
+This module provides an offline approximate matcher over the item catalog,
+used to suggest items for bill lines that no exact key resolves. The
+suggestions are confirmed by the user, never posted on their own, since a
+one-character SKU difference is usually a different product. Catalog names, SKUs and child SKUs are
+split into character trigrams in an inverted index; the items sharing the
+most trigrams with a query are then re-ranked by edit distance, so a CFDI
+SKU with a typo, different punctuation or embedded in description text
+still resolves to a ranked list of candidates.
+"""
+
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .item_index import get_item_index
+from .sku_index import normalize_key
+
+# Matches scoring below this are not trusted on their own
+FUZZY_MIN_SCORE = 0.85
+
+# The best match must beat the runner-up by this much to be accepted
+FUZZY_MIN_MARGIN = 0.02
+
+# Number of trigram-overlap candidates re-ranked by edit distance
+FUZZY_CANDIDATES = 20
+
+# Trigrams found in more than this fraction of the catalog keys (and at
+# least MIN_COMMON_GRAM_KEYS keys) are not used to shortlist candidates
+COMMON_GRAM_FRACTION = 0.05
+MIN_COMMON_GRAM_KEYS = 100
+
+# Weight of a catalog key matching one token of a longer query (e.g. the
+# SKU inside a description) relative to a full-string match
+CONTAINMENT_WEIGHT = 0.95
+
+# Shorter tokens are too generic to be matched on their own
+MIN_CONTAINED_LENGTH = 6
+
+# Description text is split into tokens on whitespace and these separators;
+# dashes stay inside tokens since they join SKU components
+TOKEN_SEPARATOR_RE = re.compile(r"[\s:;,/|()]+")
+
+
+class FuzzyMatch(NamedTuple):
+    """A ranked candidate returned by FuzzyIndex.search"""
+
+    item_id: str
+    name: str
+    key: str
+    score: float
+
+
+def trigrams(text: str) -> List[str]:
+    """Distinct character trigrams of a normalized string"""
+    if len(text) < 3:
+        return [text] if text else []
+    return list({text[i : i + 3] for i in range(len(text) - 2)})
+
+
+def levenshtein(a: str, b: str, max_distance: int = None) -> int:
+    """
+    Edit distance between two strings.
+
+    Args:
+        a, b: Strings to compare
+        max_distance (int, optional): Stop early and return max_distance + 1
+            once the distance is known to exceed it
+
+    Returns:
+        int: Number of single-character edits
+    """
+    # A shared prefix or suffix never costs an edit
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start : len(a) - end], b[start : len(b) - end]
+
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ca != cb),
+                )
+            )
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: str, b: str, floor: float = 0.0, min_edits: int = 0) -> float:
+    """
+    Normalized edit similarity between two strings, from 0 to 1.
+
+    Args:
+        a, b: Strings to compare
+        floor: Similarities at or below this are reported as 0
+        min_edits: Known lower bound of the edit distance
+
+    Returns:
+        float: 1 - edit distance / length of the longer string
+    """
+    longest = max(len(a), len(b))
+    if not longest:
+        return 0.0
+    min_edits = max(min_edits, abs(len(a) - len(b)))
+    if 1 - min_edits / longest <= floor:
+        return 0.0
+
+    max_edits = int(longest * (1 - floor))
+    distance = levenshtein(a, b, max_edits)
+    if distance > max_edits:
+        return 0.0
+    return 1 - distance / longest
+
+
+class FuzzyIndex:
+    """
+    Trigram inverted index over catalog item names and SKUs.
+
+    Args:
+        items: (name, id) or (name, id, sku) tuples of the catalog
+    """
+
+    def __init__(self, items: List[Tuple] = ()):
+        # Parallel lists per normalized key: the key, the items owning it
+        # and its trigram count; postings map trigram -> key ids
+        self._keys: List[str] = []
+        self._owners: List[List[Tuple[str, str]]] = []
+        self._key_ids: Dict[str, int] = {}
+        self._gram_counts: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+        for item in items:
+            name, item_id = item[0], item[1]
+            sku = item[2] if len(item) > 2 else ""
+            self.add(name, item_id, sku or "")
+
+    def add(self, name: str, item_id: str, sku: str = ""):
+        """Index the name, child SKU and SKU of one catalog item"""
+        texts = [name, sku]
+        if ":" in name:
+            texts.append(name.split(":", 1)[1])
+
+        for text in texts:
+            key = normalize_key(text)
+            if not key:
+                continue
+
+            key_id = self._key_ids.get(key)
+            if key_id is None:
+                key_id = len(self._keys)
+                self._key_ids[key] = key_id
+                self._keys.append(key)
+                self._owners.append([])
+                grams = trigrams(key)
+                self._gram_counts.append(len(grams))
+                for gram in grams:
+                    self._postings[gram].append(key_id)
+
+            owners = self._owners[key_id]
+            if all(owner_id != item_id for owner_id, _ in owners):
+                owners.append((item_id, name))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _score(
+        self,
+        query: str,
+        query_grams: int,
+        tokens: List[str],
+        key_id: int,
+        overlap: int,
+        floor: float,
+    ) -> float:
+        key = self._keys[key_id]
+        key_grams = self._gram_counts[key_id]
+
+        # Each edit changes at most three trigrams, which bounds the edit
+        # distance from below and lets most candidates skip the DP
+        min_edits = -(-(max(query_grams, key_grams) - overlap) // 3)
+        score = similarity(query, key, floor, min_edits)
+
+        # A key matching one token of a longer text (e.g. the SKU inside a
+        # description) scores slightly below a full-string match
+        for token in tokens:
+            if len(token) >= MIN_CONTAINED_LENGTH:
+                token_floor = max(score, floor) / CONTAINMENT_WEIGHT
+                score = max(
+                    score, similarity(token, key, token_floor) * CONTAINMENT_WEIGHT
+                )
+
+        return score
+
+    def search(
+        self, query: str, limit: int = 5, min_score: float = 0.0
+    ) -> List[FuzzyMatch]:
+        """
+        Rank catalog items by similarity to a SKU, name or description.
+
+        Args:
+            query: Free text in any case or punctuation
+            limit: Maximum number of candidates returned
+            min_score: Drop candidates scoring below this; a higher floor
+                lets more candidates skip the edit-distance computation
+
+        Returns:
+            List of FuzzyMatch, best first
+        """
+        tokens = [normalize_key(t) for t in TOKEN_SEPARATOR_RE.split(query)]
+        query = normalize_key(query)
+        tokens = [t for t in tokens if t and t != query]
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        # Shortlist keys through the selective trigrams only; grams shared
+        # by a large part of the catalog add little but dominate the cost
+        postings = [self._postings[g] for g in grams if g in self._postings]
+        common = max(MIN_COMMON_GRAM_KEYS, len(self._keys) * COMMON_GRAM_FRACTION)
+        selective = [p for p in postings if len(p) <= common] or postings
+
+        counts = Counter()
+        for posting in selective:
+            counts.update(posting)
+        if not counts:
+            return []
+
+        query_grams = set(grams)
+        best: Dict[str, FuzzyMatch] = {}
+        for key_id, _ in counts.most_common(FUZZY_CANDIDATES):
+            overlap = len(query_grams.intersection(trigrams(self._keys[key_id])))
+            score = self._score(
+                query, len(grams), tokens, key_id, overlap, min_score
+            )
+            if score < min_score or score == 0:
+                continue
+            for item_id, name in self._owners[key_id]:
+                if item_id not in best or score > best[item_id].score:
+                    best[item_id] = FuzzyMatch(
+                        item_id, name, self._keys[key_id], round(score, 4)
+                    )
+
+        ranked = sorted(best.values(), key=lambda m: (-m.score, m.name))
+        return ranked[:limit]
+
+    def best_match(
+        self, query: str, min_score: float = FUZZY_MIN_SCORE
+    ) -> Optional[FuzzyMatch]:
+        """
+        Return the top candidate if it is both good enough and unambiguous.
+
+        Args:
+            query: SKU, name or description text
+            min_score: Minimum similarity to accept
+
+        Returns:
+            FuzzyMatch or None
+        """
+        # An exact key owned by a single item needs no ranking
+        key = normalize_key(query)
+        key_id = self._key_ids.get(key)
+        if key_id is not None and len(self._owners[key_id]) == 1:
+            item_id, name = self._owners[key_id][0]
+            return FuzzyMatch(item_id, name, key, 1.0)
+
+        # The runner-up only matters when it is within the margin
+        ranked = self.search(query, limit=2, min_score=min_score - FUZZY_MIN_MARGIN)
+        if not ranked or ranked[0].score < min_score:
+            return None
+        if len(ranked) > 1 and ranked[0].score - ranked[1].score < FUZZY_MIN_MARGIN:
+            return None
+        return ranked[0]
+
+
+# Realm ID -> (item index version, FuzzyIndex)
+_cached_indexes: Dict[str, Tuple[int, FuzzyIndex]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_fuzzy_index() -> FuzzyIndex:
+    """
+    Return a FuzzyIndex of the current realm's catalog.
+
+    Built from the persistent item index and rebuilt only when that index
+    has changed since the last call.
+    """
+    item_index = get_item_index()
+    with _cache_lock:
+        cached = _cached_indexes.get(item_index.realm_id)
+        if cached is None or cached[0] != item_index.version:
+            cached = (
+                item_index.version,
+                FuzzyIndex(item_index.all_items(with_sku=True)),
+            )
+            _cached_indexes[item_index.realm_id] = cached
+        return cached[1]
@@ -0,0 +1,359 @@
+"""
+QuickBooks Item Index
+
+This module keeps a persistent SQLite copy of the QuickBooks item catalog.
+The full catalog is paged in once, then refreshed incrementally using
+MetaData.LastUpdatedTime, and lookups by name, SKU or any of the derived
+keys from create_sku_mapping are served locally. Every row is scoped by
+realm, so the catalogs of several companies can share one database.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .qb_auth import get_client, query_pages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.getenv(
+    "QB_ITEM_INDEX_PATH", os.path.join(".qb_cache", "items.sqlite")
+)
+
+# Key kinds, in match priority order (lower wins)
+KEY_NAME = 0
+KEY_SKU = 1
+KEY_CHILD = 2
+KEY_CHILD_CLEAN = 3
+KEY_NAME_CLEAN = 4
+KEY_CHILD_LAST = 5
+KEY_PARENT = 6
+KEY_CHILD_FIRST = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    realm_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sku TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL DEFAULT '',
+    active INTEGER NOT NULL DEFAULT 1,
+    last_updated TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (realm_id, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS item_keys (
+    realm_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    PRIMARY KEY (realm_id, key, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS item_keys_by_item ON item_keys (realm_id, item_id);
+CREATE TABLE IF NOT EXISTS meta (
+    realm_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (realm_id, key)
+) WITHOUT ROWID;
+"""
+
+# Items reachable through a key, within one realm
+KEY_JOIN = (
+    "SELECT i.name, i.id FROM item_keys k "
+    "JOIN items i ON i.realm_id = k.realm_id AND i.id = k.item_id"
+)
+
+# Tables of the single-realm layout, rebuilt (and reloaded) on first open
+LEGACY_TABLES = ("items", "item_keys", "meta")
+
+
+def derive_item_keys(name: str, sku: str = "") -> List[Tuple[str, int]]:
+    """
+    Derive every lookup key for a catalog item.
+
+    Mirrors the key forms produced by create_sku_mapping (full name,
+    parent and child of "parent:child" names, dash parts, alphanumeric-only
+    forms) plus the item's SKU field.
+
+    Args:
+        name: The QuickBooks item name
+        sku: The QuickBooks item SKU, if any
+
+    Returns:
+        List of (key, priority) tuples
+    """
+    keys = []
+    lower = name.lower()
+    keys.append((lower, KEY_NAME))
+
+    if sku:
+        keys.append((sku.lower(), KEY_SKU))
+
+    if ":" in lower:
+        parent_sku, child_sku = lower.split(":", 1)
+        keys.append((parent_sku, KEY_PARENT))
+        keys.append((child_sku, KEY_CHILD))
+
+        if "-" in child_sku:
+            child_parts = child_sku.split("-")
+            keys.append((child_parts[-1], KEY_CHILD_LAST))
+            keys.append((child_parts[0], KEY_CHILD_FIRST))
+
+            child_sku_clean = "".join(c for c in child_sku if c.isalnum())
+            if child_sku_clean != child_sku:
+                keys.append((child_sku_clean, KEY_CHILD_CLEAN))
+
+    clean_name = "".join(c for c in lower if c.isalnum())
+    if clean_name != lower:
+        keys.append((clean_name, KEY_NAME_CLEAN))
+
+    return [(key, priority) for key, priority in keys if key]
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ItemIndex:
+    """
+    Persistent local index of the QuickBooks item catalog.
+
+    Args:
+        path: SQLite database path
+        realm_id: QuickBooks company the catalog belongs to
+        refresh_interval: Minimum seconds between incremental refreshes
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_INDEX_PATH,
+        realm_id: str = None,
+        refresh_interval: float = 300,
+    ):
+        self.path = path
+        self.realm_id = realm_id if realm_id is not None else get_client().realm_id
+        self.refresh_interval = refresh_interval
+        # Bumped whenever the indexed catalog changes
+        self.version = 0
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._drop_legacy_tables()
+        self._conn.executescript(SCHEMA)
+
+    def _drop_legacy_tables(self):
+        """Drop an index written before rows carried their realm"""
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(items)")
+        ]
+        if columns and "realm_id" not in columns:
+            with self._conn:
+                for table in LEGACY_TABLES:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+    def _get_meta(self, key: str, default: str = None) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE realm_id = ? AND key = ?",
+            (self.realm_id, key),
+        ).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: str):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (realm_id, key, value) VALUES (?, ?, ?)",
+                (self.realm_id, key, str(value)),
+            )
+
+    def clear(self):
+        """Drop this realm's indexed items so the next sync performs a full load"""
+        with self._lock, self._conn:
+            for table in ("items", "item_keys", "meta"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE realm_id = ?", (self.realm_id,)
+                )
+            self.version += 1
+
+    def _upsert(self, items: List[Dict], newest: str) -> str:
+        """Store items and their derived keys, returning the newest update time"""
+        newest_dt = _parse_timestamp(newest)
+
+        with self._conn:
+            for item in items:
+                item_id = str(item.get("Id", ""))
+                if not item_id:
+                    continue
+
+                name = item.get("Name", "Unnamed Item")
+                sku = item.get("Sku") or item.get("SKU") or ""
+                active = 1 if item.get("Active", True) else 0
+                last_updated = item.get("MetaData", {}).get("LastUpdatedTime", "")
+
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO items (realm_id, id, name, sku, type, "
+                    "active, last_updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self.realm_id,
+                        item_id,
+                        name,
+                        sku,
+                        item.get("Type", ""),
+                        active,
+                        last_updated,
+                    ),
+                )
+                self._conn.execute(
+                    "DELETE FROM item_keys WHERE realm_id = ? AND item_id = ?",
+                    (self.realm_id, item_id),
+                )
+                if active:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO item_keys (realm_id, key, item_id, "
+                        "priority) VALUES (?, ?, ?, ?)",
+                        [
+                            (self.realm_id, key, item_id, priority)
+                            for key, priority in sorted(
+                                derive_item_keys(name, sku), key=lambda kp: kp[1]
+                            )
+                        ],
+                    )
+
+                updated_dt = _parse_timestamp(last_updated)
+                if updated_dt and (newest_dt is None or updated_dt > newest_dt):
+                    newest, newest_dt = last_updated, updated_dt
+
+        return newest
+
+    def sync(self, force: bool = False) -> int:
+        """
+        Bring the index up to date with QuickBooks.
+
+        The first call pages in the whole active catalog; later calls only
+        fetch items changed since the newest LastUpdatedTime seen, and are
+        skipped entirely within refresh_interval of the previous sync.
+
+        Args:
+            force: Refresh even if the last sync is recent
+
+        Returns:
+            int: Number of items fetched from QuickBooks
+        """
+        with self._lock:
+            last_sync = float(self._get_meta("last_sync", "0"))
+            if not force and time.time() - last_sync < self.refresh_interval:
+                return 0
+
+            since = self._get_meta("last_updated", "")
+            if since:
+                # Include inactive items so deactivations are picked up
+                where = (
+                    "Active IN (true, false) AND "
+                    f"MetaData.LastUpdatedTime > '{since}'"
+                )
+            else:
+                where = "Active = true"
+
+            query = (
+                "SELECT Id, Name, Sku, Type, Active, MetaData FROM Item "
+                f"WHERE {where}"
+            )
+
+            # Store page by page so the full catalog is never held in memory
+            fetched = 0
+            newest = since
+            for page in query_pages(query, prefetch=True):
+                newest = self._upsert(page, newest)
+                fetched += len(page)
+
+            self._set_meta("last_updated", newest)
+            self._set_meta("last_sync", str(time.time()))
+            if fetched:
+                self.version += 1
+            logger.info(f"Item index synced {fetched} items")
+            return fetched
+
+    def all_items(self, with_sku: bool = False) -> List[Tuple]:
+        """
+        List every active item.
+
+        Args:
+            with_sku: Include the SKU as a third tuple element
+
+        Returns:
+            List of (name, id) or (name, id, sku) tuples
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, id, sku FROM items WHERE realm_id = ? AND active = 1 "
+                "ORDER BY name",
+                (self.realm_id,),
+            ).fetchall()
+        if with_sku:
+            return rows
+        return [(name, item_id) for name, item_id, _ in rows]
+
+    def lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up an item by name, SKU or any derived key.
+
+        Args:
+            key: Lookup key, compared case-insensitively
+
+        Returns:
+            Tuple (name, id) of the best match, or None
+        """
+        if not key:
+            return None
+
+        with self._lock:
+            return self._conn.execute(
+                f"{KEY_JOIN} WHERE k.realm_id = ? AND k.key = ? "
+                "ORDER BY k.priority, i.name LIMIT 1",
+                (self.realm_id, key.lower()),
+            ).fetchone()
+
+    def get_by_name(self, name: str) -> Optional[Tuple[str, str]]:
+        """Exact, case-insensitive lookup of an active item by name"""
+        with self._lock:
+            return self._conn.execute(
+                f"{KEY_JOIN} WHERE k.realm_id = ? AND k.key = ? AND k.priority = ? "
+                "LIMIT 1",
+                (self.realm_id, name.lower(), KEY_NAME),
+            ).fetchone()
+
+    def get_by_sku(self, sku: str) -> Optional[Tuple[str, str]]:
+        """Exact, case-insensitive lookup of an active item by its SKU field"""
+        with self._lock:
+            return self._conn.execute(
+                f"{KEY_JOIN} WHERE k.realm_id = ? AND k.key = ? AND k.priority = ? "
+                "LIMIT 1",
+                (self.realm_id, sku.lower(), KEY_SKU),
+            ).fetchone()
+
+    def close(self):
+        self._conn.close()
+
+
+_indexes: Dict[str, ItemIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_item_index() -> ItemIndex:
+    """Return the current realm's item index, opening it on first use"""
+    realm_id = get_client().realm_id
+    with _index_lock:
+        if realm_id not in _indexes:
+            _indexes[realm_id] = ItemIndex(realm_id=realm_id)
+        return _indexes[realm_id]
@@ -0,0 +1,278 @@
+"""
+Processed Invoice Ledger
+
+This module keeps a persistent SQLite ledger of the CFDI fiscal UUIDs
+(tfd:TimbreFiscalDigital) already posted to QuickBooks as bills, so the same
+invoice is never posted twice. check_duplicates pre-checks a whole batch of
+bills with one indexed lookup in the ledger plus a single DocNumber query
+against QuickBooks for the bills the ledger does not know, which also
+catches bills posted from another machine or before the ledger existed.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from .qb_auth import get_client, query_results, run_query
+from .qb_batch import MAX_IN_NAMES, MAX_QUERY_LENGTH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = os.getenv(
+    "QB_LEDGER_PATH", os.path.join(".qb_cache", "ledger.sqlite")
+)
+
+# SQLite's default limit on the number of ? parameters is 999
+MAX_SQL_PARAMETERS = 900
+
+# Bills carry their CFDI UUID in the private note, so a DocNumber match can
+# be confirmed against the exact invoice
+UUID_NOTE_PREFIX = "CFDI UUID "
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed (
+    realm_id TEXT NOT NULL,
+    uuid TEXT NOT NULL,
+    doc_number TEXT NOT NULL,
+    vendor_rfc TEXT NOT NULL,
+    bill_id TEXT NOT NULL,
+    posted_at REAL NOT NULL,
+    PRIMARY KEY (realm_id, uuid)
+) WITHOUT ROWID;
+"""
+
+
+def uuid_note(uuid: str) -> str:
+    """PrivateNote text recording a bill's CFDI UUID"""
+    return f"{UUID_NOTE_PREFIX}{uuid}"
+
+
+class Ledger:
+    """
+    Persistent set of CFDI UUIDs posted as QuickBooks bills.
+
+    Args:
+        path: SQLite database file
+        realm_id: QuickBooks company the bills were posted to
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH, realm_id: str = None):
+        self.path = path
+        self.realm_id = realm_id if realm_id is not None else get_client().realm_id
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def lookup(self, uuids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Find which UUIDs have already been posted.
+
+        Args:
+            uuids: CFDI UUIDs (empty ones are ignored)
+
+        Returns:
+            Dict mapping each posted UUID to its doc_number, vendor_rfc,
+            bill_id and posted_at
+        """
+        wanted = list(dict.fromkeys(u.upper() for u in uuids if u))
+        found = {}
+        with self._lock:
+            # One IN query on the primary key per chunk of parameters
+            for start in range(0, len(wanted), MAX_SQL_PARAMETERS):
+                chunk = wanted[start : start + MAX_SQL_PARAMETERS]
+                rows = self._conn.execute(
+                    "SELECT uuid, doc_number, vendor_rfc, bill_id, posted_at "
+                    "FROM processed WHERE realm_id = ? AND uuid IN ("
+                    + ", ".join("?" * len(chunk))
+                    + ")",
+                    (self.realm_id, *chunk),
+                ).fetchall()
+                for uuid, doc_number, vendor_rfc, bill_id, posted_at in rows:
+                    found[uuid] = {
+                        "doc_number": doc_number,
+                        "vendor_rfc": vendor_rfc,
+                        "bill_id": bill_id,
+                        "posted_at": posted_at,
+                    }
+        return found
+
+    def record(
+        self, uuid: str, doc_number: str = "", vendor_rfc: str = "", bill_id: str = ""
+    ) -> bool:
+        """
+        Record a UUID as posted.
+
+        Args:
+            uuid: CFDI UUID
+            doc_number: Invoice number the bill was posted with
+            vendor_rfc: RFC of the issuing vendor
+            bill_id: QuickBooks ID of the created bill
+
+        Returns:
+            bool: False if the UUID was empty and nothing was recorded
+        """
+        if not uuid:
+            return False
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed (realm_id, uuid, doc_number, "
+                "vendor_rfc, bill_id, posted_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.realm_id,
+                    uuid.upper(),
+                    doc_number or "",
+                    vendor_rfc or "",
+                    str(bill_id or ""),
+                    time.time(),
+                ),
+            )
+        logger.info(f"Recorded CFDI {uuid} as bill {bill_id}")
+        return True
+
+    def forget(self, uuid: str):
+        """Drop a UUID, e.g. after its bill was deleted in QuickBooks"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM processed WHERE realm_id = ? AND uuid = ?",
+                (self.realm_id, uuid.upper()),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM processed WHERE realm_id = ?", (self.realm_id,)
+            ).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+_ledgers: Dict[str, Ledger] = {}
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> Ledger:
+    """Return the current realm's ledger, opening it on first use"""
+    realm_id = get_client().realm_id
+    with _ledger_lock:
+        if realm_id not in _ledgers:
+            _ledgers[realm_id] = Ledger(realm_id=realm_id)
+        return _ledgers[realm_id]
+
+
+def find_bills_by_doc_numbers(doc_numbers: Iterable[str]) -> Dict[str, List[Dict]]:
+    """
+    Look up existing QuickBooks bills by DocNumber.
+
+    All numbers go into one DocNumber IN (...) query, split only when it
+    would exceed the QuickBooks query length limit.
+
+    Args:
+        doc_numbers: Invoice numbers; quotes are stripped
+
+    Returns:
+        Dict mapping each DocNumber to the bills carrying it
+    """
+    cleaned = list(
+        dict.fromkeys(
+            n.replace("'", "").replace('"', "") for n in doc_numbers if n
+        )
+    )
+    prefix = (
+        "SELECT Id, DocNumber, VendorRef, PrivateNote FROM Bill WHERE DocNumber IN ("
+    )
+    suffix = f") MAXRESULTS {MAX_IN_NAMES}"
+    budget = MAX_QUERY_LENGTH - len(prefix) - len(suffix)
+
+    chunks, chunk, length = [], [], 0
+    for number in cleaned:
+        extra = len(number) + 2 + (2 if chunk else 0)
+        if chunk and (length + extra > budget or len(chunk) >= MAX_IN_NAMES):
+            chunks.append(chunk)
+            chunk, length = [], 0
+            extra = len(number) + 2
+        chunk.append(number)
+        length += extra
+    if chunk:
+        chunks.append(chunk)
+
+    found: Dict[str, List[Dict]] = {}
+    for chunk in chunks:
+        query = prefix + ", ".join(f"'{number}'" for number in chunk) + suffix
+        for bill in query_results(run_query(query), "Bill"):
+            found.setdefault(bill.get("DocNumber", ""), []).append(bill)
+    return found
+
+
+def check_duplicates(
+    bills: List[Dict], vendor_ids: List[str] = None, query_quickbooks: bool = True
+) -> List[Optional[str]]:
+    """
+    Pre-check a batch of bills for invoices that were already posted.
+
+    A bill is a duplicate when its UUID is in the ledger, or when a
+    QuickBooks bill has its DocNumber and either carries its UUID in the
+    private note or belongs to the same vendor.
+
+    Args:
+        bills: Formatted bill data with uuid and invoice_number
+        vendor_ids: QuickBooks vendor ID of each bill, to tell apart equal
+            invoice numbers from different vendors
+        query_quickbooks: Also run the DocNumber query for bills the ledger
+            does not know
+
+    Returns:
+        For each bill, the reason it is a duplicate, or None
+    """
+    vendor_ids = vendor_ids or [None] * len(bills)
+    posted = get_ledger().lookup(bill.get("uuid", "") for bill in bills)
+
+    reasons: List[Optional[str]] = []
+    for bill in bills:
+        record = posted.get(bill.get("uuid", "").upper())
+        if record:
+            posted_on = time.strftime("%Y-%m-%d", time.localtime(record["posted_at"]))
+            reasons.append(
+                f"CFDI {bill['uuid']} was already posted as bill "
+                f"{record['bill_id']} on {posted_on}"
+            )
+        else:
+            reasons.append(None)
+
+    pending = [
+        i
+        for i, reason in enumerate(reasons)
+        if not reason and bills[i].get("invoice_number")
+    ]
+    if not query_quickbooks or not pending:
+        return reasons
+
+    existing = find_bills_by_doc_numbers(bills[i]["invoice_number"] for i in pending)
+    for i in pending:
+        bill = bills[i]
+        uuid = bill.get("uuid", "")
+        for qb_bill in existing.get(bill["invoice_number"], []):
+            same_uuid = uuid and uuid in (qb_bill.get("PrivateNote") or "")
+            same_vendor = (
+                vendor_ids[i] is not None
+                and qb_bill.get("VendorRef", {}).get("value") == vendor_ids[i]
+            )
+            if same_uuid or same_vendor:
+                reasons[i] = (
+                    f"QuickBooks bill {qb_bill.get('Id')} already has DocNumber "
+                    f"{bill['invoice_number']}"
+                    + (" and this CFDI's UUID" if same_uuid else " for this vendor")
+                )
+                break
+
+    return reasons
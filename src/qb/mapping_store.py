@@ -0,0 +1,231 @@
+"""
+Learned Item Mapping Store
+
+This module keeps a persistent SQLite table of confirmed matches between a
+vendor's line identifiers (NoIdentificacion and SKU, keyed by the vendor's
+RFC) and QuickBooks item IDs. Exact and user-approved matches are
+recorded after a bill is created successfully, so repeat vendors resolve their lines locally without any
+catalog matching or QuickBooks query, and hit/miss counters show how many
+lookups the store saves.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .qb_auth import get_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.getenv(
+    "QB_MAPPING_STORE_PATH", os.path.join(".qb_cache", "mappings.sqlite")
+)
+
+# Line identifier kinds, in lookup order
+KEY_PRODUCT_ID = "id"  # cfdi:Concepto NoIdentificacion
+KEY_SKU = "sku"  # SKU taken from the description
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (
+    realm_id TEXT NOT NULL,
+    vendor_rfc TEXT NOT NULL,
+    key_type TEXT NOT NULL,
+    key TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    confirmations INTEGER NOT NULL DEFAULT 1,
+    last_confirmed REAL NOT NULL,
+    PRIMARY KEY (realm_id, vendor_rfc, key_type, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    realm_id TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def line_keys(line: Dict) -> List[Tuple[str, str]]:
+    """
+    Identifiers of a bill line that a mapping can be keyed on.
+
+    Args:
+        line: Line item with product_id (NoIdentificacion) and/or sku
+
+    Returns:
+        List of (key_type, key) tuples in lookup order
+    """
+    keys = []
+    product_id = str(line.get("product_id") or "").strip()
+    if product_id:
+        keys.append((KEY_PRODUCT_ID, product_id))
+    sku = str(line.get("sku") or "").strip().lower()
+    if sku:
+        keys.append((KEY_SKU, sku))
+    return keys
+
+
+class MappingStore:
+    """
+    Persistent vendor line -> QuickBooks item mapping.
+
+    Args:
+        path: SQLite database file
+        realm_id: QuickBooks company the item IDs belong to
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, realm_id: str = None):
+        self.path = path
+        self.realm_id = realm_id if realm_id is not None else get_client().realm_id
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def lookup_lines(self, vendor_rfc: str, lines: List[Dict]) -> List[Optional[str]]:
+        """
+        Resolve bill lines from confirmed mappings.
+
+        Every line counts as one hit or one miss in the store statistics.
+
+        Args:
+            vendor_rfc: RFC of the issuing vendor (cfdi:Emisor Rfc)
+            lines: Line items with product_id and/or sku
+
+        Returns:
+            List of item IDs (or None), in the same order as lines
+        """
+        if not vendor_rfc:
+            return [None] * len(lines)
+
+        results = []
+        with self._lock:
+            for line in lines:
+                item_id = None
+                for key_type, key in line_keys(line):
+                    row = self._conn.execute(
+                        "SELECT item_id FROM mappings WHERE realm_id = ? "
+                        "AND vendor_rfc = ? AND key_type = ? AND key = ?",
+                        (self.realm_id, vendor_rfc, key_type, key),
+                    ).fetchone()
+                    if row:
+                        item_id = row[0]
+                        break
+                results.append(item_id)
+
+            hits = sum(1 for item_id in results if item_id)
+            self._count(hits, len(results) - hits)
+
+        return results
+
+    def _count(self, hits: int, misses: int):
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO stats (realm_id, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT (realm_id) DO UPDATE SET "
+                "hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (self.realm_id, hits, misses),
+            )
+
+    def record(self, vendor_rfc: str, matches: Iterable[Tuple[Dict, str]]) -> int:
+        """
+        Record confirmed line -> item matches.
+
+        Args:
+            vendor_rfc: RFC of the issuing vendor
+            matches: (line item, item ID) pairs
+
+        Returns:
+            int: Number of mappings written
+        """
+        if not vendor_rfc:
+            return 0
+
+        now = time.time()
+        rows = [
+            (self.realm_id, vendor_rfc, key_type, key, item_id, now)
+            for line, item_id in matches
+            if item_id
+            for key_type, key in line_keys(line)
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO mappings (realm_id, vendor_rfc, key_type, key, "
+                "item_id, last_confirmed) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (realm_id, vendor_rfc, key_type, key) DO UPDATE SET "
+                "confirmations = CASE WHEN item_id = excluded.item_id "
+                "THEN confirmations + 1 ELSE 1 END, "
+                "item_id = excluded.item_id, "
+                "last_confirmed = excluded.last_confirmed",
+                rows,
+            )
+        logger.info(f"Recorded {len(rows)} item mappings for vendor {vendor_rfc}")
+        return len(rows)
+
+    def forget(self, vendor_rfc: str = None):
+        """Drop the mappings of one vendor, or of every vendor"""
+        with self._lock, self._conn:
+            if vendor_rfc is None:
+                self._conn.execute(
+                    "DELETE FROM mappings WHERE realm_id = ?", (self.realm_id,)
+                )
+            else:
+                self._conn.execute(
+                    "DELETE FROM mappings WHERE realm_id = ? AND vendor_rfc = ?",
+                    (self.realm_id, vendor_rfc),
+                )
+
+    def stats(self) -> Dict:
+        """
+        Store size and lookup counters.
+
+        Returns:
+            Dict with mappings, vendors, hits, misses and hit_rate
+        """
+        with self._lock:
+            mappings, vendors = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT vendor_rfc) FROM mappings "
+                "WHERE realm_id = ?",
+                (self.realm_id,),
+            ).fetchone()
+            row = self._conn.execute(
+                "SELECT hits, misses FROM stats WHERE realm_id = ?", (self.realm_id,)
+            ).fetchone()
+
+        hits, misses = row if row else (0, 0)
+        lookups = hits + misses
+        return {
+            "mappings": mappings,
+            "vendors": vendors,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM stats WHERE realm_id = ?", (self.realm_id,))
+
+    def close(self):
+        self._conn.close()
+
+
+_stores: Dict[str, MappingStore] = {}
+_store_lock = threading.Lock()
+
+
+def get_mapping_store() -> MappingStore:
+    """Return the current realm's mapping store, opening it on first use"""
+    realm_id = get_client().realm_id
+    with _store_lock:
+        if realm_id not in _stores:
+            _stores[realm_id] = MappingStore(realm_id=realm_id)
+        return _stores[realm_id]
@@ -4,29 +4,27 @@ QuickBooks API Module
 This module provides functions to interact with QuickBooks API endpoints.
 """
 
-import streamlit as st
-from .qb_auth import make_api_request, run_query
+from . import events
+from .cache import ttl_cache
+from .qb_auth import QueryError, get_client, make_api_request, query_all
 
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
 def get_vendors():
     """Get all active vendors from QuickBooks"""
-    query = (
-        "SELECT Id, DisplayName, Active FROM Vendor WHERE Active = true MAXRESULTS 1000"
-    )
-    vendors_response = run_query(query)
-
-    if vendors_response and vendors_response.status_code == 200:
-        vendors_data = vendors_response.json()
-        if (
-            "QueryResponse" in vendors_data
-            and "Vendor" in vendors_data["QueryResponse"]
-        ):
-            vendors = vendors_data["QueryResponse"]["Vendor"]
-            return [
-                (vendor.get("DisplayName", "Unnamed Vendor"), vendor.get("Id", ""))
-                for vendor in vendors
-            ]
+    return _get_vendors(get_client().realm_id)
+
+
+@ttl_cache(3600)  # Cache for 1 hour, per realm
+def _get_vendors(realm_id):
+    query = "SELECT Id, DisplayName, Active FROM Vendor WHERE Active = true"
+
+    try:
+        return [
+            (vendor.get("DisplayName", "Unnamed Vendor"), vendor.get("Id", ""))
+            for vendor in query_all(query, prefetch=True)
+        ]
+    except QueryError as e:
+        events.error(f"Error loading vendors: {str(e)}")
 
     return []
 
@@ -38,19 +36,13 @@ def get_accounts(account_type=None):
     else:
         query = "SELECT Id, Name, AccountType, AccountSubType FROM Account WHERE Active = true"
 
-    accounts_response = run_query(query)
-
-    if accounts_response and accounts_response.status_code == 200:
-        accounts_data = accounts_response.json()
-        if (
-            "QueryResponse" in accounts_data
-            and "Account" in accounts_data["QueryResponse"]
-        ):
-            accounts = accounts_data["QueryResponse"]["Account"]
-            return [
-                (account.get("Name", "Unnamed Account"), account.get("Id", ""))
-                for account in accounts
-            ]
+    try:
+        return [
+            (account.get("Name", "Unnamed Account"), account.get("Id", ""))
+            for account in query_all(query)
+        ]
+    except QueryError as e:
+        events.error(f"Error loading accounts: {str(e)}")
 
     return []
 
@@ -73,7 +65,7 @@ def create_bill(vendor_id, invoice_number, bill_data, account_id="7"):
     Args:
         vendor_id (str): QuickBooks Vendor ID
         invoice_number (str): Invoice number from the bill
-        bill_data (DataFrame): DataFrame containing bill line items
+        bill_data (DataFrame): DataFrame of line items, as returned by parse_bill
         account_id (str): Default expense account ID
 
     Returns:
@@ -90,8 +82,8 @@ def create_bill(vendor_id, invoice_number, bill_data, account_id="7"):
         line_items.append(
             {
                 "DetailType": "AccountBasedExpenseLineDetail",
-                "Amount": float(row["Importe"]),
-                "Description": row.get("Descripcion", ""),
+                "Amount": row["amount"],
+                "Description": row.get("full_description", ""),
                 "AccountBasedExpenseLineDetail": {
                     "AccountRef": {"value": account_id},
                     "TaxCodeRef": {"value": "TAX"},
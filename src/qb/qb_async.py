@@ -0,0 +1,190 @@
+"""
+QuickBooks Async Client
+
+This module provides an asyncio variant of make_api_request/run_query so
+many item lookups can be in flight at once, bounded by the QuickBooks
+per-realm concurrent request limit. Bills resolve their lines with the
+batched lookups of qb_batch instead; this per-line client is kept as the
+baseline those are measured against in bench_item_resolution.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from .qb_auth import make_api_request, query_results
+from .qb_batch import clean_value, item_like_query, select_sku_match
+from .rate_limit import CONCURRENCY
+
+class AsyncQuickBooksClient:
+    """
+    Async QuickBooks client with bounded request concurrency.
+
+    Requests go through the same pooled, retrying make_api_request used by
+    the synchronous code on a dedicated thread pool, while a semaphore keeps
+    at most max_concurrency of them in flight.
+
+    Args:
+        max_concurrency (int): Maximum simultaneous HTTP requests
+    """
+
+    def __init__(self, max_concurrency: int = CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lookups: Dict[str, asyncio.Future] = {}
+        self.cache: Dict[str, Optional[Dict]] = {}
+
+    async def make_api_request(self, endpoint, method="GET", data=None):
+        """Async version of qb_auth.make_api_request"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            # Carry the current client and event sink into the worker thread
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self._executor, context.run, make_api_request, endpoint, method, data
+            )
+
+    def close(self):
+        """Shut down the worker threads"""
+        self._executor.shutdown(wait=False)
+
+    async def run_query(self, query):
+        """Async version of qb_auth.run_query"""
+        encoded_query = requests.utils.quote(query)
+        return await self.make_api_request(f"query?query={encoded_query}")
+
+    async def get_item_by_name(self, item_name: str) -> Optional[Dict]:
+        """Async version of qb_bill.get_item_by_name"""
+        clean_name = clean_value(item_name)
+
+        # First try exact match, then a LIKE query
+        for query in (
+            f"SELECT Id, Name, Type, Description FROM Item WHERE Name = '{clean_name}'",
+            item_like_query(clean_name),
+        ):
+            if not query:
+                continue
+            items = query_results(await self.run_query(query), "Item")
+            if items:
+                return items[0]
+
+        return None
+
+    async def _find_item(self, clean_name: str, sku: str) -> Optional[Dict]:
+        query = item_like_query(sku)
+        if query:
+            items = query_results(await self.run_query(query), "Item")
+            if items:
+                return select_sku_match(items, sku)
+
+        if clean_name:
+            return await self.get_item_by_name(clean_name)
+
+        return None
+
+    async def find_item_by_sku_or_name(
+        self, name: str, sku: str = None
+    ) -> Optional[Dict]:
+        """
+        Async version of qb_bill.find_item_by_sku_or_name.
+
+        Results are cached on the client, and concurrent lookups of the same
+        name/SKU share a single set of requests.
+        """
+        if not name and not sku:
+            return None
+
+        clean_name = clean_value(name)
+        cache_key = f"{clean_name}:{sku if sku else ''}"
+
+        if cache_key in self.cache:
+            return self.cache[cache_key]
+
+        if cache_key not in self._lookups:
+            self._lookups[cache_key] = asyncio.ensure_future(
+                self._find_item(clean_name, sku)
+            )
+
+        try:
+            result = await self._lookups[cache_key]
+        finally:
+            self._lookups.pop(cache_key, None)
+
+        self.cache[cache_key] = result
+        return result
+
+    async def resolve_line(
+        self, product_name: str, sku: str, description: str
+    ) -> Optional[Dict]:
+        """
+        Resolve one bill line the way build_quickbooks_bill does: by product
+        name, then by SKU, then by description.
+        """
+        if product_name:
+            item = await self.find_item_by_sku_or_name(product_name, "")
+            if item:
+                return item
+
+        if sku:
+            item = await self.find_item_by_sku_or_name("", sku)
+            if item:
+                return item
+
+        if description:
+            return await self.find_item_by_sku_or_name(description, "")
+
+        return None
+
+    async def resolve_lines(
+        self, lookups: List[Tuple[str, str, str]]
+    ) -> List[Optional[Dict]]:
+        """
+        Resolve many bill lines concurrently.
+
+        Args:
+            lookups: List of (product_name, sku, description) tuples
+
+        Returns:
+            List of items (or None), in the same order as lookups
+        """
+        return await asyncio.gather(
+            *(self.resolve_line(*lookup) for lookup in lookups)
+        )
+
+
+def resolve_items_concurrently(
+    lookups: List[Tuple[str, str, str]],
+    max_concurrency: int = CONCURRENCY,
+    cache: Dict = None,
+) -> List[Optional[Dict]]:
+    """
+    Resolve bill lines to QuickBooks items with concurrent queries.
+
+    Synchronous entry point for code that is not itself async.
+
+    Args:
+        lookups: List of (product_name, sku, description) tuples
+        max_concurrency (int): Maximum simultaneous HTTP requests
+        cache (Dict, optional): Lookup cache to read and update, keyed like
+            find_item_by_sku_or_name's cache
+
+    Returns:
+        List of items (or None), in the same order as lookups
+    """
+    if not lookups:
+        return []
+
+    async def run():
+        client = AsyncQuickBooksClient(max_concurrency)
+        if cache is not None:
+            client.cache = cache
+        try:
+            return await client.resolve_lines(lookups)
+        finally:
+            client.close()
+
+    return asyncio.run(run())
@@ -5,24 +5,39 @@ This module handles all QuickBooks API authentication, token management,
 and API request functions.
 """
 
+import contextlib
+import contextvars
+import functools
 import os
+import re
+import threading
 import time
 import requests
-import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from intuitlib.client import AuthClient
-from intuitlib.enums import Scopes
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Imported after load_dotenv so pool and retry settings can come from .env
+from . import events
+from .cache import LRUCache, get_item_cache, reset_item_cache, set_item_cache
+from .rate_limit import create_rate_limiter
+from .session import (
+    RequestMetrics,
+    create_session,
+    get_session,
+    request_metrics,
+    send_request,
+)
+from .token_manager import DEFAULT_LOCK_PATH, TokenManager, TokenState
+from .token_store import TokenStore
+
 # QuickBooks API credentials
 CLIENT_ID = os.getenv("QB_CLIENT_ID")
 CLIENT_SECRET = os.getenv("QB_CLIENT_SECRET")
-ACCESS_TOKEN = os.getenv("QB_ACCESS_TOKEN")
-REFRESH_TOKEN = os.getenv("QB_REFRESH_TOKEN")
 COMPANY_ID = os.getenv("QB_COMPANY_ID")
-TOKEN_EXPIRY = os.getenv("QB_TOKEN_EXPIRY")
 
 # API endpoints and settings
 REDIRECT_URI = os.getenv(
@@ -37,282 +52,359 @@ else:
     BASE_URL = "https://quickbooks.api.intuit.com"
     ENVIRONMENT = "production"
 
-# Initialize the auth client
-auth_client = AuthClient(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    redirect_uri=REDIRECT_URI,
-    environment=ENVIRONMENT,
-)
+# Allow pointing the client at another host, e.g. a local mock server
+BASE_URL = os.getenv("QB_BASE_URL", BASE_URL)
 
+# Query paging: QuickBooks returns at most 1000 entities per request
+QUERY_PAGE_SIZE = 1000
+PAGING_CLAUSE_RE = re.compile(r"\s+(STARTPOSITION|MAXRESULTS)\s+\d+", re.IGNORECASE)
+ENTITY_RE = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+ORDER_BY_RE = re.compile(r"\bORDERBY\b", re.IGNORECASE)
 
-def save_tokens_to_env(access_token, refresh_token, token_expiry, company_id=None):
-    """Save tokens to .env file"""
-    env_file = ".env"
-
-    # Check if .env file exists
-    if not os.path.exists(env_file):
-        # Create a new .env file with the tokens
-        with open(env_file, "w") as f:
-            f.write(f"QB_ACCESS_TOKEN={access_token}\n")
-            f.write(f"QB_REFRESH_TOKEN={refresh_token}\n")
-            f.write(f"QB_TOKEN_EXPIRY={token_expiry}\n")
-            if company_id:
-                f.write(f"QB_COMPANY_ID={company_id}\n")
-        return
-
-    # Read current .env file
-    with open(env_file, "r") as f:
-        lines = f.readlines()
-
-    # Update tokens
-    token_vars = {
-        "QB_ACCESS_TOKEN": access_token,
-        "QB_REFRESH_TOKEN": refresh_token,
-        "QB_TOKEN_EXPIRY": token_expiry,
-    }
-
-    if company_id:
-        token_vars["QB_COMPANY_ID"] = company_id
-
-    # Track which vars we've updated
-    updated_vars = set()
-    new_lines = []
-
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("#"):
-            new_lines.append(line)
-            continue
-
-        var_name = line.split("=")[0]
-        if var_name in token_vars:
-            new_lines.append(f"{var_name}={token_vars[var_name]}")
-            updated_vars.add(var_name)
-        else:
-            new_lines.append(line)
-
-    # Add any missing vars
-    for var_name, value in token_vars.items():
-        if var_name not in updated_vars:
-            new_lines.append(f"{var_name}={value}")
-
-    # Write updated .env file
-    with open(env_file, "w") as f:
-        f.write("\n".join(new_lines) + "\n")
-
-    # Also update the current environment variables
-    for var_name, value in token_vars.items():
-        os.environ[var_name] = str(value)
-
-
-def refresh_access_token():
-    """Refresh access token using refresh token"""
-    if not REFRESH_TOKEN:
-        st.error("No refresh token available. Please re-authenticate.")
-        return None
 
-    try:
-        auth_client.refresh(refresh_token=REFRESH_TOKEN)
+def create_auth_client():
+    """
+    Build an OAuth client for the configured app.
 
-        # Save the new tokens
-        save_tokens_to_env(
-            auth_client.access_token,
-            auth_client.refresh_token,
-            str(int(time.time()) + auth_client.x_refresh_token_expires_in),
-        )
+    AuthClient fetches Intuit's discovery document when it is constructed,
+    so clients are only built when a token flow needs one, never on import.
+    """
+    return AuthClient(
+        client_id=CLIENT_ID,
+        client_secret=CLIENT_SECRET,
+        redirect_uri=REDIRECT_URI,
+        environment=ENVIRONMENT,
+    )
 
-        # Return the new access token
-        return auth_client.access_token
-    except Exception as e:
-        st.error(f"Error refreshing token: {str(e)}")
-        return None
 
+_auth_client = None
+_auth_client_lock = threading.Lock()
 
-def is_token_valid():
-    """Check if the access token is still valid"""
-    if not ACCESS_TOKEN or not TOKEN_EXPIRY:
-        return False
-
-    try:
-        expiry = int(TOKEN_EXPIRY)
-        current_time = int(time.time())
-        # Return True if token is not expired (with 5 minute buffer)
-        return current_time < (expiry - 300)
-    except:
-        return False
 
+def get_auth_client():
+    """Return the shared OAuth client, creating it on first use"""
+    global _auth_client
+    with _auth_client_lock:
+        if _auth_client is None:
+            _auth_client = create_auth_client()
+        return _auth_client
 
-def get_valid_access_token():
-    """Get a valid access token, refreshing if necessary"""
-    if is_token_valid():
-        return ACCESS_TOKEN
-    else:
-        return refresh_access_token()
 
+# Tokens from before the token store are read from .env once and migrated
+ENV_FILE = ".env"
 
-def initial_auth_flow():
-    """Handle the initial authorization flow - Direct Code Extraction Version"""
-    # Define the scopes needed for your application
-    scopes = [Scopes.ACCOUNTING]
+token_store = TokenStore()
 
-    # Generate the authorization URL
-    auth_url = auth_client.get_authorization_url(scopes)
 
-    # Display instructions and URL in Streamlit
-    st.title("QuickBooks API Authorization")
-    st.write("You need to authorize this application to access your QuickBooks data.")
-    st.markdown(f"### Step 1: [Click here to authorize with QuickBooks]({auth_url})")
+def _load_env_tokens():
+    """Read tokens from .env, over the process environment"""
+    values = dict(os.environ)
+    if os.path.exists(ENV_FILE):
+        values.update({k: v for k, v in dotenv_values(ENV_FILE).items() if v})
 
-    st.write("---")
+    access_token = values.get("QB_ACCESS_TOKEN") or ""
+    refresh_token = values.get("QB_REFRESH_TOKEN") or ""
+    if not access_token and not refresh_token:
+        return None
 
-    st.markdown("### Step 2: After authorizing, you'll see a URL with 'code=' in it")
-    st.write(
-        "Copy ONLY the value of the 'code' parameter (the text after 'code=' and before any '&')"
+    try:
+        expires_at = float(values.get("QB_TOKEN_EXPIRY") or 0)
+    except ValueError:
+        expires_at = 0.0
+    return TokenState(
+        access_token, refresh_token, expires_at, values.get("QB_COMPANY_ID") or ""
     )
 
-    auth_code = st.text_input("Paste ONLY the authorization code here:")
 
-    st.markdown("### Step 3: Copy the Company ID (realmId)")
-    st.write("In the same URL, find 'realmId=' and copy the number that follows it")
+def _load_tokens():
+    """Read the persisted tokens; costs one stat unless another worker saved"""
+    state = token_store.load(COMPANY_ID or "")
+    if state is None:
+        state = _load_env_tokens()
+    return state
+
+
+def _oauth_refresh(refresh_token, oauth_client=None):
+    """Exchange a refresh token for new tokens"""
+    oauth_client = oauth_client or get_auth_client()
+    oauth_client.refresh(refresh_token=refresh_token)
+    # expires_in is the access token's lifetime (about an hour);
+    # x_refresh_token_expires_in belongs to the refresh token (about 100 days)
+    return TokenState(
+        oauth_client.access_token,
+        oauth_client.refresh_token,
+        time.time() + oauth_client.expires_in,
+    )
 
-    realm_id = st.text_input("Paste the realmId here:")
 
-    if st.button("Complete Authorization") and auth_code and realm_id:
-        try:
-            st.write(
-                f"Using authorization code: {auth_code[:5]}... (length: {len(auth_code)})"
+AUTO_REFRESH = os.getenv("QB_TOKEN_AUTO_REFRESH", "true").lower() == "true"
+
+
+class QuickBooksClient:
+    """
+    Connection to one QuickBooks company (realm).
+
+    Each client has its own tokens, pooled HTTP session, request metrics
+    and item lookup cache, so one process can work on several companies.
+    The module-level functions (make_api_request, run_query, ...) act on
+    the current client: the one activated in this context, or else the
+    default client configured from .env.
+
+    Args:
+        realm_id (str): QuickBooks company ID
+        base_url (str): API host
+        token_manager (TokenManager, optional): Token manager to use instead
+            of one backed by the realm's entry in the token store
+        session (requests.Session, optional): Session to use instead of a
+            new pooled one
+        metrics (RequestMetrics, optional): Collector instead of a new one
+        item_cache (MutableMapping, optional): Item lookup cache instead of
+            a new LRU cache
+        rate_limiter (RateLimiter, optional): Limiter instead of the one
+            shared by every process working on realm_id
+    """
+
+    def __init__(
+        self,
+        realm_id,
+        base_url=BASE_URL,
+        token_manager=None,
+        session=None,
+        metrics=None,
+        item_cache=None,
+        rate_limiter=None,
+    ):
+        self.realm_id = realm_id or ""
+        self.base_url = base_url
+        self._oauth_client = None
+        self._oauth_lock = threading.Lock()
+
+        if token_manager is None:
+            token_manager = TokenManager(
+                refresh=self._refresh,
+                load=functools.partial(token_store.load, self.realm_id),
+                save=token_store.save,
+                lock_path=f"{DEFAULT_LOCK_PATH}.{self.realm_id}",
+                auto_refresh=AUTO_REFRESH,
             )
-            st.write(f"Using realmId: {realm_id}")
-
-            # Create a new auth client with exact credentials to avoid any issues
-            temp_auth_client = AuthClient(
-                client_id=CLIENT_ID,
-                client_secret=CLIENT_SECRET,
-                redirect_uri=REDIRECT_URI,
-                environment=ENVIRONMENT,
+        self.token_manager = token_manager
+        self.session = session or create_session()
+        self.metrics = metrics or RequestMetrics()
+        self.item_cache = item_cache if item_cache is not None else LRUCache()
+        self.rate_limiter = rate_limiter or create_rate_limiter(self.realm_id)
+
+    def __repr__(self):
+        return f"QuickBooksClient(realm_id={self.realm_id!r})"
+
+    @property
+    def oauth_client(self):
+        """This realm's OAuth client, created on its first token refresh"""
+        # AuthClient keeps the tokens of its last refresh, so realms
+        # refreshing concurrently each need their own
+        with self._oauth_lock:
+            if self._oauth_client is None:
+                self._oauth_client = create_auth_client()
+            return self._oauth_client
+
+    def _refresh(self, refresh_token):
+        return _oauth_refresh(refresh_token, oauth_client=self.oauth_client)
+
+    def url(self, endpoint):
+        """Full API URL of an endpoint of this company"""
+        realm_id = self.token_manager.realm_id or self.realm_id
+        return f"{self.base_url}/v3/company/{realm_id}/{endpoint}"
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Make this the current client (and its item cache) within the block"""
+        client_token = set_client(self)
+        cache_token = set_item_cache(self.item_cache)
+        try:
+            yield self
+        finally:
+            reset_item_cache(cache_token)
+            reset_client(client_token)
+
+    def set_tokens(self, access_token, refresh_token, expires_in, realm_id=None):
+        """Install tokens from a completed authorization flow"""
+        self.token_manager.update(
+            TokenState(
+                access_token,
+                refresh_token,
+                time.time() + float(expires_in),
+                realm_id or self.token_manager.realm_id or self.realm_id,
             )
+        )
 
-            # Set the realm ID directly
-            temp_auth_client.realm_id = realm_id
+    def refresh_access_token(self, stale_token=None):
+        """Refresh the access token; see refresh_access_token"""
+        state = self.token_manager.state
+        if stale_token is None and state is not None:
+            stale_token = state.access_token
 
-            # Get the bearer token with just the code
-            try:
-                temp_auth_client.get_bearer_token(code=auth_code)
+        state = self.token_manager.refresh(stale_token=stale_token)
+        if state is None:
+            events.error("Could not refresh the access token. Please re-authenticate.")
+            return None
+        return state.access_token
 
-                # Save the tokens
-                save_tokens_to_env(
-                    temp_auth_client.access_token,
-                    temp_auth_client.refresh_token,
-                    str(int(time.time()) + temp_auth_client.x_refresh_token_expires_in),
-                    temp_auth_client.realm_id,
-                )
+    def make_api_request(self, endpoint, method="GET", data=None):
+        """Make an API request to this company with automatic token handling"""
+        access_token = self.token_manager.get_token()
+        if not access_token:
+            events.error("Failed to get a valid access token")
+            return None
 
-                st.success(
-                    "Authorization successful! You can now use the QuickBooks API."
-                )
-                st.experimental_rerun()
-            except Exception as inner_e:
-                st.error(f"Error getting bearer token: {str(inner_e)}")
-
-                # Try direct token request as last resort
-                try:
-                    st.write("Attempting direct token request...")
-                    import requests
-                    import base64
-
-                    token_endpoint = (
-                        "https://oauth.platform.intuit.com/oauth2/v1/tokens/bearer"
-                    )
-                    auth_header = base64.b64encode(
-                        f"{CLIENT_ID}:{CLIENT_SECRET}".encode()
-                    ).decode()
-
-                    headers = {
-                        "Authorization": f"Basic {auth_header}",
-                        "Content-Type": "application/x-www-form-urlencoded",
-                    }
-
-                    data = {
-                        "grant_type": "authorization_code",
-                        "code": auth_code,
-                        "redirect_uri": REDIRECT_URI,
-                    }
-
-                    response = requests.post(token_endpoint, headers=headers, data=data)
-                    st.write(f"Response status: {response.status_code}")
-
-                    if response.status_code == 200:
-                        token_data = response.json()
-                        save_tokens_to_env(
-                            token_data["access_token"],
-                            token_data["refresh_token"],
-                            str(
-                                int(time.time())
-                                + token_data["x_refresh_token_expires_in"]
-                            ),
-                            realm_id,
-                        )
-                        st.success("Direct token request successful!")
-                        st.experimental_rerun()
-                    else:
-                        st.error(f"Direct token request failed: {response.text}")
-                except Exception as direct_e:
-                    st.error(f"Direct token request error: {str(direct_e)}")
-
-        except Exception as e:
-            st.error(f"Authorization failed: {str(e)}")
-            st.write(
-                "Please try the authorization process again with a fresh authorization code."
-            )
+        url = self.url(endpoint)
 
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
 
-def make_api_request(endpoint, method="GET", data=None):
-    """Make an API request to QuickBooks with automatic token handling"""
-    access_token = get_valid_access_token()
-    if not access_token:
-        st.error("Failed to get a valid access token")
-        return None
+        if method not in ("GET", "POST"):
+            events.error(f"Unsupported method: {method}")
+            return None
 
-    url = f"{BASE_URL}/v3/company/{COMPANY_ID}/{endpoint}"
+        try:
+            # Pooled keep-alive session, paced by the realm's rate limiter;
+            # 429/5xx are retried with backoff
+            response = send_request(
+                method,
+                url,
+                headers,
+                data,
+                session=self.session,
+                metrics=self.metrics,
+                limiter=self.rate_limiter,
+            )
 
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
+            # Handle token expiration
+            if response.status_code == 401:
+                # Token might be expired, try refreshing
+                new_token = self.refresh_access_token(stale_token=access_token)
+                if new_token:
+                    # Update headers with new token
+                    headers["Authorization"] = f"Bearer {new_token}"
+                    # Retry the request
+                    response = send_request(
+                        method,
+                        url,
+                        headers,
+                        data,
+                        session=self.session,
+                        metrics=self.metrics,
+                        limiter=self.rate_limiter,
+                    )
 
-    try:
-        if method == "GET":
-            response = requests.get(url, headers=headers)
-        elif method == "POST":
-            response = requests.post(url, headers=headers, json=data)
-        else:
-            st.error(f"Unsupported method: {method}")
-            return None
+            if response.status_code >= 400:
+                events.error(f"API Error: {response.status_code}")
+                events.error(response.text)
+                return None
 
-        # Handle token expiration
-        if response.status_code == 401:
-            # Token might be expired, try refreshing
-            new_token = refresh_access_token()
-            if new_token:
-                # Update headers with new token
-                headers["Authorization"] = f"Bearer {new_token}"
-                # Retry the request
-                if method == "GET":
-                    response = requests.get(url, headers=headers)
-                elif method == "POST":
-                    response = requests.post(url, headers=headers, json=data)
-
-        if response.status_code >= 400:
-            st.error(f"API Error: {response.status_code}")
-            st.error(response.text)
+            return response
+        except requests.exceptions.RequestException as e:
+            events.error(f"API request failed: {str(e)}")
             return None
 
-        return response
-    except requests.exceptions.RequestException as e:
-        st.error(f"API request failed: {str(e)}")
-        return None
+    def close(self):
+        """Stop the background token refresh and close the session"""
+        self.token_manager.stop()
+        self.session.close()
+
+
+# The company configured in .env; it shares the process-wide session,
+# metrics and item cache, and reads tokens left in .env by older versions
+default_client = QuickBooksClient(
+    COMPANY_ID,
+    token_manager=TokenManager(
+        refresh=_oauth_refresh,
+        load=_load_tokens,
+        save=token_store.save,
+        auto_refresh=AUTO_REFRESH,
+    ),
+    session=get_session(),
+    metrics=request_metrics,
+    item_cache=get_item_cache(),
+)
+
+# Holds the default company's access token and refreshes it in the background
+token_manager = default_client.token_manager
+
+_current_client = contextvars.ContextVar("qb_client", default=None)
+
+
+def get_client():
+    """Return the QuickBooks client for the current context"""
+    client = _current_client.get()
+    return client if client is not None else default_client
+
+
+def set_client(client):
+    """
+    Use the given client for the current context (thread or task).
+
+    Returns:
+        Token that can be passed to reset_client
+    """
+    return _current_client.set(client)
+
+
+def reset_client(token):
+    """Restore the client that was active before set_client"""
+    _current_client.reset(token)
+
+
+def set_tokens(access_token, refresh_token, expires_in, realm_id=None):
+    """
+    Install tokens from a completed authorization flow.
+
+    Args:
+        access_token (str): New access token
+        refresh_token (str): New refresh token
+        expires_in (int): Access token lifetime in seconds
+        realm_id (str, optional): QuickBooks company ID
+    """
+    get_client().set_tokens(access_token, refresh_token, expires_in, realm_id)
+
+
+def refresh_access_token(stale_token=None):
+    """
+    Refresh access token using refresh token.
+
+    Args:
+        stale_token (str, optional): Token that was rejected; if another
+            worker has already replaced it, its token is used instead
+
+    Returns:
+        str or None: The new access token
+    """
+    return get_client().refresh_access_token(stale_token)
+
+
+def is_token_valid():
+    """Check if the access token is still valid"""
+    return get_client().token_manager.is_valid()
+
+
+def get_valid_access_token():
+    """Get a valid access token, refreshing if necessary"""
+    return get_client().token_manager.get_token()
+
+
+def make_api_request(endpoint, method="GET", data=None):
+    """Make an API request to QuickBooks with automatic token handling"""
+    return get_client().make_api_request(endpoint, method, data)
+
+
+def get_request_metrics():
+    """Return latency, retry and rate limit wait statistics for API requests"""
+    client = get_client()
+    summary = client.metrics.summary()
+    if client.rate_limiter is not None:
+        summary["rate_limit"] = client.rate_limiter.stats()
+    return summary
 
 
 def run_query(query):
@@ -322,16 +414,140 @@ def run_query(query):
     return make_api_request(endpoint)
 
 
+def query_results(response, entity):
+    """
+    Extract the entity list from a query response.
+
+    Args:
+        response: Response returned by run_query, or None
+        entity (str): Entity name, e.g. "Item" or "Vendor"
+
+    Returns:
+        List of entity dicts, empty if the query failed or matched nothing
+    """
+    if not response or response.status_code != 200:
+        return []
+    return response.json().get("QueryResponse", {}).get(entity, []) or []
+
+
+class QueryError(Exception):
+    """Raised when a page of a paginated query cannot be fetched"""
+
+
+def _fetch_page(query, entity, start_position, page_size):
+    """Fetch one page of a query, returning the list of entities"""
+    paged_query = f"{query} STARTPOSITION {start_position} MAXRESULTS {page_size}"
+    response = run_query(paged_query)
+
+    if not response or response.status_code != 200:
+        raise QueryError(
+            f"Query for {entity} failed at position {start_position}"
+        )
+
+    return response.json().get("QueryResponse", {}).get(entity, [])
+
+
+def query_pages(query, page_size=QUERY_PAGE_SIZE, prefetch=False):
+    """
+    Run a query page by page using STARTPOSITION.
+
+    Args:
+        query (str): Query without STARTPOSITION/MAXRESULTS clauses
+            (any present are stripped); without an ORDERBY clause, pages
+            are ordered by Id
+        page_size (int): Entities per request, at most 1000
+        prefetch (bool): Fetch the next page on a background thread while
+            the caller processes the current one
+
+    Yields:
+        List of entity dicts for each page
+
+    Raises:
+        QueryError: If a page request fails
+    """
+    query = PAGING_CLAUSE_RE.sub("", query).strip()
+    match = ENTITY_RE.search(query)
+    if not match:
+        raise ValueError(f"Cannot determine entity of query: {query}")
+    entity = match.group(1)
+    # Without a stable order, entities added or changed mid-scan can shift
+    # between pages and be skipped or returned twice
+    if not ORDER_BY_RE.search(query):
+        query = f"{query} ORDERBY Id"
+    page_size = max(1, min(page_size, QUERY_PAGE_SIZE))
+
+    if not prefetch:
+        start_position = 1
+        while True:
+            page = _fetch_page(query, entity, start_position, page_size)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            start_position += page_size
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        start_position = 1
+        # Pages are fetched in a copy of this context, i.e. with its client
+        future = executor.submit(
+            contextvars.copy_context().run,
+            _fetch_page,
+            query,
+            entity,
+            start_position,
+            page_size,
+        )
+        while future is not None:
+            page = future.result()
+            if len(page) < page_size:
+                future = None
+            else:
+                # Request the next page before handing this one to the caller
+                start_position += page_size
+                future = executor.submit(
+                    contextvars.copy_context().run,
+                    _fetch_page,
+                    query,
+                    entity,
+                    start_position,
+                    page_size,
+                )
+            if page:
+                yield page
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def query_all(query, page_size=QUERY_PAGE_SIZE, prefetch=False):
+    """
+    Lazily iterate over every entity returned by a query.
+
+    Args:
+        query (str): Query without STARTPOSITION/MAXRESULTS clauses
+        page_size (int): Entities per request, at most 1000
+        prefetch (bool): Fetch the next page in the background
+
+    Yields:
+        Entity dicts, one at a time
+    """
+    for page in query_pages(query, page_size=page_size, prefetch=prefetch):
+        yield from page
+
+
 def check_qb_connection():
-    """Check if we have valid QuickBooks credentials and tokens"""
+    """
+    Check if we have valid QuickBooks credentials and tokens.
+
+    Headless check: reports problems through the event sink and never
+    prompts. The Streamlit app wraps this to run the authorization flow.
+    """
     if not CLIENT_ID or not CLIENT_SECRET:
-        st.error("Missing QuickBooks API credentials. Please check your .env file.")
+        events.error("Missing QuickBooks API credentials. Please check your .env file.")
         return False
 
-    # Handle authentication if needed
     access_token = get_valid_access_token()
     if not access_token:
-        initial_auth_flow()
         return False
 
     return True
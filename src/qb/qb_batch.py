@@ -0,0 +1,428 @@
+"""
+QuickBooks Batch Module
+
+This module coalesces many QuickBooks operations into /batch requests of up
+to 30 operations each and hands every caller back its own result. Item
+lookups for a whole bill and bulk bill creation go through it to cut the
+number of round trips.
+"""
+
+import contextvars
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .qb_auth import make_api_request
+from .rate_limit import CONCURRENCY
+
+# QuickBooks accepts at most 30 operations per batch request
+MAX_BATCH_SIZE = 30
+
+# Keep bulk IN queries well under the QuickBooks query length limit
+MAX_QUERY_LENGTH = 4000
+MAX_IN_NAMES = 1000
+
+# Quotes would end a quoted query value and a backslash would escape its
+# closing quote; % and _ are LIKE wildcards
+QUOTE_CHARS = "'\"\\"
+LIKE_WILDCARDS = "%_"
+
+
+class BatchItemError(Exception):
+    """Raised for a batch operation that came back with a Fault"""
+
+    def __init__(self, fault: Dict):
+        self.fault = fault
+        errors = fault.get("Error", []) if isinstance(fault, dict) else []
+        message = "; ".join(e.get("Message", "") for e in errors) or str(fault)
+        super().__init__(message)
+
+
+def clean_value(value: str) -> str:
+    """Strip the characters that would break out of a quoted query value"""
+    if not value:
+        return ""
+    return "".join(c for c in value if c not in QUOTE_CHARS)
+
+
+def item_like_query(value: str) -> Optional[str]:
+    """
+    Build an item query for names containing value.
+
+    Quotes and wildcards are stripped, so the value is matched literally
+    and cannot break the query.
+
+    Returns:
+        The query, or None if nothing searchable is left of value
+    """
+    term = "".join(c for c in clean_value(value) if c not in LIKE_WILDCARDS)
+    if not term.strip():
+        return None
+    return f"SELECT Id, Name, Type, Description FROM Item WHERE Name LIKE '%{term}%'"
+
+
+def select_sku_match(items: List[Dict], sku: str) -> Optional[Dict]:
+    """
+    Pick the best item from a LIKE '%sku%' query result.
+
+    Prefers an item whose name contains the SKU after a colon or dash, then
+    any name containing the SKU, then the first result.
+
+    Args:
+        items (List[Dict]): Items returned by QuickBooks
+        sku (str): The SKU that was searched for
+
+    Returns:
+        Dict or None: The selected item
+    """
+    for item in items:
+        item_name = item.get("Name", "")
+        # Look for exact SKU after colon or dash
+        if f":{sku}" in item_name or f"-{sku}" in item_name or sku in item_name:
+            return item
+
+    # If no exact pattern match, return the first match
+    return items[0] if items else None
+
+
+def send_batch(operations: List[Dict]) -> Optional[Dict]:
+    """
+    Send one /batch request.
+
+    Args:
+        operations: BatchItemRequest entries, each with a unique "bId"
+
+    Returns:
+        Dict mapping bId to its BatchItemResponse entry, or None if the
+        request itself failed
+    """
+    response = make_api_request(
+        "batch", method="POST", data={"BatchItemRequest": operations}
+    )
+    if not response or response.status_code != 200:
+        return None
+
+    return {
+        entry.get("bId"): entry
+        for entry in response.json().get("BatchItemResponse", [])
+    }
+
+
+class BatchQueue:
+    """
+    Collects pending operations and sends them as batch requests on flush.
+
+    Each add_* call returns a Future that is resolved with that operation's
+    BatchItemResponse entry once the queue is flushed. Chunks are sent
+    concurrently, up to max_concurrency at a time. Also usable as a context
+    manager that flushes on exit.
+
+    Args:
+        max_batch_size (int): Operations per batch request
+        max_concurrency (int): Batch requests in flight at once
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_concurrency: int = CONCURRENCY,
+    ):
+        self.max_batch_size = max(1, min(max_batch_size, MAX_BATCH_SIZE))
+        self.max_concurrency = max_concurrency
+        self._pending: List[Tuple[Dict, Future]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+
+    def _add(self, operation: Dict) -> Future:
+        future = Future()
+        with self._lock:
+            operation["bId"] = str(next(self._ids))
+            self._pending.append((operation, future))
+        return future
+
+    def add_query(self, query: str) -> Future:
+        """Queue a query; the future resolves to its QueryResponse dict"""
+        return self._add({"Query": query})
+
+    def add_create(self, entity: str, payload: Dict) -> Future:
+        """Queue an entity create; the future resolves to the created entity"""
+        return self._add({"operation": "create", entity: payload})
+
+    def _send_chunk(self, chunk: List[Tuple[Dict, Future]]):
+        results = send_batch([operation for operation, _ in chunk])
+
+        for operation, future in chunk:
+            entry = results.get(operation["bId"]) if results is not None else None
+            if entry is None:
+                message = (
+                    "Batch request failed"
+                    if results is None
+                    else "Missing batch response"
+                )
+                future.set_exception(BatchItemError({"Error": [{"Message": message}]}))
+            elif "Fault" in entry:
+                future.set_exception(BatchItemError(entry["Fault"]))
+            elif "QueryResponse" in entry:
+                future.set_result(entry["QueryResponse"])
+            else:
+                # Create responses carry the entity under its own name
+                entity = next(
+                    (key for key in operation if key not in ("bId", "operation")),
+                    None,
+                )
+                future.set_result(entry.get(entity, entry))
+
+    def flush(self) -> int:
+        """
+        Send every pending operation.
+
+        Returns:
+            int: Number of batch requests sent
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        chunks = [
+            pending[i : i + self.max_batch_size]
+            for i in range(0, len(pending), self.max_batch_size)
+        ]
+        if not chunks:
+            return 0
+
+        if len(chunks) == 1 or self.max_concurrency <= 1:
+            for chunk in chunks:
+                self._send_chunk(chunk)
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_concurrency, len(chunks))
+            ) as executor:
+                # Each chunk is sent with this context's client
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, self._send_chunk, chunk
+                    )
+                    for chunk in chunks
+                ]
+                for future in futures:
+                    future.result()
+
+        self.requests_sent += len(chunks)
+        return len(chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+
+def _query_items(future: Optional[Future]) -> List[Dict]:
+    """Items from a queued query, empty if it was not queued or failed"""
+    if future is None:
+        return []
+    try:
+        return future.result().get("Item", []) or []
+    except BatchItemError:
+        return []
+
+
+def _queue_name_lookups(
+    queue: BatchQueue, names: List[str]
+) -> List[Tuple[List[str], Future]]:
+    """
+    Queue Name IN (...) queries covering every name.
+
+    Names are packed greedily into as few queries as fit MAX_QUERY_LENGTH.
+
+    Returns:
+        List of (names in chunk, future) tuples
+    """
+    prefix = "SELECT Id, Name, Type, Description FROM Item WHERE Name IN ("
+    suffix = f") MAXRESULTS {MAX_IN_NAMES}"
+    budget = MAX_QUERY_LENGTH - len(prefix) - len(suffix)
+
+    chunks, chunk, length = [], [], 0
+    for name in names:
+        quoted = f"'{name}'"
+        extra = len(quoted) + (2 if chunk else 0)
+        if chunk and (length + extra > budget or len(chunk) >= MAX_IN_NAMES):
+            chunks.append(chunk)
+            chunk, length = [], 0
+            extra = len(quoted)
+        chunk.append(name)
+        length += extra
+    if chunk:
+        chunks.append(chunk)
+
+    return [
+        (
+            chunk,
+            queue.add_query(
+                prefix + ", ".join(f"'{name}'" for name in chunk) + suffix
+            ),
+        )
+        for chunk in chunks
+    ]
+
+
+def _collect_name_results(
+    chunks: List[Tuple[List[str], Future]]
+) -> Dict[str, Optional[Dict]]:
+    """Map each requested name to its item (None if absent) after a flush"""
+    results = {}
+    for names, future in chunks:
+        by_name = {}
+        for item in _query_items(future):
+            by_name.setdefault(item.get("Name", "").lower(), item)
+        for name in names:
+            results[name] = by_name.get(name.lower())
+    return results
+
+
+def find_items_by_names(names: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Look up many items by exact name with a minimal number of queries.
+
+    Args:
+        names: Item names to look up; quotes are stripped
+
+    Returns:
+        Dict mapping each cleaned name to its item, or None if not found
+    """
+    cleaned = list(
+        dict.fromkeys(
+            name.replace("'", "").replace('"', "") for name in names if name
+        )
+    )
+    with BatchQueue() as queue:
+        chunks = _queue_name_lookups(queue, cleaned)
+
+    return _collect_name_results(chunks)
+
+
+def _is_named(item: Dict, *names: str) -> bool:
+    """Whether the item's name equals one of names, as Name IN compares them"""
+    item_name = item.get("Name", "").lower()
+    return any(name and name.lower() == item_name for name in names)
+
+
+def find_items_batched(
+    lookups: List[Tuple[str, str, str]], cache: Dict = None
+) -> List[Tuple[Optional[Dict], bool]]:
+    """
+    Resolve many bill lines to QuickBooks items with batched queries.
+
+    Follows the same fallback order as build_quickbooks_bill's per-line
+    lookups (product name exact/LIKE, SKU LIKE, description exact/LIKE) but
+    issues every query of a round together, deduplicated, so a whole bill
+    costs two rounds of batch requests. Exact name lookups for all lines are
+    packed into a few Name IN (...) queries and mapped back locally.
+
+    Args:
+        lookups: List of (product_name, sku, description) tuples
+        cache (Dict, optional): Lookup cache to read and update, keyed like
+            find_item_by_sku_or_name's cache
+
+    Returns:
+        List of (item or None, exact) tuples in the same order as lookups,
+        exact being True only when the item's name equals the line's
+        product or description rather than merely containing it or its SKU
+    """
+    cache = cache if cache is not None else {}
+
+    exact_names, like, sku_like = [], {}, {}
+
+    # Round 1: exact names through bulk IN queries, plus SKU LIKE queries
+    with BatchQueue() as queue:
+        seen = set()
+        for product_name, sku, description in lookups:
+            for name in (clean_value(product_name), clean_value(description)):
+                if name and f"{name}:" not in cache and name not in seen:
+                    seen.add(name)
+                    exact_names.append(name)
+            if sku and sku.strip() and f":{sku}" not in cache and sku not in sku_like:
+                query = item_like_query(sku)
+                sku_like[sku] = queue.add_query(query) if query else None
+        name_chunks = _queue_name_lookups(queue, exact_names)
+
+    exact = _collect_name_results(name_chunks)
+
+    for sku, future in sku_like.items():
+        items = _query_items(future)
+        cache[f":{sku}"] = select_sku_match(items, sku) if items else None
+
+    def exact_hit(name):
+        return bool(cache.get(f"{name}:") or exact.get(name))
+
+    def needs_like(name):
+        return (
+            name
+            and f"{name}:" not in cache
+            and name not in like
+            and not exact_hit(name)
+        )
+
+    # Round 2: LIKE queries only for names whose exact lookup missed and
+    # whose result could still matter in the fallback order
+    with BatchQueue() as queue:
+        for product_name, sku, description in lookups:
+            product, desc = clean_value(product_name), clean_value(description)
+            if needs_like(product):
+                query = item_like_query(product)
+                like[product] = queue.add_query(query) if query else None
+            if (
+                not (product and exact_hit(product))
+                and not (sku and cache.get(f":{sku}"))
+                and needs_like(desc)
+            ):
+                query = item_like_query(desc)
+                like[desc] = queue.add_query(query) if query else None
+
+    for name in set(exact) | set(like):
+        item = exact.get(name)
+        if item is None:
+            items = _query_items(like.get(name))
+            item = items[0] if items else None
+        if item or name in like:
+            cache[f"{name}:"] = item
+
+    results = []
+    for product_name, sku, description in lookups:
+        product, desc = clean_value(product_name), clean_value(description)
+        item = (
+            (product and cache.get(f"{product}:"))
+            or (sku and cache.get(f":{sku}"))
+            or (desc and cache.get(f"{desc}:"))
+            or None
+        )
+        results.append((item, bool(item) and _is_named(item, product, desc)))
+
+    return results
+
+
+def create_bills_batch(bills: List[Dict]) -> List[Tuple[bool, object]]:
+    """
+    Create many bills with batch requests.
+
+    Payloads are sent as given, without duplicate checks or ledger
+    records; qb_bill.create_bills adds both around this.
+
+    Args:
+        bills: QuickBooks Bill payloads, as built by build_quickbooks_bill
+
+    Returns:
+        List of (success, created bill or error message), in input order
+    """
+    with BatchQueue() as queue:
+        futures = [queue.add_create("Bill", bill) for bill in bills]
+
+    results = []
+    for future in futures:
+        try:
+            results.append((True, future.result()))
+        except BatchItemError as e:
+            results.append((False, str(e)))
+
+    return results
@@ -7,8 +7,40 @@ with support for both inventory and expense items.
 
 from datetime import datetime
 from typing import List, Dict, Optional, Union, Tuple
-import streamlit as st
-from .qb_auth import make_api_request, run_query
+
+from parsers.money import cents_to_amount, line_cents, unit_price
+
+from . import events
+from .cache import get_item_cache
+from .qb_auth import make_api_request, query_results, run_query
+from .item_index import get_item_index
+from .qb_batch import (
+    clean_value,
+    create_bills_batch,
+    find_items_batched,
+    item_like_query,
+    select_sku_match,
+)
+from .fuzzy import FuzzyMatch, get_fuzzy_index
+from .ledger import check_duplicates, get_ledger, uuid_note
+from .mapping_store import get_mapping_store
+from .sku_index import MIN_MATCH_CONFIDENCE, SkuIndex, get_sku_index
+
+# How a line was resolved. Only exact and user-approved matches are learned
+# as the vendor's mappings: a learned mapping is trusted before every other
+# source, so a wrong guess would stick for good. MATCH_QUERY is an exact
+# QuickBooks name match, MATCH_LIKE a name or SKU LIKE hit.
+MATCH_CONFIRMED = "confirmed"
+MATCH_LEARNED = "learned"
+MATCH_SKU = "sku"
+MATCH_SKU_PARTIAL = "sku_partial"
+MATCH_QUERY = "query"
+MATCH_LIKE = "like"
+LEARNED_SOURCES = frozenset({MATCH_CONFIRMED, MATCH_LEARNED, MATCH_SKU, MATCH_QUERY})
+
+# Fuzzy candidates offered per unresolved line, and the lowest score shown
+SUGGESTION_LIMIT = 5
+SUGGESTION_MIN_SCORE = 0.6
 
 
 def create_bill(
@@ -18,6 +50,10 @@ def create_bill(
     txn_date: str = None,
     use_item_based_expense: bool = True,
     default_expense_account_id: str = None,
+    add_debug_placeholder: bool = False,
+    allow_unreconciled: bool = False,
+    allow_duplicate: bool = False,
+    confirmed_items: Dict[int, str] = None,
 ) -> Tuple[bool, Dict, List[str]]:
     """
     Creates a bill in QuickBooks.
@@ -29,6 +65,14 @@ def create_bill(
         txn_date (str, optional): Transaction date in YYYY-MM-DD format
         use_item_based_expense (bool): Whether to use item-based expenses
         default_expense_account_id (str, optional): Default expense account ID
+        add_debug_placeholder (bool): Post a placeholder line when no line
+            item has a positive amount, for debugging
+        allow_unreconciled (bool): Post even if the line amounts do not
+            reconcile with the invoice totals
+        allow_duplicate (bool): Post even if the invoice's CFDI UUID is in
+            the ledger or QuickBooks already has a bill with its number
+        confirmed_items (Dict, optional): Line index -> item ID chosen by
+            the user for lines no exact source resolves (see suggest_items)
 
     Returns:
         Tuple: (success, response_or_error, missing_items)
@@ -36,46 +80,60 @@ def create_bill(
             - response_or_error: The API response on success, error message on failure
             - missing_items (list): List of items that couldn't be found in QuickBooks
     """
+    message = _reconciliation_error(bill_data, allow_unreconciled)
+    if message:
+        return False, message, []
+
+    if not allow_duplicate:
+        try:
+            duplicate = check_duplicates([bill_data], [vendor_id])[0]
+        except Exception as e:
+            events.error(f"Error checking for duplicate bills: {str(e)}")
+            duplicate = None
+        if duplicate:
+            events.error(duplicate)
+            return False, f"Duplicate invoice: {duplicate}", []
+
     try:
         # DETAILED DEBUGGING: Show the structure of the bill data
-        st.write("## Bill Data Inspection")
-        st.write(f"Invoice Number: {bill_data.get('invoice_number', 'None')}")
-        st.write(f"Number of line items: {len(bill_data.get('line_items', []))}")
+        events.write("## Bill Data Inspection")
+        events.write(f"Invoice Number: {bill_data.get('invoice_number', 'None')}")
+        events.write(f"Number of line items: {len(bill_data.get('line_items', []))}")
 
         # Show the first few line items for inspection
         if bill_data.get("line_items"):
-            st.write("Sample of line items:")
+            events.write("Sample of line items:")
             for i, item in enumerate(bill_data["line_items"][:3]):  # Show first 3
-                st.write(f"Item {i+1}:")
+                events.write(f"Item {i+1}:")
                 for key, value in item.items():
-                    st.write(f"- {key}: {value} (type: {type(value).__name__})")
+                    events.write(f"- {key}: {value} (type: {type(value).__name__})")
         else:
-            st.error("⚠️ No line items found in bill data!")
+            events.error("⚠️ No line items found in bill data!")
             return False, "No line items found in bill data", []
 
         # CRITICAL FIX: Ensure we have some line items with positive amounts
         valid_items = []
         for item in bill_data.get("line_items", []):
             try:
-                amount = float(item.get("amount", 0))
+                amount = cents_to_amount(line_cents(item))
                 if amount > 0:
                     valid_items.append(item)
-                    st.write(
+                    events.write(
                         f"✅ Valid item: {item.get('product', 'Unnamed')} - Amount: ${amount}"
                     )
                 else:
-                    st.warning(
+                    events.warning(
                         f"⚠️ Invalid amount ({amount}) for {item.get('product', 'Unnamed')}"
                     )
             except (ValueError, TypeError) as e:
-                st.error(
+                events.error(
                     f"Error converting amount for {item.get('product', 'Unnamed')}: {str(e)}"
                 )
 
         if not valid_items:
-            st.error("No valid line items with positive amounts!")
+            events.error("No valid line items with positive amounts!")
             # For debugging purposes, create a placeholder item
-            if st.checkbox("Add placeholder for debugging?"):
+            if add_debug_placeholder:
                 placeholder = {
                     "product": "DEBUG PLACEHOLDER",
                     "amount": 1.0,
@@ -83,13 +141,14 @@ def create_bill(
                     "sku": "DEBUG",
                 }
                 valid_items.append(placeholder)
-                st.success("Added placeholder item for debugging")
+                events.success("Added placeholder item for debugging")
                 # Update the bill_data
                 bill_data["line_items"] = valid_items
             else:
                 return False, "No valid line items with positive amounts", []
 
         # Build the QuickBooks bill
+        matches = []
         try:
             qb_bill, missing_items = build_quickbooks_bill(
                 bill_data,
@@ -98,24 +157,28 @@ def create_bill(
                 txn_date,
                 use_item_based_expense=use_item_based_expense,
                 default_expense_account_id=default_expense_account_id,
+                matches=matches,
+                confirmed=confirmed_items,
             )
         except Exception as e:
-            st.exception(f"Error in build_quickbooks_bill: {str(e)}")
+            events.exception(f"Error in build_quickbooks_bill: {str(e)}")
             return False, f"Error in build_quickbooks_bill: {str(e)}", []
 
         # Check if we have line items
         if not qb_bill["Line"]:
-            st.error("No valid line items found in bill data")
+            events.error("No valid line items found in bill data")
             return False, "No valid line items found in bill data", missing_items
 
         # Make the API request
-        st.write(
+        events.write(
             f"Making API request to create bill with {len(qb_bill['Line'])} line items..."
         )
         response = make_api_request("bill", method="POST", data=qb_bill)
 
         if response and response.status_code in (200, 201):
-            return True, response.json(), missing_items
+            result = response.json()
+            _record_posted(bill_data, result.get("Bill", {}), matches)
+            return True, result, missing_items
         else:
             error_msg = "Failed to create bill in QuickBooks"
             if response:
@@ -123,10 +186,151 @@ def create_bill(
             return False, error_msg, missing_items
 
     except Exception as e:
-        st.exception(f"Error creating bill: {str(e)}")
+        events.exception(f"Error creating bill: {str(e)}")
         return False, f"Error creating bill: {str(e)}", []
 
 
+def _reconciliation_error(bill_data: Dict, allow_unreconciled: bool) -> Optional[str]:
+    """The reason a bill must not be posted because it does not reconcile"""
+    reconciliation = bill_data.get("reconciliation")
+    if reconciliation is None or reconciliation.ok:
+        return None
+
+    message = "Bill does not reconcile with the invoice totals: " + "; ".join(
+        reconciliation.errors
+    )
+    if not allow_unreconciled:
+        events.error(message)
+        return message
+    events.warning(f"Posting anyway. {message}")
+    return None
+
+
+def _record_posted(bill_data: Dict, qb_bill: Dict, matches: List):
+    """Record a created bill in the ledger and learn its item matches"""
+    vendor_rfc = bill_data.get("vendor_rfc", "")
+    try:
+        get_ledger().record(
+            bill_data.get("uuid", ""),
+            bill_data.get("invoice_number", ""),
+            vendor_rfc,
+            qb_bill.get("Id", ""),
+        )
+    except Exception as e:
+        events.error(f"Error recording the invoice in the ledger: {str(e)}")
+
+    # QuickBooks accepted these matches; remember the exact and
+    # user-approved ones for the vendor
+    learned = [
+        (item, item_id)
+        for item, item_id, source in matches
+        if source in LEARNED_SOURCES
+    ]
+    if vendor_rfc and learned:
+        try:
+            get_mapping_store().record(vendor_rfc, learned)
+        except Exception as e:
+            events.error(f"Error recording item mappings: {str(e)}")
+
+
+def create_bills(
+    bills_data: List[Dict],
+    vendor_ids: List[str],
+    account_id: str = None,
+    txn_date: str = None,
+    use_item_based_expense: bool = True,
+    default_expense_account_id: str = None,
+    allow_unreconciled: bool = False,
+    allow_duplicate: bool = False,
+) -> List[Tuple[bool, Dict, List[str]]]:
+    """
+    Creates many bills in QuickBooks with batch requests.
+
+    The whole batch is checked for duplicates at once, with one ledger
+    lookup and one DocNumber query, before any bill is queued; invoices
+    repeated within the batch are posted only once.
+
+    Args:
+        bills_data (List[Dict]): The parsed bill data of each bill
+        vendor_ids (List[str]): The QuickBooks Vendor ID of each bill
+        account_id (str, optional): Default account ID for expenses
+        txn_date (str, optional): Transaction date in YYYY-MM-DD format
+        use_item_based_expense (bool): Whether to use item-based expenses
+        default_expense_account_id (str, optional): Default expense account ID
+        allow_unreconciled (bool): Post bills whose line amounts do not
+            reconcile with the invoice totals
+        allow_duplicate (bool): Skip the duplicate checks
+
+    Returns:
+        List of (success, response_or_error, missing_items) tuples as
+        returned by create_bill, in input order
+    """
+    results: List[Optional[Tuple]] = [None] * len(bills_data)
+    pending = []
+    for i, bill_data in enumerate(bills_data):
+        message = _reconciliation_error(bill_data, allow_unreconciled)
+        if message:
+            results[i] = (False, message, [])
+        else:
+            pending.append(i)
+
+    if not allow_duplicate and pending:
+        try:
+            reasons = check_duplicates(
+                [bills_data[i] for i in pending], [vendor_ids[i] for i in pending]
+            )
+        except Exception as e:
+            events.error(f"Error checking for duplicate bills: {str(e)}")
+            reasons = [None] * len(pending)
+
+        seen = set()
+        for i, reason in zip(pending, reasons):
+            uuid = bills_data[i].get("uuid", "").upper()
+            if not reason and uuid in seen:
+                reason = f"CFDI {bills_data[i]['uuid']} appears twice in this batch"
+            seen.add(uuid or None)
+            if reason:
+                events.error(reason)
+                results[i] = (False, f"Duplicate invoice: {reason}", [])
+        pending = [i for i in pending if results[i] is None]
+
+    built = []
+    for i in pending:
+        matches = []
+        try:
+            qb_bill, missing_items = build_quickbooks_bill(
+                bills_data[i],
+                vendor_ids[i],
+                account_id,
+                txn_date,
+                use_item_based_expense=use_item_based_expense,
+                default_expense_account_id=default_expense_account_id,
+                matches=matches,
+            )
+        except Exception as e:
+            events.exception(f"Error in build_quickbooks_bill: {str(e)}")
+            results[i] = (False, f"Error in build_quickbooks_bill: {str(e)}", [])
+            continue
+        if not qb_bill["Line"]:
+            message = "No valid line items found in bill data"
+            results[i] = (False, message, missing_items)
+            continue
+        built.append((i, qb_bill, missing_items, matches))
+
+    if built:
+        events.write(f"Creating {len(built)} bills with batch requests...")
+        created = create_bills_batch([qb_bill for _, qb_bill, _, _ in built])
+        for (i, _, missing_items, matches), (success, result) in zip(built, created):
+            if success:
+                _record_posted(bills_data[i], result, matches)
+                results[i] = (True, {"Bill": result}, missing_items)
+            else:
+                message = f"Failed to create bill in QuickBooks: {result}"
+                results[i] = (False, message, missing_items)
+
+    return results
+
+
 def get_item_by_name(item_name: str) -> Optional[Dict]:
     """
     Find a QuickBooks item by name.
@@ -138,35 +342,19 @@ def get_item_by_name(item_name: str) -> Optional[Dict]:
         Dict or None: The item data if found, None otherwise
     """
     # Clean the item name for the query (remove special characters)
-    clean_name = item_name.replace("'", "").replace('"', "")
+    clean_name = clean_value(item_name)
 
     # First try exact match
     query = f"SELECT Id, Name, Type, Description FROM Item WHERE Name = '{clean_name}'"
-    response = run_query(query)
-
-    if response and response.status_code == 200:
-        data = response.json()
-        if (
-            "QueryResponse" in data
-            and "Item" in data["QueryResponse"]
-            and data["QueryResponse"]["Item"]
-        ):
-            return data["QueryResponse"]["Item"][0]
+    items = query_results(run_query(query), "Item")
+    if items:
+        return items[0]
 
     # If exact match fails, try a LIKE query
-    query = (
-        f"SELECT Id, Name, Type, Description FROM Item WHERE Name LIKE '%{clean_name}%'"
-    )
-    response = run_query(query)
-
-    if response and response.status_code == 200:
-        data = response.json()
-        if (
-            "QueryResponse" in data
-            and "Item" in data["QueryResponse"]
-            and data["QueryResponse"]["Item"]
-        ):
-            return data["QueryResponse"]["Item"][0]
+    query = item_like_query(clean_name)
+    items = query_results(run_query(query), "Item") if query else []
+    if items:
+        return items[0]
 
     return None
 
@@ -184,97 +372,70 @@ def find_item_by_sku_or_name(name: str, sku: str = None) -> Optional[Dict]:
     """
     # CRITICAL FIX: Check for empty inputs to prevent infinite loops
     if not name and not sku:
-        st.warning("Both name and SKU are empty, cannot search for item")
+        events.warning("Both name and SKU are empty, cannot search for item")
         return None
 
     # Clean the inputs
-    clean_name = name.replace("'", "").replace('"', "") if name else ""
+    clean_name = clean_value(name)
 
     # Use cached results to prevent repetitive queries
     # Create a simple cache key
     cache_key = f"{clean_name}:{sku if sku else ''}"
 
     # Check if we've already searched for this item
-    # We'll use st.session_state to store our cache
-    if "item_cache" not in st.session_state:
-        st.session_state.item_cache = {}
+    item_cache = get_item_cache()
 
-    if cache_key in st.session_state.item_cache:
-        st.write(f"Using cached result for '{cache_key}'")
-        return st.session_state.item_cache[cache_key]
+    if cache_key in item_cache:
+        events.write(f"Using cached result for '{cache_key}'")
+        return item_cache[cache_key]
 
     # Check if SKU is provided and not empty
-    if sku and sku.strip():
-        # Try exact SKU match
-        query = (
-            f"SELECT Id, Name, Type, Description FROM Item WHERE Name LIKE '%{sku}%'"
-        )
+    query = item_like_query(sku)
+    if query:
         try:
-            response = run_query(query)
-
-            if response and response.status_code == 200:
-                data = response.json()
-                if "QueryResponse" in data and "Item" in data["QueryResponse"]:
-                    # Check each returned item to find one with the right pattern
-                    for item in data["QueryResponse"]["Item"]:
-                        item_name = item.get("Name", "")
-                        # Look for exact SKU after colon or dash
-                        if (
-                            f":{sku}" in item_name
-                            or f"-{sku}" in item_name
-                            or sku in item_name
-                        ):
-                            # Cache this result
-                            st.session_state.item_cache[cache_key] = item
-                            return item
-
-                    # If no exact pattern match, return the first match
-                    if data["QueryResponse"]["Item"]:
-                        first_item = data["QueryResponse"]["Item"][0]
-                        # Cache this result
-                        st.session_state.item_cache[cache_key] = first_item
-                        return first_item
+            items = query_results(run_query(query), "Item")
+            if items:
+                item = select_sku_match(items, sku)
+                # Cache this result
+                item_cache[cache_key] = item
+                return item
         except Exception as e:
-            st.error(f"Error querying by SKU: {str(e)}")
+            events.error(f"Error querying by SKU: {str(e)}")
 
     # If SKU search failed or no SKU provided, try name search if name isn't empty
     if clean_name:
         try:
             result = get_item_by_name(clean_name)
             # Cache this result
-            st.session_state.item_cache[cache_key] = result
+            item_cache[cache_key] = result
             return result
         except Exception as e:
-            st.error(f"Error in get_item_by_name: {str(e)}")
+            events.error(f"Error in get_item_by_name: {str(e)}")
 
     # No match found
-    st.session_state.item_cache[cache_key] = None
+    item_cache[cache_key] = None
     return None
 
 
-@st.cache_data(ttl=3600)
 def get_all_items():
     """
     Get all items from QuickBooks.
 
+    Served from the persistent item index, which pages in the full catalog
+    once and then refreshes incrementally.
+
     Returns:
         List: A list of tuples (name, id) for all items
     """
-    query = "SELECT Id, Name, Type FROM Item WHERE Active = true MAXRESULTS 1000"
-    response = run_query(query)
-
-    if response and response.status_code == 200:
-        data = response.json()
-        if "QueryResponse" in data and "Item" in data["QueryResponse"]:
-            items = data["QueryResponse"]["Item"]
-            return [
-                (item.get("Name", "Unnamed Item"), item.get("Id", "")) for item in items
-            ]
+    index = get_item_index()
+    try:
+        index.sync()
+    except Exception as e:
+        events.error(f"Error refreshing item index: {str(e)}")
 
-    return []
+    return index.all_items()
 
 
-@st.cache_data(ttl=3600)
 def get_all_items_with_details():
     """
     Get all items from QuickBooks with detailed information including SKUs.
@@ -282,23 +443,13 @@ def get_all_items_with_details():
     Returns:
         List: A list of tuples (name, id, sku) for all items
     """
-    query = "SELECT Id, Name, SKU, Type FROM Item WHERE Active = true MAXRESULTS 1000"
-    response = run_query(query)
-
-    if response and response.status_code == 200:
-        data = response.json()
-        if "QueryResponse" in data and "Item" in data["QueryResponse"]:
-            items = data["QueryResponse"]["Item"]
-            return [
-                (
-                    item.get("Name", "Unnamed Item"),
-                    item.get("Id", ""),
-                    item.get("SKU", ""),
-                )
-                for item in items
-            ]
+    index = get_item_index()
+    try:
+        index.sync()
+    except Exception as e:
+        events.error(f"Error refreshing item index: {str(e)}")
 
-    return []
+    return index.all_items(with_sku=True)
 
 
 def create_sku_mapping(items_list: List[Tuple[str, str]]) -> Dict[str, str]:
@@ -314,12 +465,12 @@ def create_sku_mapping(items_list: List[Tuple[str, str]]) -> Dict[str, str]:
     """
     mapping = {}
 
-    st.write(f"Creating SKU mapping from {len(items_list)} items")
+    events.write(f"Creating SKU mapping from {len(items_list)} items")
 
     for name, item_id in items_list:
         # Store the full name as a key
         mapping[name.lower()] = item_id
-        st.write(f"Added mapping: '{name.lower()}' -> {item_id}")
+        events.write(f"Added mapping: '{name.lower()}' -> {item_id}")
 
         # Handle parent-child SKU format (parent:child)
         if ":" in name:
@@ -328,8 +479,8 @@ def create_sku_mapping(items_list: List[Tuple[str, str]]) -> Dict[str, str]:
             # Store each component
             mapping[parent_sku.lower()] = item_id
             mapping[child_sku.lower()] = item_id
-            st.write(f"Added parent mapping: '{parent_sku.lower()}' -> {item_id}")
-            st.write(f"Added child mapping: '{child_sku.lower()}' -> {item_id}")
+            events.write(f"Added parent mapping: '{parent_sku.lower()}' -> {item_id}")
+            events.write(f"Added child mapping: '{child_sku.lower()}' -> {item_id}")
 
             # Also store combinations
             if "-" in child_sku:
@@ -338,10 +489,10 @@ def create_sku_mapping(items_list: List[Tuple[str, str]]) -> Dict[str, str]:
                 mapping[child_parts[-1].lower()] = item_id
                 # Store the first part (often the parent category)
                 mapping[child_parts[0].lower()] = item_id
-                st.write(
+                events.write(
                     f"Added child part mapping: '{child_parts[-1].lower()}' -> {item_id}"
                 )
-                st.write(
+                events.write(
                     f"Added child first part mapping: '{child_parts[0].lower()}' -> {item_id}"
                 )
 
@@ -349,7 +500,7 @@ def create_sku_mapping(items_list: List[Tuple[str, str]]) -> Dict[str, str]:
                 child_sku_clean = "".join(c for c in child_sku.lower() if c.isalnum())
                 if child_sku_clean != child_sku.lower():
                     mapping[child_sku_clean] = item_id
-                    st.write(
+                    events.write(
                         f"Added clean child mapping: '{child_sku_clean}' -> {item_id}"
                     )
 
@@ -357,11 +508,183 @@ def create_sku_mapping(items_list: List[Tuple[str, str]]) -> Dict[str, str]:
         clean_name = "".join(c for c in name.lower() if c.isalnum())
         if clean_name != name.lower():
             mapping[clean_name] = item_id
-            st.write(f"Added clean name mapping: '{clean_name}' -> {item_id}")
+            events.write(f"Added clean name mapping: '{clean_name}' -> {item_id}")
 
     return mapping
 
 
+def resolve_line_items(
+    bill_data: Dict,
+    lines: List[Tuple[int, Dict]],
+    items_map: Dict = None,
+    confirmed: Dict[int, str] = None,
+) -> Dict[int, Tuple[str, str]]:
+    """
+    Resolve bill lines to QuickBooks item IDs.
+
+    Lines resolve from the user's confirmed choices first, then the vendor's
+    learned mappings, then the SKU index, then batched QuickBooks queries.
+    Only exact name matches from the queries are learned; LIKE hits are
+    tagged MATCH_LIKE. Fuzzy matches are never assigned here; see
+    suggest_items.
+
+    Args:
+        bill_data (Dict): The parsed bill data, for the vendor RFC
+        lines: (line index, line item) pairs to resolve
+        items_map (Dict, optional): create_sku_mapping-style key -> ID
+            mapping to match against instead of the catalog
+        confirmed (Dict, optional): Line index -> item ID chosen by the user
+
+    Returns:
+        Dict mapping the index of every resolved line to (item ID, match
+        source), the source being one of the MATCH_* constants
+    """
+    resolved = {}
+    for index, _ in lines:
+        item_id = (confirmed or {}).get(index)
+        if item_id:
+            resolved[index] = (item_id, MATCH_CONFIRMED)
+            events.write(f"Item {index + 1}: ✅ Matched by user confirmation")
+
+    def pending():
+        return [(index, item) for index, item in lines if index not in resolved]
+
+    # Lines confirmed in earlier bills from this vendor resolve locally
+    vendor_rfc = bill_data.get("vendor_rfc", "")
+    if vendor_rfc and pending():
+        unresolved = pending()
+        try:
+            learned = get_mapping_store().lookup_lines(
+                vendor_rfc, [item for _, item in unresolved]
+            )
+        except Exception as e:
+            events.error(f"Error reading learned item mappings: {str(e)}")
+            learned = [None] * len(unresolved)
+        for (index, _), item_id in zip(unresolved, learned):
+            if item_id:
+                resolved[index] = (item_id, MATCH_LEARNED)
+                events.write(f"Item {index + 1}: ✅ Matched from learned mapping")
+
+    # Get the precompiled SKU index once if some line is not already known
+    if pending():
+        try:
+            if items_map:
+                sku_index = SkuIndex.from_mapping(items_map)
+            else:
+                if not get_all_items():
+                    events.warning("No items found in QuickBooks!")
+                sku_index = get_sku_index()
+        except Exception as e:
+            events.error(f"Error getting QuickBooks items: {str(e)}")
+            # Continue with an empty index
+            sku_index = SkuIndex()
+
+        for index, item in pending():
+            # One normalized probe per product and SKU
+            match = sku_index.match_line(item.get("product", ""), item.get("sku", ""))
+            if match and match.confidence >= MIN_MATCH_CONFIDENCE:
+                # Full confidence: an unambiguous name or SKU equality
+                exact = match.confidence >= 1.0
+                resolved[index] = (
+                    match.item_id,
+                    MATCH_SKU if exact else MATCH_SKU_PARTIAL,
+                )
+                events.write(
+                    f"Item {index + 1}: ✅ Matched {match.name} via '{match.key}' "
+                    f"(confidence {match.confidence:.2f})"
+                )
+            elif match:
+                events.write(
+                    f"Item {index + 1}: Ambiguous match via '{match.key}' "
+                    f"({match.candidates} candidates)"
+                )
+
+    # Resolve every line the mapping missed with batched QuickBooks queries
+    unmatched = pending()
+    if unmatched:
+        events.write(
+            f"{len(unmatched)} items not in mapping, querying QuickBooks in batches"
+        )
+        lookups = [
+            (
+                item.get("product", ""),
+                item.get("sku", ""),
+                item.get("description", ""),
+            )
+            for _, item in unmatched
+        ]
+        try:
+            found = find_items_batched(lookups, cache=get_item_cache())
+        except Exception as e:
+            events.error(f"Error querying QuickBooks items: {str(e)}")
+            found = [(None, False)] * len(unmatched)
+
+        for (index, _), (qb_item, exact) in zip(unmatched, found):
+            if qb_item and qb_item.get("Id"):
+                # LIKE hits only contain the name or SKU; post but never learn them
+                source = MATCH_QUERY if exact else MATCH_LIKE
+                resolved[index] = (qb_item["Id"], source)
+                events.write(
+                    f"Item {index + 1}: ✅ Found via QuickBooks query: {qb_item.get('Name', 'Unknown')}"
+                )
+
+    return resolved
+
+
+def suggest_items(
+    bill_data: Dict,
+    limit: int = SUGGESTION_LIMIT,
+    confirmed: Dict[int, str] = None,
+) -> Dict[int, List[FuzzyMatch]]:
+    """
+    Rank catalog items for the bill lines no exact source resolves.
+
+    A one-character SKU difference is usually a different product, so the
+    candidates are only offered for the user to confirm and are never
+    posted on their own; pass the chosen IDs to create_bill as
+    confirmed_items.
+
+    Args:
+        bill_data (Dict): The formatted bill data
+        limit (int): Maximum candidates per line
+        confirmed (Dict, optional): Line index -> item ID already chosen
+
+    Returns:
+        Dict mapping the index of every unresolved line to its candidates,
+        best first (an empty list if nothing is similar)
+    """
+    lines = []
+    for index, item in enumerate(bill_data.get("line_items", [])):
+        try:
+            if line_cents(item) > 0:
+                lines.append((index, item))
+        except ValueError:
+            continue
+
+    resolved = resolve_line_items(bill_data, lines, confirmed=confirmed)
+    unresolved = [(index, item) for index, item in lines if index not in resolved]
+    if not unresolved:
+        return {}
+
+    fuzzy_index = get_fuzzy_index()
+    suggestions = {}
+    for index, item in unresolved:
+        best = {}
+        sku_or_name = item.get("sku") or item.get("product", "")
+        for text in (sku_or_name, item.get("description", "")):
+            if not text:
+                continue
+            for match in fuzzy_index.search(
+                text, limit=limit, min_score=SUGGESTION_MIN_SCORE
+            ):
+                known = best.get(match.item_id)
+                if known is None or match.score > known.score:
+                    best[match.item_id] = match
+        ranked = sorted(best.values(), key=lambda m: (-m.score, m.name))
+        suggestions[index] = ranked[:limit]
+    return suggestions
+
+
 def build_quickbooks_bill(
     bill_data: Dict,
     vendor_id: str,
@@ -370,10 +693,18 @@ def build_quickbooks_bill(
     items_map: Dict = None,
     use_item_based_expense: bool = True,
     default_expense_account_id: str = None,
+    matches: List = None,
+    confirmed: Dict[int, str] = None,
 ) -> Tuple[Dict, List[str]]:
     """
     Transforms parsed bill data into a QuickBooks-compatible format.
     Returns a tuple containing the QB bill structure and a list of items not found.
+
+    Lines are resolved as described in resolve_line_items; lines that stay
+    unresolved are recorded against the expense account. If matches is
+    given, a (line item, item ID, match source) tuple is appended to it for
+    every line resolved to an item. confirmed maps line indexes to item IDs the user
+    chose, e.g. from suggest_items.
     """
     if txn_date is None:
         txn_date = datetime.now().strftime("%Y-%m-%d")
@@ -385,60 +716,42 @@ def build_quickbooks_bill(
 
     # CRITICAL FIX: Ensure we have a valid bill_data with line_items
     if bill_data is None or not isinstance(bill_data, dict):
-        st.error("Invalid bill_data: None or not a dictionary")
+        events.error("Invalid bill_data: None or not a dictionary")
         # Return empty bill structure and missing items to avoid unpacking error
         return {"VendorRef": {"value": vendor_id}, "TxnDate": txn_date, "Line": []}, [
             "Invalid bill data"
         ]
 
     if "line_items" not in bill_data or not bill_data["line_items"]:
-        st.error("No line items found in bill_data")
+        events.error("No line items found in bill_data")
         # Return empty bill structure and missing items to avoid unpacking error
         return {"VendorRef": {"value": vendor_id}, "TxnDate": txn_date, "Line": []}, [
             "No line items found"
         ]
 
-    # Get all items once if we're using item-based expenses and don't have a map
-    if use_item_based_expense and not items_map:
-        try:
-            all_items = get_all_items()
-            if not all_items:
-                st.warning("No items found in QuickBooks!")
-                # Still continue with empty items map
-                items_map = {}
-            else:
-                items_map = (
-                    create_sku_mapping(all_items)
-                    if "create_sku_mapping" in globals()
-                    else {}
-                )
-                if not items_map and all_items:
-                    # Simple fallback if create_sku_mapping isn't available
-                    items_map = {item[0].lower(): item[1] for item in all_items}
-        except Exception as e:
-            st.error(f"Error getting QuickBooks items: {str(e)}")
-            # Continue with empty items map
-            items_map = {}
-
     # Debug: Check what we have in bill_data
-    st.write(f"Processing bill with {len(bill_data.get('line_items', []))} line items")
+    events.write(f"Processing bill with {len(bill_data.get('line_items', []))} line items")
+
+    # Lines that passed validation: (index, item, cents, quantity)
+    prepared_lines = []
 
     # CRITICAL FIX: Use enumerate to track the index and avoid getting stuck
     for index, item in enumerate(bill_data.get("line_items", [])):
-        st.write(
+        events.write(
             f"--- Processing item {index + 1}/{len(bill_data.get('line_items', []))} ---"
         )
 
         try:
-            amount = float(item.get("amount", 0))
-        except (ValueError, TypeError):
-            st.warning(
+            cents = line_cents(item)
+        except ValueError:
+            events.warning(
                 f"Item {index + 1}: Invalid amount format - {item.get('amount')}"
             )
-            amount = 0.0
+            cents = 0
+        amount = cents_to_amount(cents)
 
-        if amount <= 0:
-            st.warning(
+        if cents <= 0:
+            events.warning(
                 f"Item {index + 1}: Skipping item with zero/negative amount: {item.get('product', 'Unknown')}"
             )
             continue  # Skip zero or negative amounts
@@ -451,7 +764,7 @@ def build_quickbooks_bill(
         description = item.get("description", "")
 
         # Debug information about the current item
-        st.write(
+        events.write(
             f"Item {index + 1}: QB Product: '{product_name}', SKU: '{sku}', Description: '{description}', Amount: {amount}"
         )
 
@@ -465,87 +778,55 @@ def build_quickbooks_bill(
         if quantity <= 0:
             quantity = 1.0
 
-        if use_item_based_expense:
-            # Try to find the item in QuickBooks
-            item_id = None
-
-            if items_map:
-                st.write(
-                    f"Item {index + 1}: Trying to match item: {product_name}, SKU: {sku}"
-                )
-
-                # Try matching with different approaches
-                match_attempts = []
+        prepared_lines.append((index, item, cents, quantity))
 
-                # First try the exact QB product format (parent:sku)
-                if product_name:
-                    match_attempts.append(product_name.lower())  # Exact match
-
-                # Then try different forms of the SKU
-                if sku:
-                    match_attempts.append(sku.lower())  # Exact SKU
-
-                    # If SKU has parent-child format with dash (e.g., 24fauxbois-sharbor)
-                    if "-" in sku:
-                        parent = sku.split("-")[0].lower()
-                        child = sku.split("-")[1].lower()
-
-                        # Try parent:sku format
-                        match_attempts.append(f"{parent}:{sku}".lower())
-
-                        # Try parent component
-                        match_attempts.append(parent)
-
-                        # Try child component
-                        match_attempts.append(child)
-
-                    # Try alphanumeric only
-                    sku_clean = "".join(c for c in sku.lower() if c.isalnum())
-                    if sku_clean != sku.lower():
-                        match_attempts.append(sku_clean)
-
-                # Show attempts for debugging
-                st.write(f"Item {index + 1}: Will try matches: {match_attempts}")
-
-                # Try each matching attempt
-                for attempt in match_attempts:
-                    if attempt and attempt in items_map:
-                        item_id = items_map[attempt]
-                        st.write(f"Item {index + 1}: ✅ Matched using: {attempt}")
-                        break
+    resolved = {}
+    if use_item_based_expense:
+        resolved = resolve_line_items(
+            bill_data,
+            [(index, item) for index, item, _, _ in prepared_lines],
+            items_map=items_map,
+            confirmed=confirmed,
+        )
 
-            if not item_id:
-                # Try direct QuickBooks search
-                st.write(
-                    f"Item {index + 1}: No match in mapping, trying direct QuickBooks query"
-                )
+    expense_account_id = default_expense_account_id or account_id
+    for index, item, cents, quantity in prepared_lines:
+        item_id, source = resolved.get(index, (None, None))
+        amount = cents_to_amount(cents)
+        product_name = item.get("product", "")
+        line_description = product_name or item.get("description", "No description")
+
+        if use_item_based_expense and item_id:
+            if matches is not None:
+                matches.append((item, item_id, source))
+            qb_line_items.append(
+                {
+                    "DetailType": "ItemBasedExpenseLineDetail",
+                    "Amount": amount,
+                    "Description": line_description,
+                    "ItemBasedExpenseLineDetail": {
+                        "ItemRef": {"value": item_id},
+                        "Qty": quantity,
+                        "UnitPrice": unit_price(cents, quantity),
+                    },
+                }
+            )
+            continue
 
-                # First try product_name (which should be in parent:sku format)
-                if product_name:
-                    qb_item = find_item_by_sku_or_name(product_name, "")
-                    if qb_item:
-                        item_id = qb_item.get("Id")
-                        st.write(
-                            f"Item {index + 1}: ✅ Found via product name query: {qb_item.get('Name', 'Unknown')}"
-                        )
-
-                # Then try the SKU if product name search failed
-                if not item_id and sku:
-                    qb_item = find_item_by_sku_or_name("", sku)
-                    if qb_item:
-                        item_id = qb_item.get("Id")
-                        st.write(
-                            f"Item {index + 1}: ✅ Found via SKU query: {qb_item.get('Name', 'Unknown')}"
-                        )
-
-                # Lastly, try with the description/ID if provided
-                if not item_id and description:
-                    qb_item = find_item_by_sku_or_name(description, "")
-                    if qb_item:
-                        item_id = qb_item.get("Id")
-                        st.write(
-                            f"Item {index + 1}: ✅ Found via description query: {qb_item.get('Name', 'Unknown')}"
-                        )
+        if use_item_based_expense:
+            # Not found in QuickBooks: record against the default expense account
+            missing_items.append(product_name or item.get("sku") or f"Item {index + 1}")
+
+        qb_line_items.append(
+            {
+                "DetailType": "AccountBasedExpenseLineDetail",
+                "Amount": amount,
+                "Description": line_description,
+                "AccountBasedExpenseLineDetail": {
+                    "AccountRef": {"value": expense_account_id}
+                },
+            }
+        )
 
     qb_bill = {
         "VendorRef": {"value": vendor_id},
@@ -557,7 +838,11 @@ def build_quickbooks_bill(
     if invoice_number:
         qb_bill["DocNumber"] = invoice_number
 
-    st.write(
+    # Record the fiscal UUID so duplicate checks can confirm a DocNumber match
+    if bill_data.get("uuid"):
+        qb_bill["PrivateNote"] = uuid_note(bill_data["uuid"])
+
+    events.write(
         f"Created bill with {len(qb_line_items)} line items out of {len(bill_data.get('line_items', []))} total items"
     )
 
@@ -0,0 +1,291 @@
+"""
+QuickBooks Rate Limiter
+
+This module keeps requests under the QuickBooks Online throttling limits
+(500 requests per minute and 10 concurrent requests per realm) on the
+client side, so bursts wait briefly instead of drawing 429s. A token bucket
+paces requests and a set of slots caps how many are in flight. Both live
+either in memory, shared by the threads of one process, or in files under
+.qb_cache, shared by every process on the machine: the bucket is a small
+record updated under a file lock, and each slot is a lock file held for the
+duration of a request, which the kernel releases if the process dies.
+"""
+
+import contextlib
+import os
+import random
+import struct
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: limits are only shared within the process
+    fcntl = None
+
+# QuickBooks allows 500 requests per minute. A full bucket allows a burst
+# on top of the steady rate, so rate * 60 + burst stays just below 500.
+RATE_PER_MINUTE = float(os.getenv("QB_RATE_LIMIT_PER_MINUTE", "475"))
+BURST = float(os.getenv("QB_RATE_LIMIT_BURST", "20"))
+
+# QuickBooks rejects more than 10 concurrent requests per realm. The one
+# setting for request concurrency: batch flushes, the async client and the
+# realm scheduler are all bounded by it too.
+CONCURRENCY = int(os.getenv("QB_MAX_CONCURRENT_REQUESTS", "10"))
+
+# "file" shares limits across processes, "memory" within one process,
+# "off" disables limiting
+BACKEND = os.getenv("QB_RATE_LIMIT_BACKEND", "file").lower()
+STATE_DIR = os.getenv("QB_RATE_LIMIT_DIR", os.path.join(".qb_cache", "rate_limit"))
+
+# Bucket record: tokens, last update (epoch seconds)
+_RECORD = struct.Struct("dd")
+
+# Polling interval bounds while waiting for a free file slot
+_SLOT_POLL_MIN = 0.001
+_SLOT_POLL_MAX = 0.02
+
+
+class _MemoryBucket:
+    """Bucket state shared by the threads of this process"""
+
+    def __init__(self, burst: float):
+        self._lock = threading.Lock()
+        self._record = [burst, time.time()]
+
+    @contextlib.contextmanager
+    def state(self):
+        with self._lock:
+            yield self._record
+
+
+class _FileBucket:
+    """Bucket state in a file, updated under an exclusive file lock"""
+
+    def __init__(self, path: str, burst: float):
+        self.path = path
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def _open(self):
+        # A forked child must not share the parent's file description
+        if self._file is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._file = open(fd, "r+b")
+            self._pid = os.getpid()
+        return self._file
+
+    @contextlib.contextmanager
+    def state(self):
+        with self._lock:
+            f = self._open()
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                data = f.read(_RECORD.size)
+                if len(data) == _RECORD.size:
+                    record = list(_RECORD.unpack(data))
+                else:
+                    record = [self.burst, time.time()]
+                yield record
+                f.seek(0)
+                f.write(_RECORD.pack(*record))
+                f.flush()
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class _MemorySlots:
+    """Concurrency cap for the threads of this process"""
+
+    def __init__(self, count: int):
+        self._semaphore = threading.BoundedSemaphore(count)
+
+    def acquire(self):
+        self._semaphore.acquire()
+        return None
+
+    def release(self, slot):
+        self._semaphore.release()
+
+
+class _FileSlots:
+    """
+    Concurrency cap across processes: one lock file per slot.
+
+    A request holds a non-blocking flock on a free slot file; when all are
+    taken it polls with a short, growing sleep.
+    """
+
+    def __init__(self, prefix: str, count: int):
+        self.paths = [f"{prefix}.slot{i}" for i in range(count)]
+        self._local = threading.BoundedSemaphore(count)
+
+    def acquire(self):
+        # Threads of this process queue on the semaphore, not by polling
+        self._local.acquire()
+        try:
+            os.makedirs(os.path.dirname(self.paths[0]) or ".", exist_ok=True)
+            delay = _SLOT_POLL_MIN
+            while True:
+                # Start at a random slot so processes do not all probe slot 0
+                offset = random.randrange(len(self.paths))
+                for i in range(len(self.paths)):
+                    path = self.paths[(offset + i) % len(self.paths)]
+                    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        return fd
+                    except BlockingIOError:
+                        os.close(fd)
+                time.sleep(delay)
+                delay = min(delay * 2, _SLOT_POLL_MAX)
+        except BaseException:
+            # Failing to open a slot file (EMFILE, EACCES, ...) must not
+            # leak the local slot, or the process would run out of them
+            self._local.release()
+            raise
+
+    def release(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        finally:
+            self._local.release()
+
+
+class RateLimiter:
+    """
+    Token bucket and concurrency cap in front of one realm's requests.
+
+    Args:
+        rate_per_minute: Sustained requests per minute
+        burst: Bucket capacity, i.e. requests allowed at once after idling
+        concurrency: Requests in flight at once
+        path: State file prefix shared across processes; None keeps the
+            state in this process
+        window: Number of recent waits kept for percentiles
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float = RATE_PER_MINUTE,
+        burst: float = BURST,
+        concurrency: int = CONCURRENCY,
+        path: str = None,
+        window: int = 10000,
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.concurrency = concurrency
+        self.path = path
+
+        if path and fcntl is not None:
+            self._bucket = _FileBucket(f"{path}.bucket", self.burst)
+            self._slots = _FileSlots(path, concurrency)
+        else:
+            self._bucket = _MemoryBucket(self.burst)
+            self._slots = _MemorySlots(concurrency)
+
+        self._metrics_lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self._stats = {"acquired": 0, "waited": 0, "wait_s": 0.0, "drained": 0}
+        self._in_flight = 0
+
+    def reserve(self) -> float:
+        """
+        Take one token, going into debt if the bucket is empty.
+
+        Returns:
+            float: Seconds to wait before the token may be used
+        """
+        now = time.time()
+        with self._bucket.state() as record:
+            tokens, updated = record
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            tokens -= 1.0
+            record[0], record[1] = tokens, now
+        # A negative balance is the queue of requests ahead of this one
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def drain(self):
+        """Empty the bucket after a 429, pausing every worker of this realm"""
+        now = time.time()
+        with self._bucket.state() as record:
+            record[0], record[1] = min(record[0], 0.0), now
+        with self._metrics_lock:
+            self._stats["drained"] += 1
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Wait for a token and a free concurrency slot for one request"""
+        start = time.perf_counter()
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        slot = self._slots.acquire()
+        waited = time.perf_counter() - start
+
+        with self._metrics_lock:
+            self._waits.append(waited)
+            self._stats["acquired"] += 1
+            self._stats["wait_s"] += waited
+            if waited >= 0.001:
+                self._stats["waited"] += 1
+            self._in_flight += 1
+        try:
+            yield waited
+        finally:
+            with self._metrics_lock:
+                self._in_flight -= 1
+            self._slots.release(slot)
+
+    def stats(self) -> Dict:
+        """
+        Summarize waiting.
+
+        Returns:
+            Dict with requests let through, how many had to wait, requests
+            in flight, 429 drains and mean, p50, p99 and max wait in ms
+        """
+        with self._metrics_lock:
+            waits = sorted(self._waits)
+            stats = dict(self._stats, in_flight=self._in_flight)
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            index = min(len(waits) - 1, int(round(p / 100 * (len(waits) - 1))))
+            return waits[index] * 1000
+
+        stats["wait_s"] = round(stats["wait_s"], 3)
+        stats["mean_wait_ms"] = sum(waits) / len(waits) * 1000 if waits else 0.0
+        stats["p50_wait_ms"] = percentile(50)
+        stats["p99_wait_ms"] = percentile(99)
+        stats["max_wait_ms"] = waits[-1] * 1000 if waits else 0.0
+        return stats
+
+
+def create_rate_limiter(realm_id: str = "", backend: str = BACKEND):
+    """
+    Build the limiter for a realm from the QB_RATE_LIMIT_* settings.
+
+    Args:
+        realm_id: QuickBooks company ID; processes limiting the same realm
+            share state
+        backend: "file", "memory" or "off"
+
+    Returns:
+        RateLimiter, or None when limiting is off
+    """
+    if backend == "off":
+        return None
+    path = None
+    if backend == "file":
+        path = os.path.join(STATE_DIR, realm_id or "default")
+    return RateLimiter(path=path)
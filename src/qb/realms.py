@@ -0,0 +1,170 @@
+"""
+Multi-Realm Scheduling
+
+This module runs bookkeeping for several QuickBooks companies (realms) from
+one process. ClientPool keeps one QuickBooksClient per realm, each with its
+own tokens, pooled session and caches. RealmScheduler fans batches of work,
+such as CFDIs to post, out across realms concurrently: every realm gets its
+own worker threads, bounded by that realm's concurrency limit, so a slow or
+throttled company never holds up the others, and every job runs with its
+realm's client activated, so make_api_request, the ledger, the mapping
+store and the item index all address that company.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple
+
+from .qb_auth import BASE_URL, QuickBooksClient, default_client
+from .rate_limit import CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Jobs run at once per realm; each job may make several requests, so this
+# stays below the QuickBooks limit of 10 concurrent requests per realm
+REALM_CONCURRENCY = int(os.getenv("QB_REALM_CONCURRENCY", "4"))
+
+
+class ClientPool:
+    """
+    One QuickBooksClient per realm, created on first use.
+
+    The realm configured in .env is served by the module's default client,
+    so its tokens and caches are shared with the single-company code.
+
+    Args:
+        base_url: API host for new clients
+    """
+
+    def __init__(self, base_url: str = BASE_URL):
+        self.base_url = base_url
+        self._clients: Dict[str, QuickBooksClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, realm_id: str) -> QuickBooksClient:
+        """Return the client of a realm, creating it on first use"""
+        with self._lock:
+            client = self._clients.get(realm_id)
+        if client is not None:
+            return client
+
+        # Built outside the lock, so workers of other realms are not held
+        # up while a new client sets up its tokens, session and limiter
+        if realm_id == default_client.realm_id:
+            client = default_client
+        else:
+            client = QuickBooksClient(realm_id, base_url=self.base_url)
+        with self._lock:
+            existing = self._clients.setdefault(realm_id, client)
+        if existing is not client:
+            # Another thread created the realm's client first
+            client.close()
+        return existing
+
+    def realms(self) -> List[str]:
+        with self._lock:
+            return list(self._clients)
+
+    def close(self):
+        """Stop every client's background token refresh and close its session"""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            if client is not default_client:
+                client.close()
+
+
+class RealmResult(NamedTuple):
+    """Outcome of one job"""
+
+    realm_id: str
+    job: Any
+    value: Any = None
+    error: str = ""
+    elapsed_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+class RealmScheduler:
+    """
+    Run batches of jobs for several realms concurrently.
+
+    Args:
+        pool: Clients to run the jobs with (a new pool if omitted)
+        concurrency: Jobs run at once per realm
+        limits: Per-realm overrides of concurrency
+    """
+
+    def __init__(
+        self,
+        pool: ClientPool = None,
+        concurrency: int = REALM_CONCURRENCY,
+        limits: Dict[str, int] = None,
+    ):
+        self.pool = pool or ClientPool()
+        self.concurrency = concurrency
+        self.limits = limits or {}
+
+    def limit(self, realm_id: str) -> int:
+        """Jobs run at once for a realm, capped at the QuickBooks request limit"""
+        limit = self.limits.get(realm_id, self.concurrency)
+        return max(1, min(limit, CONCURRENCY))
+
+    def _run_job(self, client: QuickBooksClient, func: Callable, job) -> RealmResult:
+        start = time.perf_counter()
+        try:
+            with client.activate():
+                value = func(job)
+        except Exception as e:
+            logger.exception(f"Job {job!r} failed for realm {client.realm_id}")
+            elapsed = time.perf_counter() - start
+            return RealmResult(client.realm_id, job, error=str(e), elapsed_s=elapsed)
+        return RealmResult(
+            client.realm_id, job, value, elapsed_s=time.perf_counter() - start
+        )
+
+    def run(
+        self, batches: Dict[str, Iterable], func: Callable[[Any], Any]
+    ) -> Dict[str, List[RealmResult]]:
+        """
+        Run func on every job of every realm.
+
+        Args:
+            batches: Jobs per realm ID, e.g. CFDI paths to post there
+            func: Called with one job while its realm's client is active;
+                an exception fails only that job
+
+        Returns:
+            Dict mapping each realm ID to its RealmResults, in job order
+        """
+        executors = {
+            realm_id: ThreadPoolExecutor(
+                max_workers=self.limit(realm_id),
+                thread_name_prefix=f"realm-{realm_id}",
+            )
+            for realm_id in batches
+        }
+        try:
+            # Submit every realm's jobs before waiting on any of them
+            futures = {
+                realm_id: [
+                    executors[realm_id].submit(
+                        self._run_job, self.pool.get(realm_id), func, job
+                    )
+                    for job in jobs
+                ]
+                for realm_id, jobs in batches.items()
+            }
+            return {
+                realm_id: [future.result() for future in realm_futures]
+                for realm_id, realm_futures in futures.items()
+            }
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
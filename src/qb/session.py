@@ -0,0 +1,232 @@
+"""
+QuickBooks HTTP Session Module
+
+This module provides the pooled HTTP session used for QuickBooks API calls,
+retry with exponential backoff on throttling and server errors, and
+per-request latency metrics.
+"""
+
+import contextlib
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connection pool and timeout settings
+POOL_SIZE = int(os.getenv("QB_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("QB_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("QB_READ_TIMEOUT", "30"))
+
+# Retry settings. QuickBooks Online allows 500 requests per minute and 10
+# concurrent requests per realm and answers 429 when either is exceeded.
+MAX_RETRIES = int(os.getenv("QB_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("QB_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("QB_BACKOFF_MAX", "60"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """
+    Create a requests session with a keep-alive connection pool.
+
+    Args:
+        pool_size (int): Maximum pooled connections per host
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    # Retries are handled by send_request so they can be measured and jittered
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Compute how long to wait before retrying.
+
+    Uses exponential backoff with full jitter, and never waits less than a
+    numeric Retry-After header asks for.
+
+    Args:
+        attempt (int): Zero-based retry attempt
+        retry_after (str, optional): Retry-After header value
+
+    Returns:
+        float: Seconds to sleep
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt)))
+
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+
+    return delay
+
+
+class RequestMetrics:
+    """
+    Thread-safe collector of per-request latency and retry counts.
+
+    Args:
+        window (int): Number of most recent latencies kept for percentiles
+    """
+
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self.by_status: Dict[int, int] = {}
+
+    def record(self, latency: float, status: Optional[int], retried: bool = False):
+        """Record one HTTP attempt; status is None when the attempt raised"""
+        with self._lock:
+            self._latencies.append(latency)
+            self.requests += 1
+            self.total_time += latency
+            if retried:
+                self.retries += 1
+            if status is None or status >= 400:
+                self.errors += 1
+            if status is not None:
+                self.by_status[status] = self.by_status.get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self.requests = self.errors = self.retries = 0
+            self.total_time = 0.0
+            self.by_status = {}
+
+    def summary(self) -> Dict:
+        """
+        Summarize recorded requests.
+
+        Returns:
+            Dict with request/error/retry counts, status histogram and
+            mean, p50, p95, p99 and max latency in milliseconds
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            summary = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "by_status": dict(self.by_status),
+            }
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+            return latencies[index] * 1000
+
+        summary["mean_ms"] = (
+            sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+        )
+        summary["p50_ms"] = percentile(50)
+        summary["p95_ms"] = percentile(95)
+        summary["p99_ms"] = percentile(99)
+        summary["max_ms"] = latencies[-1] * 1000 if latencies else 0.0
+        return summary
+
+
+request_metrics = RequestMetrics()
+
+
+def send_request(
+    method: str,
+    url: str,
+    headers: Dict,
+    data: Optional[Dict] = None,
+    session: requests.Session = None,
+    metrics: RequestMetrics = None,
+    limiter=None,
+) -> requests.Response:
+    """
+    Send a request through the pooled session, retrying throttled calls.
+
+    429 and 5xx responses and connection errors are retried up to
+    MAX_RETRIES times with jittered exponential backoff.
+
+    Args:
+        method (str): HTTP method
+        url (str): Full request URL
+        headers (Dict): Request headers
+        data (Dict, optional): JSON body
+        session (requests.Session, optional): Session to use instead of the
+            shared one
+        metrics (RequestMetrics, optional): Collector instead of the shared one
+        limiter (RateLimiter, optional): Paces every attempt, including
+            retries, and is drained when QuickBooks answers 429
+
+    Returns:
+        requests.Response: The final response, which may still be an error
+
+    Raises:
+        requests.exceptions.RequestException: If every attempt failed to
+            connect
+    """
+    session = session or get_session()
+    metrics = metrics or request_metrics
+    timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    for attempt in range(MAX_RETRIES + 1):
+        error = None
+        # Each attempt, retries included, waits for its own rate limit slot
+        with limiter.slot() if limiter else contextlib.nullcontext():
+            start = time.perf_counter()
+            try:
+                response = session.request(
+                    method, url, headers=headers, json=data, timeout=timeout
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                error = e
+            latency = time.perf_counter() - start
+
+        if error is not None:
+            metrics.record(latency, None, retried=attempt > 0)
+            if attempt == MAX_RETRIES:
+                raise error
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        metrics.record(latency, response.status_code, retried=attempt > 0)
+
+        if response.status_code == 429 and limiter:
+            # Pause every worker of the realm, not just this one
+            limiter.drain()
+
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+
+        time.sleep(backoff_delay(attempt, response.headers.get("Retry-After")))
+
+    return response
@@ -0,0 +1,200 @@
+"""
+SKU Match Index
+
+This module precomputes every normalized key form of every catalog item
+once, recording for each key its best match priority and how many items
+share it, so each bill line resolves with one dictionary probe per field
+that returns the best item and a confidence score.
+"""
+
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .item_index import (
+    KEY_CHILD,
+    KEY_CHILD_CLEAN,
+    KEY_CHILD_FIRST,
+    KEY_CHILD_LAST,
+    KEY_NAME,
+    KEY_NAME_CLEAN,
+    KEY_PARENT,
+    KEY_SKU,
+    derive_item_keys,
+    get_item_index,
+)
+
+# How much a match through each key kind can be trusted on its own
+KEY_CONFIDENCE = {
+    KEY_NAME: 1.0,
+    KEY_SKU: 1.0,
+    KEY_CHILD: 0.95,
+    KEY_CHILD_CLEAN: 0.9,
+    KEY_NAME_CLEAN: 0.9,
+    KEY_CHILD_LAST: 0.6,
+    KEY_PARENT: 0.5,
+    KEY_CHILD_FIRST: 0.4,
+}
+
+# Matches below this confidence are left to the QuickBooks lookups
+MIN_MATCH_CONFIDENCE = 0.5
+
+# Rank of an unambiguous full-confidence match, which no other probe can beat
+_EXACT_RANK = (True, max(KEY_CONFIDENCE.values()))
+
+
+class SkuMatch(NamedTuple):
+    """Result of a SkuIndex lookup"""
+
+    item_id: str
+    name: str
+    key: str
+    priority: int
+    confidence: float
+    candidates: int
+
+    @property
+    def ambiguous(self) -> bool:
+        return self.candidates > 1
+
+
+def normalize_key(text: str) -> str:
+    """Lowercase and strip everything but letters and digits"""
+    return "".join(c for c in text.lower() if c.isalnum()) if text else ""
+
+
+class SkuIndex:
+    """
+    Precompiled lookup table from normalized SKU/name keys to items.
+
+    For every normalized key the index keeps the item(s) reachable through
+    the highest-priority key kind. When several distinct items share that
+    best priority the key is ambiguous and its confidence is split between
+    them, instead of the last item silently winning.
+
+    Args:
+        items: (name, id) or (name, id, sku) tuples of the catalog
+    """
+
+    def __init__(self, items: List[Tuple] = ()):
+        # key -> (priority, [(item_id, name), ...])
+        self._entries: Dict[str, Tuple[int, List[Tuple[str, str]]]] = {}
+        for item in items:
+            name, item_id = item[0], item[1]
+            sku = item[2] if len(item) > 2 else ""
+            self.add(name, item_id, sku or "")
+
+    @classmethod
+    def from_mapping(cls, mapping: Dict[str, str]) -> "SkuIndex":
+        """Build an index from a create_sku_mapping-style key -> id dict"""
+        index = cls()
+        for key, item_id in mapping.items():
+            index._add_key(normalize_key(key), KEY_NAME, item_id, key)
+        return index
+
+    def _add_key(self, key: str, priority: int, item_id: str, name: str):
+        if not key:
+            return
+
+        entry = self._entries.get(key)
+        if entry is None or priority < entry[0]:
+            self._entries[key] = (priority, [(item_id, name)])
+        elif priority == entry[0] and all(i != item_id for i, _ in entry[1]):
+            entry[1].append((item_id, name))
+
+    def add(self, name: str, item_id: str, sku: str = ""):
+        """Index every key form of one catalog item"""
+        best = {}
+        for key, priority in derive_item_keys(name, sku):
+            key = normalize_key(key)
+            if key and priority < best.get(key, len(KEY_CONFIDENCE)):
+                best[key] = priority
+
+        for key, priority in best.items():
+            self._add_key(key, priority, item_id, name)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def probe(self, key: str) -> Optional[SkuMatch]:
+        """
+        Look up one raw key.
+
+        Args:
+            key: SKU, product or item name in any case or punctuation
+
+        Returns:
+            SkuMatch for the best item under that key, or None
+        """
+        normalized = normalize_key(key)
+        entry = self._entries.get(normalized)
+        if entry is None:
+            return None
+
+        priority, candidates = entry
+        item_id, name = candidates[0]
+        return SkuMatch(
+            item_id=item_id,
+            name=name,
+            key=normalized,
+            priority=priority,
+            confidence=KEY_CONFIDENCE.get(priority, 0.5) / len(candidates),
+            candidates=len(candidates),
+        )
+
+    def match_line(self, product: str = "", sku: str = "") -> Optional[SkuMatch]:
+        """
+        Resolve a bill line by probing its product and its SKU.
+
+        The product is probed first and the SKU only when the product is not
+        an unambiguous full-confidence match. The better match wins: an
+        unambiguous match beats an ambiguous one, then the higher confidence
+        wins, and the product wins ties. A product in "parent:sku" form is the item's
+        full name, so it must not lose to the SKU resolving through a
+        weaker key kind of the same item (or of a different one). All the
+        parent/child/alphanumeric variations are already folded into the
+        index, so no candidate list has to be tried.
+
+        Args:
+            product: Line product in "parent:sku" form
+            sku: Line SKU, e.g. "24fauxbois-sharbor"
+
+        Returns:
+            SkuMatch or None
+        """
+        best = self.probe(product) if product else None
+        if best and _rank(best) >= _EXACT_RANK:
+            return best
+
+        match = self.probe(sku) if sku else None
+        if match and (best is None or _rank(match) > _rank(best)):
+            best = match
+        return best
+
+
+def _rank(match: SkuMatch) -> Tuple[bool, float]:
+    """Sort key of a match: unambiguous first, then by confidence"""
+    return (not match.ambiguous, match.confidence)
+
+
+# Realm ID -> (item index version, SkuIndex)
+_cached_indexes: Dict[str, Tuple[int, SkuIndex]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_sku_index() -> SkuIndex:
+    """
+    Return a SkuIndex of the current realm's catalog.
+
+    Built from the persistent item index and rebuilt only when that index
+    has changed since the last call.
+    """
+    item_index = get_item_index()
+    with _cache_lock:
+        cached = _cached_indexes.get(item_index.realm_id)
+        if cached is None or cached[0] != item_index.version:
+            cached = (
+                item_index.version,
+                SkuIndex(item_index.all_items(with_sku=True)),
+            )
+            _cached_indexes[item_index.realm_id] = cached
+        return cached[1]
@@ -0,0 +1,245 @@
+"""
+QuickBooks Token Manager
+
+This module keeps the OAuth access token in memory and refreshes it before
+it expires: a background timer fires REFRESH_MARGIN seconds ahead of
+expiry, so requests never wait on the OAuth endpoint. Refreshes are
+serialized across threads with a lock and across processes with a file
+lock; whoever takes the lock first re-reads the persisted tokens, so a
+worker that lost the race adopts the token another process just obtained
+instead of refreshing again.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only serialized per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Refresh this many seconds before the access token expires
+REFRESH_MARGIN = float(os.getenv("QB_TOKEN_REFRESH_MARGIN", "300"))
+
+# A token this close to expiry is not handed out to a request
+EXPIRY_SKEW = 30.0
+
+# Wait before retrying a failed background refresh
+RETRY_DELAY = 30.0
+
+DEFAULT_LOCK_PATH = os.getenv(
+    "QB_TOKEN_LOCK_PATH", os.path.join(".qb_cache", "token.lock")
+)
+
+
+class TokenState(NamedTuple):
+    """OAuth tokens of one QuickBooks connection"""
+
+    access_token: str
+    refresh_token: str
+    # Epoch seconds at which the access token expires
+    expires_at: float
+    realm_id: str = ""
+
+    def valid(self, skew: float = EXPIRY_SKEW) -> bool:
+        return bool(self.access_token) and time.time() < self.expires_at - skew
+
+
+class FileLock:
+    """
+    Exclusive lock shared by threads and processes on one machine.
+
+    Args:
+        path: Lock file; created if missing
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+class TokenManager:
+    """
+    In-memory access token with proactive background refresh.
+
+    Args:
+        refresh: Exchanges a refresh token for a new TokenState
+        load: Reads the persisted TokenState (None if there is none)
+        save: Persists a TokenState
+        lock_path: File lock serializing refreshes across processes
+        margin: Seconds before expiry at which the timer refreshes
+        auto_refresh: Run the background refresh timer
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[str], TokenState],
+        load: Callable[[], Optional[TokenState]],
+        save: Callable[[TokenState], None],
+        lock_path: str = DEFAULT_LOCK_PATH,
+        margin: float = REFRESH_MARGIN,
+        auto_refresh: bool = True,
+    ):
+        self._refresh = refresh
+        self._load = load
+        self._save = save
+        self._lock = FileLock(lock_path)
+        self.margin = margin
+        self.auto_refresh = auto_refresh
+
+        self._state: Optional[TokenState] = None
+        self._timer: Optional[threading.Timer] = None
+        self._timer_lock = threading.Lock()
+        self._stats = {"refreshes": 0, "adopted": 0, "failures": 0}
+
+    @property
+    def state(self) -> Optional[TokenState]:
+        if self._state is None:
+            self._state = self._load()
+        return self._state
+
+    @property
+    def realm_id(self) -> str:
+        state = self.state
+        return state.realm_id if state else ""
+
+    def is_valid(self) -> bool:
+        state = self.state
+        return state is not None and state.valid()
+
+    def get_token(self) -> Optional[str]:
+        """
+        Return a valid access token.
+
+        The in-memory token is returned without any I/O; only when it has
+        expired (e.g. the timer is off or failed) is it refreshed inline.
+        """
+        state = self.state
+        if state is None or not state.valid():
+            state = self.refresh(stale_token=state.access_token if state else None)
+        self._schedule()
+        return state.access_token if state else None
+
+    def refresh(self, stale_token: str = None) -> Optional[TokenState]:
+        """
+        Refresh the access token, unless another thread or process already did.
+
+        Args:
+            stale_token: The token the caller found expired or rejected; a
+                persisted token different from it and still valid is adopted
+                without calling the OAuth endpoint
+
+        Returns:
+            The current TokenState, or None if refreshing failed
+        """
+        with self._lock:
+            state = self._refresh_locked(stale_token)
+        if state is not None:
+            self._schedule(force=True)
+        return state
+
+    def _refresh_locked(self, stale_token: str) -> Optional[TokenState]:
+        persisted = self._load()
+        if (
+            persisted is not None
+            and persisted.valid(self.margin)
+            and persisted.access_token != stale_token
+        ):
+            self._state = persisted
+            self._stats["adopted"] += 1
+            return persisted
+
+        current = persisted or self._state
+        if current is None or not current.refresh_token:
+            logger.error("No refresh token available. Please re-authenticate.")
+            return None
+
+        try:
+            state = self._refresh(current.refresh_token)
+        except Exception as e:
+            self._stats["failures"] += 1
+            logger.error(f"Error refreshing token: {e}")
+            return None
+
+        if not state.realm_id and current.realm_id:
+            state = state._replace(realm_id=current.realm_id)
+        self._save(state)
+        self._state = state
+        self._stats["refreshes"] += 1
+        logger.info("Refreshed the QuickBooks access token")
+        return state
+
+    def update(self, state: TokenState):
+        """Install and persist tokens obtained outside the manager (e.g. OAuth)"""
+        with self._lock:
+            self._save(state)
+            self._state = state
+        self._schedule(force=True)
+
+    def _schedule(self, force: bool = False, delay: float = None):
+        """(Re)arm the background timer for the current token's expiry"""
+        if not self.auto_refresh:
+            return
+
+        with self._timer_lock:
+            if self._timer is not None and not force:
+                return
+            state = self._state
+            if state is None or not state.refresh_token:
+                return
+
+            if self._timer is not None:
+                self._timer.cancel()
+            if delay is None:
+                delay = max(0.0, state.expires_at - self.margin - time.time())
+            self._timer = threading.Timer(delay, self._background_refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _background_refresh(self):
+        with self._timer_lock:
+            self._timer = None
+        state = self._state
+        if self.refresh(stale_token=state.access_token if state else None) is None:
+            self._schedule(force=True, delay=RETRY_DELAY)
+
+    def stop(self):
+        """Cancel the background timer"""
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def stats(self) -> Dict:
+        """Refresh counters and seconds until the current token expires"""
+        state = self._state
+        return dict(
+            self._stats,
+            expires_in=round(state.expires_at - time.time()) if state else None,
+        )
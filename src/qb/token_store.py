@@ -0,0 +1,148 @@
+"""
+QuickBooks Token Store
+
+This module persists OAuth tokens in a small JSON file instead of rewriting
+.env. Every save writes a temporary file, fsyncs it and renames it over the
+store, so readers see either the old or the new tokens and never a torn
+file, and a crash cannot lose a rotated refresh token. Saves are serialized
+with a file lock and bump a version number. Readers re-parse the file only
+when a stat shows it was replaced, so checking for tokens rotated by
+another worker costs one stat call.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .token_manager import FileLock, TokenState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.getenv(
+    "QB_TOKEN_STORE_PATH", os.path.join(".qb_cache", "tokens.json")
+)
+
+
+class TokenStore:
+    """
+    Versioned, crash-safe JSON store of tokens per QuickBooks realm.
+
+    Args:
+        path: JSON file holding the tokens
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._write_lock = FileLock(f"{path}.lock")
+        self._read_lock = threading.Lock()
+        self._signature: Optional[Tuple] = None
+        self._data: Dict = {"version": 0, "realms": {}}
+
+    def _stat_signature(self) -> Optional[Tuple]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # A rename always brings a new inode; mtime and size catch the rest
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read(self) -> Dict:
+        """The store contents, re-parsed only if the file changed"""
+        signature = self._stat_signature()
+        with self._read_lock:
+            if signature == self._signature:
+                return self._data
+            if signature is None:
+                data = {"version": 0, "realms": {}}
+            else:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Unreadable token store {self.path}: {e}")
+                    return self._data
+            self._signature = signature
+            self._data = data
+            return data
+
+    @property
+    def version(self) -> int:
+        """Number of saves the store has seen"""
+        return self._read().get("version", 0)
+
+    def load(self, realm_id: str = "") -> Optional[TokenState]:
+        """
+        Return the stored tokens of a realm.
+
+        Args:
+            realm_id: QuickBooks company ID; "" finds the only stored realm
+
+        Returns:
+            TokenState, or None if nothing is stored for the realm
+        """
+        realms = self._read().get("realms", {})
+        entry = realms.get(realm_id)
+        if entry is None and not realm_id and len(realms) == 1:
+            realm_id, entry = next(iter(realms.items()))
+        if entry is None:
+            return None
+        return TokenState(
+            entry.get("access_token", ""),
+            entry.get("refresh_token", ""),
+            float(entry.get("expires_at", 0)),
+            realm_id,
+        )
+
+    def save(self, state: TokenState) -> int:
+        """
+        Atomically store the tokens of state.realm_id.
+
+        Args:
+            state: Tokens to store
+
+        Returns:
+            int: The new store version
+        """
+        with self._write_lock:
+            # Re-read under the lock so no other realm's update is lost
+            data = self._read()
+            realms = dict(data.get("realms", {}))
+            realms[state.realm_id] = {
+                "access_token": state.access_token,
+                "refresh_token": state.refresh_token,
+                "expires_at": state.expires_at,
+                "saved_at": time.time(),
+            }
+            version = data.get("version", 0) + 1
+            self._write({"version": version, "realms": realms})
+        return version
+
+    def _write(self, data: Dict):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            # Tokens are credentials: owner-only, like a private .env
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Make the rename itself durable
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
@@ -0,0 +1,215 @@
+"""
+Streamlit Adapter
+
+This module is the thin layer between the headless billing core and the
+Streamlit UI: it renders core events on the page, backs the item lookup
+cache with st.session_state, and runs the interactive QuickBooks
+authorization flow.
+"""
+
+import streamlit as st
+from intuitlib.client import AuthClient
+from intuitlib.enums import Scopes
+
+from qb import qb_auth
+from qb.cache import set_item_cache
+from qb.events import DiagnosticsReport, EventSink, set_event_sink
+from qb.qb_auth import (
+    CLIENT_ID,
+    CLIENT_SECRET,
+    ENVIRONMENT,
+    REDIRECT_URI,
+    get_auth_client,
+    set_tokens,
+)
+
+
+class StreamlitSink(EventSink):
+    """Renders billing core events as Streamlit elements"""
+
+    def write(self, message):
+        st.write(message)
+
+    def info(self, message):
+        st.info(message)
+
+    def success(self, message):
+        st.success(message)
+
+    def warning(self, message):
+        st.warning(message)
+
+    def error(self, message):
+        st.error(message)
+
+    def exception(self, message):
+        st.error(message)
+
+
+def install_streamlit_adapter(verbose: bool = False, sink: EventSink = None):
+    """
+    Wire the billing core to this Streamlit script run.
+
+    Call once at the top of every run: installs the event sink and points the
+    item lookup cache at st.session_state so it survives reruns.
+
+    In quiet mode (the default) per-line traces are collected into a
+    DiagnosticsReport instead of being rendered one widget at a time;
+    warnings and errors are still shown immediately. Pass the returned
+    report to render_diagnostics at the end of the run.
+
+    Args:
+        verbose (bool): Render every trace as it happens
+        sink (EventSink, optional): Sink to install instead of StreamlitSink
+
+    Returns:
+        DiagnosticsReport in quiet mode, None in verbose mode
+    """
+    sink = sink or StreamlitSink()
+    report = None if verbose else DiagnosticsReport(passthrough=sink)
+    set_event_sink(report if report is not None else sink)
+
+    if "item_cache" not in st.session_state:
+        st.session_state.item_cache = {}
+    set_item_cache(st.session_state.item_cache)
+
+    return report
+
+
+def render_diagnostics(report: DiagnosticsReport):
+    """Render a collected diagnostics report once, as a collapsed table and log"""
+    if not report:
+        return
+
+    counts = ", ".join(f"{n} {level}" for level, n in sorted(report.counts().items()))
+    with st.expander(f"Diagnostics ({counts})", expanded=False):
+        st.dataframe(report.to_records(), use_container_width=True)
+        st.download_button(
+            "Download diagnostics log",
+            report.to_text(),
+            file_name="bill_wizard_diagnostics.log",
+            mime="text/plain",
+        )
+
+
+def check_qb_connection():
+    """Check the QuickBooks connection, running the authorization flow if needed"""
+    if qb_auth.check_qb_connection():
+        return True
+
+    if CLIENT_ID and CLIENT_SECRET:
+        initial_auth_flow()
+    return False
+
+
+def initial_auth_flow():
+    """Handle the initial authorization flow - Direct Code Extraction Version"""
+    # Define the scopes needed for your application
+    scopes = [Scopes.ACCOUNTING]
+
+    # Generate the authorization URL
+    auth_url = get_auth_client().get_authorization_url(scopes)
+
+    # Display instructions and URL in Streamlit
+    st.title("QuickBooks API Authorization")
+    st.write("You need to authorize this application to access your QuickBooks data.")
+    st.markdown(f"### Step 1: [Click here to authorize with QuickBooks]({auth_url})")
+
+    st.write("---")
+
+    st.markdown("### Step 2: After authorizing, you'll see a URL with 'code=' in it")
+    st.write(
+        "Copy ONLY the value of the 'code' parameter (the text after 'code=' and before any '&')"
+    )
+
+    auth_code = st.text_input("Paste ONLY the authorization code here:")
+
+    st.markdown("### Step 3: Copy the Company ID (realmId)")
+    st.write("In the same URL, find 'realmId=' and copy the number that follows it")
+
+    realm_id = st.text_input("Paste the realmId here:")
+
+    if st.button("Complete Authorization") and auth_code and realm_id:
+        try:
+            st.write(
+                f"Using authorization code: {auth_code[:5]}... (length: {len(auth_code)})"
+            )
+            st.write(f"Using realmId: {realm_id}")
+
+            # Create a new auth client with exact credentials to avoid any issues
+            temp_auth_client = AuthClient(
+                client_id=CLIENT_ID,
+                client_secret=CLIENT_SECRET,
+                redirect_uri=REDIRECT_URI,
+                environment=ENVIRONMENT,
+            )
+
+            # Set the realm ID directly
+            temp_auth_client.realm_id = realm_id
+
+            # Get the bearer token with just the code
+            try:
+                temp_auth_client.get_bearer_token(code=auth_code)
+
+                # Save the tokens
+                set_tokens(
+                    temp_auth_client.access_token,
+                    temp_auth_client.refresh_token,
+                    temp_auth_client.expires_in,
+                    temp_auth_client.realm_id,
+                )
+
+                st.success(
+                    "Authorization successful! You can now use the QuickBooks API."
+                )
+                st.experimental_rerun()
+            except Exception as inner_e:
+                st.error(f"Error getting bearer token: {str(inner_e)}")
+
+                # Try direct token request as last resort
+                try:
+                    st.write("Attempting direct token request...")
+                    import requests
+                    import base64
+
+                    token_endpoint = (
+                        "https://oauth.platform.intuit.com/oauth2/v1/tokens/bearer"
+                    )
+                    auth_header = base64.b64encode(
+                        f"{CLIENT_ID}:{CLIENT_SECRET}".encode()
+                    ).decode()
+
+                    headers = {
+                        "Authorization": f"Basic {auth_header}",
+                        "Content-Type": "application/x-www-form-urlencoded",
+                    }
+
+                    data = {
+                        "grant_type": "authorization_code",
+                        "code": auth_code,
+                        "redirect_uri": REDIRECT_URI,
+                    }
+
+                    response = requests.post(token_endpoint, headers=headers, data=data)
+                    st.write(f"Response status: {response.status_code}")
+
+                    if response.status_code == 200:
+                        token_data = response.json()
+                        set_tokens(
+                            token_data["access_token"],
+                            token_data["refresh_token"],
+                            token_data["expires_in"],
+                            realm_id,
+                        )
+                        st.success("Direct token request successful!")
+                        st.experimental_rerun()
+                    else:
+                        st.error(f"Direct token request failed: {response.text}")
+                except Exception as direct_e:
+                    st.error(f"Direct token request error: {str(direct_e)}")
+
+        except Exception as e:
+            st.error(f"Authorization failed: {str(e)}")
+            st.write(
+                "Please try the authorization process again with a fresh authorization code."
+            )
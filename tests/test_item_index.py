@@ -0,0 +1,84 @@
+"""
+Item Index Tests
+
+Several realms share one item index database; syncing or clearing one
+realm's catalog must never touch another's.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from qb import item_index
+from qb.item_index import ItemIndex
+
+
+def catalog(*items):
+    """One query page of (name, id) items"""
+    return [
+        {
+            "Id": item_id,
+            "Name": name,
+            "Active": True,
+            "MetaData": {"LastUpdatedTime": "2026-01-01T00:00:00-08:00"},
+        }
+        for name, item_id in items
+    ]
+
+
+class SharedDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "items.sqlite")
+
+    def sync(self, index, page):
+        with mock.patch.object(item_index, "query_pages", return_value=[page]):
+            return index.sync(force=True)
+
+    def test_realms_keep_their_own_catalogs(self):
+        realm_a = ItemIndex(self.path, realm_id="A")
+        self.sync(realm_a, catalog(("Gadget A", "1"), ("Widget:24fauxbois", "2")))
+
+        realm_b = ItemIndex(self.path, realm_id="B")
+        self.sync(realm_b, catalog(("Gadget B", "9")))
+
+        self.assertEqual(
+            realm_a.all_items(), [("Gadget A", "1"), ("Widget:24fauxbois", "2")]
+        )
+        self.assertEqual(realm_b.all_items(), [("Gadget B", "9")])
+        self.assertEqual(realm_a.lookup("24fauxbois"), ("Widget:24fauxbois", "2"))
+        self.assertIsNone(realm_b.lookup("24fauxbois"))
+        self.assertIsNone(realm_a.get_by_name("Gadget B"))
+
+    def test_same_item_id_in_two_realms(self):
+        realm_a = ItemIndex(self.path, realm_id="A")
+        realm_b = ItemIndex(self.path, realm_id="B")
+        self.sync(realm_a, catalog(("Gadget A", "1")))
+        self.sync(realm_b, catalog(("Gadget B", "1")))
+
+        self.assertEqual(realm_a.get_by_name("Gadget A"), ("Gadget A", "1"))
+        self.assertEqual(realm_b.get_by_name("Gadget B"), ("Gadget B", "1"))
+
+    def test_clear_and_reopen_leave_other_realms_alone(self):
+        realm_a = ItemIndex(self.path, realm_id="A")
+        realm_b = ItemIndex(self.path, realm_id="B")
+        self.sync(realm_a, catalog(("Gadget A", "1")))
+        self.sync(realm_b, catalog(("Gadget B", "9")))
+
+        realm_b.clear()
+        reopened = ItemIndex(self.path, realm_id="A")
+        self.assertEqual(reopened.all_items(), [("Gadget A", "1")])
+        self.assertEqual(realm_b.all_items(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
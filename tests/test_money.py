@@ -0,0 +1,57 @@
+"""
+Money Tests
+
+Line amounts must reach the bill as the parser's exact cents, and the
+Cantidad x ValorUnitario check must round the exact product, not its
+binary float approximation.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from parsers.money import reconcile_bill
+from parsers.xml_parser import LINE_COLUMNS, build_line_frame
+from qb import events
+from qb.builder import format_bill_data
+
+
+def line_frame(*lines):
+    """Typed line frame of (quantity, rate, amount) strings"""
+    columns = {name: [None] * len(lines) for name in LINE_COLUMNS}
+    columns["quantity"] = [quantity for quantity, _, _ in lines]
+    columns["rate"] = [rate for _, rate, _ in lines]
+    columns["amount"] = [amount for _, _, amount in lines]
+    columns["product"] = [f"item-{pos}" for pos in range(len(lines))]
+    return build_line_frame(columns)
+
+
+class MoneyTest(unittest.TestCase):
+    def setUp(self):
+        events.set_event_sink(events.NullSink())
+
+    def test_exact_half_cent_rounds_up(self):
+        # 1.005 * 1 * 100 is 100.49999... as floats but exactly 100.5
+        bill_df = line_frame(("1.005", "1", "1.01"), ("2.5", "0.01", "0.03"))
+        reconciliation = reconcile_bill(
+            bill_df, {"subtotal": 104, "total": None}, tolerance_cents=0
+        )
+        self.assertEqual(reconciliation.errors, [])
+
+    def test_parsed_cents_are_passed_through(self):
+        bill_df = line_frame(("3", "0.1", "0.30"), ("1", "1234567.89", "1234567.89"))
+        bill_data = format_bill_data("INV-1", bill_df)
+        self.assertEqual(
+            [item["amount_cents"] for item in bill_data["line_items"]],
+            [30, 123456789],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Parser Backend Tests
+
+parse_bill must produce identical output with the ElementTree and lxml
+backends. Skipped when lxml is not installed, since the lxml backend then
+falls back to ElementTree.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from parsers.backends import available_backends, get_backend
+from parsers.xml_parser import parse_bill
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+@unittest.skipUnless("lxml" in available_backends(), "lxml is not installed")
+class BackendParityTest(unittest.TestCase):
+    def test_lxml_matches_etree(self):
+        self.assertEqual(get_backend("lxml").name, "lxml")
+        expected_number, expected_df, expected_data = parse_bill(
+            TEST_DATA, backend="etree"
+        )
+        number, bill_df, bill_data = parse_bill(TEST_DATA, backend="lxml")
+
+        self.assertEqual(number, expected_number)
+        self.assertEqual(bill_data, expected_data)
+        self.assertTrue(bill_df.equals(expected_df))
+        self.assertEqual(bill_df.dtypes.to_dict(), expected_df.dtypes.to_dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Parse Cache Tests
+
+Reruns of the same CFDI bytes must be served from the parse cache without
+any XML parsing, from memory and from the on-disk store, and a parser
+version change must not serve results persisted by the old parser.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from parsers import parse_cache
+from parsers.parse_cache import ParseCache
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        with open(TEST_DATA, "rb") as f:
+            self.data = f.read()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+        # Count every call into the XML parser behind the cache
+        patcher = mock.patch.object(
+            parse_cache, "parse_bill", wraps=parse_cache.parse_bill
+        )
+        self.parse_bill = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reruns_do_no_xml_parsing(self):
+        cache = ParseCache(directory=self.directory)
+        expected = cache.parse_bytes(self.data)
+        self.assertEqual(self.parse_bill.call_count, 1)
+
+        for _ in range(20):
+            self.assertIs(cache.parse_bytes(self.data), expected)
+        self.assertEqual(self.parse_bill.call_count, 1)
+        self.assertEqual(cache.stats()["hits"], 20)
+
+    def test_restart_is_served_from_disk(self):
+        expected = ParseCache(directory=self.directory).parse_bytes(self.data)
+
+        restarted = ParseCache(directory=self.directory)
+        invoice_number, bill_df, bill_data = restarted.parse_bytes(self.data)
+        self.assertEqual(self.parse_bill.call_count, 1)
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+        self.assertEqual(invoice_number, expected[0])
+        self.assertTrue(bill_df.equals(expected[1]))
+        self.assertEqual(bill_data, expected[2])
+
+    def test_parser_version_change_parses_again(self):
+        ParseCache(directory=self.directory, version=1).parse_bytes(self.data)
+
+        upgraded = ParseCache(directory=self.directory, version=2)
+        upgraded.parse_bytes(self.data)
+        self.assertEqual(self.parse_bill.call_count, 2)
+        self.assertEqual(upgraded.stats()["disk_hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
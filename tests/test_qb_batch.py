@@ -0,0 +1,78 @@
+"""
+Batched Item Resolution Tests
+
+find_items_batched must tell exact name matches, which are safe to learn
+as a vendor's mappings, apart from LIKE hits that only contain the line's
+name or SKU.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import re
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from qb import qb_batch
+from qb.qb_batch import find_items_batched
+
+CATALOG = [
+    {"Id": "1", "Name": "Widget"},
+    {"Id": "2", "Name": "Lamps:SHADE-01"},
+    {"Id": "3", "Name": "Blue Gadget Deluxe"},
+]
+
+
+def answer(operations):
+    """Answer Name IN and Name LIKE queries from CATALOG"""
+    results = {}
+    for operation in operations:
+        query = operation["Query"]
+        like = re.search(r"Name LIKE '%(.*)%'", query)
+        if like:
+            term = like.group(1).lower()
+            items = [i for i in CATALOG if term in i["Name"].lower()]
+        else:
+            names = {n.lower() for n in re.findall(r"'([^']*)'", query)}
+            items = [i for i in CATALOG if i["Name"].lower() in names]
+        results[operation["bId"]] = {"QueryResponse": {"Item": items}}
+    return results
+
+
+class FindItemsBatchedTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(qb_batch, "send_batch", side_effect=answer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_exact_name_matches_are_flagged(self):
+        found = find_items_batched([("widget", "", ""), ("", "", "Widget")])
+        self.assertEqual(
+            [(item["Id"], exact) for item, exact in found], [("1", True), ("1", True)]
+        )
+
+    def test_like_hits_are_not_exact(self):
+        found = find_items_batched(
+            [("Gadget", "", ""), ("Unknown", "shade-01", ""), ("Nothing", "", "")]
+        )
+        self.assertEqual(found[0][0]["Id"], "3")
+        self.assertFalse(found[0][1])
+        self.assertEqual(found[1][0]["Id"], "2")
+        self.assertFalse(found[1][1])
+        self.assertEqual(found[2], (None, False))
+
+    def test_cached_hits_keep_their_exactness(self):
+        cache = {}
+        lookups = [("Widget", "", ""), ("Gadget", "", "")]
+        find_items_batched(lookups, cache=cache)
+        found = find_items_batched(lookups, cache=cache)
+        self.assertEqual([exact for _, exact in found], [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+SKU Index Tests
+
+A bill line must resolve to the item its full product name identifies,
+even when its SKU resolves to something else through a weaker key, and
+an ambiguous probe must fall through to the line's other field.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from qb.item_index import KEY_NAME
+from qb.sku_index import SkuIndex
+
+
+class MatchLineTest(unittest.TestCase):
+    def test_full_product_name_beats_child_key_of_sku(self):
+        index = SkuIndex(
+            [
+                ("24fauxbois:24fauxbois-sharbor", "1"),
+                ("Accessories:24fauxbois-sharbor", "2"),
+                ("24fauxbois-sharbor", "3"),
+            ]
+        )
+        match = index.match_line("24fauxbois:24fauxbois-sharbor", "24fauxbois-sharbor")
+        self.assertEqual(match.item_id, "1")
+        self.assertEqual(match.priority, KEY_NAME)
+        self.assertEqual(match.confidence, 1.0)
+
+    def test_sku_wins_over_weaker_product_match(self):
+        index = SkuIndex([("Widgets:blue-1", "1"), ("Gadget", "2", "G-100")])
+        match = index.match_line("widgets", "G-100")
+        self.assertEqual(match.item_id, "2")
+        self.assertEqual(match.confidence, 1.0)
+
+    def test_ambiguous_probe_falls_through(self):
+        index = SkuIndex(
+            [("Lamps:shade", "1"), ("Shades:shade", "2"), ("Shade Red", "3")]
+        )
+        self.assertTrue(index.probe("shade").ambiguous)
+
+        match = index.match_line("Shade Red", "shade")
+        self.assertEqual(match.item_id, "3")
+        self.assertFalse(match.ambiguous)
+
+        match = index.match_line("shade", "Shade Red")
+        self.assertEqual(match.item_id, "3")
+
+    def test_ambiguous_match_is_returned_when_nothing_better(self):
+        index = SkuIndex([("Lamps:shade", "1"), ("Shades:shade", "2")])
+        match = index.match_line("shade", "")
+        self.assertTrue(match.ambiguous)
+        self.assertIsNone(index.match_line("missing", "also-missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+XML Parser Tests
+
+The streaming iterparse engine must produce exactly what the tree-based
+parse_bill produces, for the test invoice and for a copy with its
+conceptos repeated.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from parsers.xml_parser import parse_bill
+
+TEST_DATA = os.path.join(ROOT, "tests", "test_data.xml")
+
+
+class StreamingParityTest(unittest.TestCase):
+    def assert_same_output(self, path):
+        expected_number, expected_df, expected_data = parse_bill(path)
+        number, bill_df, bill_data = parse_bill(path, streaming=True)
+
+        self.assertEqual(number, expected_number)
+        self.assertEqual(bill_data, expected_data)
+        self.assertTrue(bill_df.equals(expected_df))
+        self.assertEqual(bill_df.dtypes.to_dict(), expected_df.dtypes.to_dict())
+
+    def test_test_invoice(self):
+        self.assert_same_output(TEST_DATA)
+
+    def test_repeated_conceptos(self):
+        with open(TEST_DATA, encoding="utf-8") as f:
+            xml = f.read()
+        match = re.search(r"<cfdi:Conceptos>(.*)</cfdi:Conceptos>", xml, re.S)
+        scaled = xml[: match.start(1)] + match.group(1) * 5 + xml[match.end(1) :]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "scaled.xml")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(scaled)
+            self.assert_same_output(path)
+
+
+if __name__ == "__main__":
+    unittest.main()